@@ -0,0 +1,36 @@
+"""Run the round-trip budget tests with more iterations or simulated latency
+
+The scenarios and their budgets live in tests/test_round_trips.py and run
+with the rest of the test suite; this runner only passes the options on and
+prints their latency and round-trip table. Exits non-zero if any budget is
+exceeded.
+
+Usage:
+    python -m lidtgbot.benchmarks [--iterations 200] [--latency 0.002] [--questions 60]
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+
+TESTS = Path(__file__).resolve().parents[2] / 'tests' / 'test_round_trips.py'
+
+
+def main() -> int:
+    import pytest
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulated Firestore round-trip latency in seconds")
+    parser.add_argument('--questions', type=int, default=60)
+    args = parser.parse_args()
+
+    os.environ['BENCHMARK_ITERATIONS'] = str(args.iterations)
+    os.environ['BENCHMARK_LATENCY'] = str(args.latency)
+    os.environ['BENCHMARK_QUESTIONS'] = str(args.questions)
+    return int(pytest.main(['-q', '-p', 'no:cacheprovider', str(TESTS)]))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Sends a message to all users, optionally filtered by federal state or language
+
+Users are streamed from Firestore page by page and fed through a bounded
+queue to a few send workers. Every send waits for a global token bucket
+(BROADCAST_RATE messages per second) and for the per-chat interval, and a
+flood-control error pauses all workers. Progress is checkpointed after every
+page, so an interrupted broadcast resumes with the first page not fully sent
+(users of that page may get the message twice).
+
+The sender only needs an object with an async send_message(chat_id, text),
+so it can run against a fake bot; with TELEGRAM_BASE_URL it can also target
+the stand-in API of lidtgbot.webhook_simulator.
+
+Usage:
+    python -m lidtgbot.broadcast --text "..." [--federal-state by] [--language-code ru]
+    python -m lidtgbot.broadcast --resume BROADCAST_ID
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Protocol
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter
+from lidtgbot.models.broadcast import Broadcast
+from lidtgbot.database.broadcast import broadcast_repository
+from lidtgbot.database.user import user_repository
+from lidtgbot.settings.config import (
+    BROADCAST_CHAT_INTERVAL,
+    BROADCAST_PAGE_SIZE,
+    BROADCAST_RATE,
+    BROADCAST_WORKERS,
+    TELEGRAM_BASE_URL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Attempts per message when Telegram answers with flood control
+MAX_ATTEMPTS = 3
+
+
+class MessageSender(Protocol):
+    async def send_message(self, chat_id: int, text: str) -> Any: ...
+
+
+class TokenBucket:
+    """Allows rate acquisitions per second on average, in bursts of up to capacity"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Waiters are served in order
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next seconds, e.g. after a flood-control error"""
+        self._refill()
+        self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class ChatRateLimiter:
+    """Keeps a minimum interval between two messages to the same chat"""
+
+    def __init__(self, interval: float, max_chats: int = 10000):
+        self.interval = interval
+        self.max_chats = max_chats
+        self._next_allowed: dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        now = time.monotonic()
+        if len(self._next_allowed) >= self.max_chats:
+            # Forget chats that may be written to again anyway
+            self._next_allowed = {chat: at for chat, at in self._next_allowed.items() if at > now}
+        allowed = self._next_allowed.get(chat_id, now)
+        self._next_allowed[chat_id] = max(allowed, now) + self.interval
+        if allowed > now:
+            await asyncio.sleep(allowed - now)
+
+
+class Broadcaster:
+    """Streams users into a rate-limited send queue and checkpoints the progress"""
+
+    def __init__(self, bot: MessageSender, rate: float = BROADCAST_RATE,
+                 chat_interval: float = BROADCAST_CHAT_INTERVAL, workers: int = BROADCAST_WORKERS,
+                 page_size: int = BROADCAST_PAGE_SIZE):
+        self.bot = bot
+        self.bucket = TokenBucket(rate)
+        self.chats = ChatRateLimiter(chat_interval)
+        self.workers = workers
+        self.page_size = page_size
+
+    async def _send(self, broadcast: Broadcast, chat_id: int) -> None:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await self.chats.wait(chat_id)
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id, broadcast.text)
+                broadcast.sent += 1
+                return
+            except RetryAfter as e:
+                logger.warning(f"Flood control, pausing broadcast for {e.retry_after}s")
+                self.bucket.pause(float(e.retry_after))
+                if attempt == MAX_ATTEMPTS:
+                    broadcast.failed += 1
+            except Forbidden:
+                # The user blocked the bot
+                broadcast.blocked += 1
+                return
+            except Exception as e:
+                # Any other error only fails this message, a dead worker would stall the page
+                logger.error(f"Failed to send broadcast {broadcast.broadcast_id} to {chat_id}: {e}")
+                broadcast.failed += 1
+                return
+
+    async def _worker(self, broadcast: Broadcast, queue: asyncio.Queue[int]) -> None:
+        while True:
+            chat_id = await queue.get()
+            try:
+                await self._send(broadcast, chat_id)
+            finally:
+                queue.task_done()
+
+    async def run(self, broadcast: Broadcast) -> Broadcast:
+        """Send the broadcast to every matching user after its checkpoint"""
+        if broadcast.finished:
+            return broadcast
+        queue: asyncio.Queue[int] = asyncio.Queue(maxsize=self.page_size)
+        workers = [asyncio.create_task(self._worker(broadcast, queue)) for _ in range(self.workers)]
+        try:
+            pages = user_repository.iter_user_pages(
+                broadcast.federal_state, broadcast.language_code, self.page_size, broadcast.cursor
+            )
+            async for users in pages:
+                for user in users:
+                    await queue.put(user.user_id)
+                await queue.join()
+                broadcast.cursor = str(users[-1].user_id)
+                await broadcast_repository.save_broadcast(broadcast)
+                logger.info(f"Broadcast {broadcast.broadcast_id}: {broadcast.sent} sent, "
+                            f"{broadcast.blocked} blocked, {broadcast.failed} failed")
+            broadcast.finished = True
+            await broadcast_repository.save_broadcast(broadcast)
+            return broadcast
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def run_broadcast(text: str | None = None, federal_state: str | None = None,
+                        language_code: str | None = None, resume: str | None = None) -> Broadcast:
+    """Start a new broadcast or resume one, sending with the bot of BOT_TOKEN"""
+    token = os.getenv("BOT_TOKEN")
+    if not token:
+        raise ValueError("BOT_TOKEN environment variable not set")
+    if resume is not None:
+        broadcast = await broadcast_repository.get_broadcast(resume)
+        if broadcast is None:
+            raise ValueError(f"Unknown broadcast {resume}")
+    else:
+        broadcast = await broadcast_repository.create_broadcast(text, federal_state, language_code)
+        print(f"Broadcast {broadcast.broadcast_id}, resume with --resume {broadcast.broadcast_id}")
+    async with Bot(token, base_url=TELEGRAM_BASE_URL) as bot:
+        return await Broadcaster(bot).run(broadcast)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--text', help="message to send")
+    parser.add_argument('--federal-state', help="only users of this federal state")
+    parser.add_argument('--language-code', help="only users with this language code")
+    parser.add_argument('--resume', metavar='BROADCAST_ID', help="continue an interrupted broadcast")
+    args = parser.parse_args()
+    if not args.text and not args.resume:
+        parser.error("--text or --resume is required")
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    result = asyncio.run(run_broadcast(args.text, args.federal_state, args.language_code, args.resume))
+    print(f"Sent {result.sent}, blocked {result.blocked}, failed {result.failed}")
@@ -0,0 +1,124 @@
+"""Compact signed callback data for inline buttons and routing of button presses
+
+Telegram hands back at most 64 bytes of callback data with a button press.
+Every button carries a one-character action prefix followed by a base64url
+payload of 16 bytes: the item index (catalog index of a question, position of
+a federal state), the pressed option, the option permutation the question
+was shown with and a session nonce, followed by a truncated HMAC-SHA256 over
+prefix and fields keyed with CALLBACK_SECRET. A press is verified and graded
+from the payload and the in-memory question bank alone, and the router finds
+the handler with a single dict lookup on the prefix.
+"""
+import os
+import hmac
+import base64
+import struct
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.settings.config import CALLBACK_SECRET
+
+logger = logging.getLogger(__name__)
+
+# Action prefixes
+QUIZ = 'q'
+LEARN = 'l'
+FEDERAL = 'f'
+
+# index, option, permutation, nonce
+_FIELDS = struct.Struct('>HBBI')
+MAC_SIZE = 8
+# Telegram limit on callback_data
+MAX_CALLBACK_DATA = 64
+
+
+@dataclass(frozen=True, slots=True)
+class CallbackPayload:
+    action: str
+    index: int
+    option: int = 0
+    permutation: int = 0
+    nonce: int = 0
+
+
+class CallbackCodec:
+    """Encodes payloads into signed callback data and verifies them on the way back"""
+
+    def __init__(self, secret: str | None = CALLBACK_SECRET):
+        self._secret = secret
+        self._key: bytes | None = None
+
+    @property
+    def key(self) -> bytes:
+        """HMAC key, derived from the bot token unless CALLBACK_SECRET is set"""
+        if self._key is None:
+            secret = self._secret or os.getenv('BOT_TOKEN')
+            if not secret:
+                raise ValueError("CALLBACK_SECRET or BOT_TOKEN environment variable not set")
+            self._key = hashlib.sha256(b'lidtgbot-callback:' + secret.encode('utf-8')).digest()
+        return self._key
+
+    def _mac(self, action: str, fields: bytes) -> bytes:
+        return hmac.new(self.key, action.encode('ascii') + fields, hashlib.sha256).digest()[:MAC_SIZE]
+
+    def encode(self, payload: CallbackPayload) -> str:
+        fields = _FIELDS.pack(payload.index, payload.option, payload.permutation, payload.nonce)
+        data = base64.urlsafe_b64encode(fields + self._mac(payload.action, fields)).rstrip(b'=')
+        return payload.action + data.decode('ascii')
+
+    def decode(self, data: str) -> CallbackPayload | None:
+        """Payload of callback data, None if it is malformed or not signed by us"""
+        action, encoded = data[:1], data[1:]
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        except ValueError:
+            return None
+        if len(raw) != _FIELDS.size + MAC_SIZE:
+            return None
+        fields, mac = raw[:_FIELDS.size], raw[_FIELDS.size:]
+        if not hmac.compare_digest(mac, self._mac(action, fields)):
+            return None
+        index, option, permutation, nonce = _FIELDS.unpack(fields)
+        return CallbackPayload(action, index, option, permutation, nonce)
+
+
+# Global instance
+callback_codec = CallbackCodec()
+
+PayloadHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE, CallbackPayload], Awaitable[None]]
+
+
+class CallbackRouter:
+    """Dispatches button presses to the handler registered for their action prefix"""
+
+    def __init__(self, codec: CallbackCodec = callback_codec):
+        self.codec = codec
+        self._handlers: dict[str, PayloadHandler] = {}
+
+    def register(self, action: str, handler: PayloadHandler) -> None:
+        if len(action) != 1:
+            raise ValueError(f"Callback action prefix must be one character, got {action!r}")
+        self._handlers[action] = handler
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        handler = self._handlers.get(query.data[:1]) if query.data else None
+        payload = self.codec.decode(query.data) if handler is not None else None
+        if payload is None:
+            # Buttons of an older release, or forged data
+            logger.warning(f"Rejected callback data {query.data!r} from user {query.from_user.id}")
+            await query.answer(render_message('quiz_stale'))
+            return
+        await handler(update, context, payload)
+
+    def handler(self) -> CallbackQueryHandler:
+        """The one CallbackQueryHandler that routes all button presses"""
+        return CallbackQueryHandler(self.dispatch)
+
+
+# Global instance
+callback_router = CallbackRouter()
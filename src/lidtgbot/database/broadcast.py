@@ -0,0 +1,77 @@
+import uuid
+import logging
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from lidtgbot.models.broadcast import Broadcast
+from lidtgbot.models.federal_state import FederalState
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.converters import broadcast_from_dict
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
+
+logger = logging.getLogger(__name__)
+
+
+class BroadcastRepository:
+    """Repository for broadcasts and their checkpointed progress"""
+
+    def __init__(self):
+        self._collection: 'AsyncCollectionReference | None' = None
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The broadcasts collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection('broadcasts')
+        return self._collection
+
+    @instrumented
+    async def create_broadcast(self, text: str, federal_state: FederalState | None = None,
+                               language_code: str | None = None) -> Broadcast:
+        """Create a new broadcast that has not sent anything yet"""
+        now = datetime.now(timezone.utc)
+        broadcast = Broadcast(
+            broadcast_id=uuid.uuid4().hex,
+            text=text,
+            created_at=now,
+            updated_at=now,
+            federal_state=federal_state,
+            language_code=language_code,
+        )
+        await self.save_broadcast(broadcast)
+        logger.info(f"Broadcast {broadcast.broadcast_id} created")
+        return broadcast
+
+    @instrumented
+    async def get_broadcast(self, broadcast_id: str) -> Broadcast | None:
+        """Get a broadcast with its last checkpoint"""
+        try:
+            doc = await firestore_client.get(self.collection.document(broadcast_id))
+            if doc.exists:
+                data = doc.to_dict()
+                if data is None:
+                    return None
+                return broadcast_from_dict(data)
+            return None
+
+        except Exception as e:
+            logger.error(f"Failed to get broadcast {broadcast_id}: {e}")
+            raise
+
+    @instrumented
+    async def save_broadcast(self, broadcast: Broadcast) -> None:
+        """Checkpoint the progress of a broadcast"""
+        try:
+            broadcast.updated_at = datetime.now(timezone.utc)
+            await firestore_client.set(self.collection.document(broadcast.broadcast_id), asdict(broadcast))
+
+        except Exception as e:
+            logger.error(f"Failed to save broadcast {broadcast.broadcast_id}: {e}")
+            raise
+
+
+# Global instance
+broadcast_repository = BroadcastRepository()
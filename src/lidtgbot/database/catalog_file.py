@@ -0,0 +1,283 @@
+"""Packaged binary question catalog, memory-mapped by the question bank
+
+writequestions emits the whole catalog as one file (CATALOG_FILE). The bot
+maps it read-only, so every worker process on a host shares the same
+page-cached copy and startup needs no database round trip for content.
+
+Layout, little-endian:
+    header       magic, format version, catalog version, language count,
+                 category count, question count, translation count, offset
+                 and size of the string table
+    languages    language count x 8 bytes, ASCII language codes
+    categories   category count x string ref, sorted
+    questions    question count x fixed-width record, sorted by num:
+                 num, image (string refs), category (index into the
+                 categories), solution, created_at, updated_at
+                 (microseconds since the epoch)
+    translations question count x language count fixed-width records,
+                 question-major: question, context and options a-d (string refs)
+    strings      deduplicated UTF-8 strings
+
+A string ref is (offset into the string table, byte length); length
+NO_STRING means None. A translation record whose question is None is a
+missing translation. The nums and categories of all questions are read
+when the file is mapped, so the question bank can index it by category;
+Question and Translation objects are decoded on first access and then kept.
+"""
+import os
+import mmap
+import struct
+import logging
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Mapping
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import Translation, LanguageCode
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LIDTGCAT'
+FORMAT_VERSION = 2
+NO_STRING = 0xFFFFFFFF
+
+# magic, format version, catalog version, language count, category count, question count,
+# translation count, strings offset and size
+_HEADER = struct.Struct('<8sH16sHHIIQQ')
+_LANGUAGE = struct.Struct('<8s')
+_STRING_REF = struct.Struct('<II')
+# num, image, category, solution, created_at, updated_at
+_QUESTION = struct.Struct('<IIIIH1s5xqq')
+# The leading num and category of a question record
+_QUESTION_INDEX = struct.Struct('<II8xH')
+# question, context, option_a, option_b, option_c, option_d
+_TRANSLATION = struct.Struct('<IIIIIIIIIIII')
+TRANSLATION_FIELDS = ('question', 'context', 'option_a', 'option_b', 'option_c', 'option_d')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _micros(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+class _StringTable:
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets: dict[str, tuple[int, int]] = {}
+
+    def ref(self, value: str | None) -> tuple[int, int]:
+        if value is None:
+            return 0, NO_STRING
+        if value not in self._offsets:
+            encoded = value.encode('utf-8')
+            self._offsets[value] = (len(self.data), len(encoded))
+            self.data += encoded
+        return self._offsets[value]
+
+
+def write_catalog_file(path: str, version: str, questions: list[dict[str, Any]],
+                       translations: dict[tuple[str, str], dict[str, Any]]) -> int:
+    """
+    Write the catalog to path, replacing the file atomically so running bots
+    never map a half-written file. questions are dicts with num, solution,
+    category, image, created_at and updated_at; translations are keyed by
+    (num, language code). Returns the size of the file.
+    """
+    questions = sorted(questions, key=lambda question: question['num'])
+    languages = sorted({language for _, language in translations})
+    categories = sorted({question['category'] for question in questions})
+    category_ids = {category: i for i, category in enumerate(categories)}
+    strings = _StringTable()
+
+    question_records = bytearray()
+    translation_records = bytearray()
+    translation_count = 0
+    for question in questions:
+        question_records += _QUESTION.pack(
+            *strings.ref(question['num']), *strings.ref(question.get('image')),
+            category_ids[question['category']], question['solution'].encode('ascii'),
+            _micros(question['created_at']), _micros(question['updated_at']),
+        )
+        for language in languages:
+            translation = translations.get((question['num'], language)) or {}
+            translation_count += bool(translation)
+            refs = [part for field in TRANSLATION_FIELDS for part in strings.ref(translation.get(field))]
+            translation_records += _TRANSLATION.pack(*refs)
+
+    language_table = b''.join(_LANGUAGE.pack(language.encode('ascii')) for language in languages)
+    category_table = b''.join(_STRING_REF.pack(*strings.ref(category)) for category in categories)
+    strings_offset = (_HEADER.size + len(language_table) + len(category_table)
+                      + len(question_records) + len(translation_records))
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, version.encode('ascii')[:16], len(languages),
+                          len(categories), len(questions), translation_count, strings_offset,
+                          len(strings.data))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as file:
+        for part in (header, language_table, category_table, question_records, translation_records,
+                     strings.data):
+            file.write(part)
+    os.replace(temporary, path)
+    return strings_offset + len(strings.data)
+
+
+def read_catalog_version(path: str) -> str | None:
+    """Catalog version from the header, None if there is no catalog file"""
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    magic, format_version, version, *_ = _HEADER.unpack(header)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a catalog file of format {FORMAT_VERSION}")
+    return version.rstrip(b'\0').decode('ascii')
+
+
+class CatalogFile:
+    """Read-only memory map of a catalog file"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, format_version, version, language_count, category_count, self.question_count,
+         self.translation_count, self._strings, _) = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a catalog file of format {FORMAT_VERSION}")
+        self.version = version.rstrip(b'\0').decode('ascii')
+        offset = _HEADER.size
+        self.languages: list[str] = [
+            _LANGUAGE.unpack_from(self._map, offset + i * _LANGUAGE.size)[0].rstrip(b'\0').decode('ascii')
+            for i in range(language_count)
+        ]
+        self._language_index = {language: i for i, language in enumerate(self.languages)}
+        offset += language_count * _LANGUAGE.size
+        self.categories: list[str] = [
+            self._string(*_STRING_REF.unpack_from(self._map, offset + i * _STRING_REF.size))
+            for i in range(category_count)
+        ]
+        self._questions = offset + category_count * _STRING_REF.size
+        self._translations = self._questions + self.question_count * _QUESTION.size
+        # Only nums and category indexes are read up front, to find and group questions
+        self.index: dict[str, int] = {}
+        self.category_ids = array('H')
+        for i in range(self.question_count):
+            num_offset, num_length, category = _QUESTION_INDEX.unpack_from(self._map, self._question_offset(i))
+            self.index[self._string(num_offset, num_length)] = i
+            self.category_ids.append(category)
+
+    def _question_offset(self, i: int) -> int:
+        return self._questions + i * _QUESTION.size
+
+    def _string(self, offset: int, length: int) -> str | None:
+        if length == NO_STRING:
+            return None
+        start = self._strings + offset
+        return self._map[start:start + length].decode('utf-8')
+
+    def question(self, i: int) -> Question:
+        (num_offset, num_length, image_offset, image_length, category,
+         solution, created_at, updated_at) = _QUESTION.unpack_from(self._map, self._question_offset(i))
+        return Question(
+            num=self._string(num_offset, num_length),
+            solution=solution.decode('ascii'),
+            category=self.categories[category],
+            image=self._string(image_offset, image_length),
+            created_at=_EPOCH + created_at * _MICROSECOND,
+            updated_at=_EPOCH + updated_at * _MICROSECOND,
+        )
+
+    def _translation_offset(self, i: int, language_code: str) -> int | None:
+        language = self._language_index.get(language_code)
+        if language is None:
+            return None
+        return self._translations + (i * len(self.languages) + language) * _TRANSLATION.size
+
+    def has_translation(self, i: int, language_code: str) -> bool:
+        offset = self._translation_offset(i, language_code)
+        # Length of the question text
+        return offset is not None and _TRANSLATION.unpack_from(self._map, offset)[1] != NO_STRING
+
+    def translation(self, i: int, language_code: str) -> Translation | None:
+        offset = self._translation_offset(i, language_code)
+        if offset is None:
+            return None
+        refs = _TRANSLATION.unpack_from(self._map, offset)
+        values = {field: self._string(refs[2 * k], refs[2 * k + 1]) for k, field in enumerate(TRANSLATION_FIELDS)}
+        if values['question'] is None:
+            return None
+        return Translation(language_code=language_code, **values)
+
+
+class LazyQuestions(Mapping[str, Question]):
+    """Questions of a catalog file by num, decoded on first access"""
+
+    def __init__(self, catalog: CatalogFile):
+        self.catalog = catalog
+        self._decoded: dict[str, Question] = {}
+
+    def __getitem__(self, num: str) -> Question:
+        question = self._decoded.get(num)
+        if question is None:
+            question = self._decoded[num] = self.catalog.question(self.catalog.index[num])
+        return question
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.catalog.index)
+
+    def __len__(self) -> int:
+        return self.catalog.question_count
+
+    def category(self, num: str) -> str:
+        """Category of a question, from the index without decoding the question"""
+        return self.catalog.categories[self.catalog.category_ids[self.catalog.index[num]]]
+
+
+class LazyTranslations(Mapping[tuple[str, LanguageCode], Translation]):
+    """Translations of a catalog file by (num, language code), decoded on first access"""
+
+    def __init__(self, catalog: CatalogFile):
+        self.catalog = catalog
+        self._decoded: dict[tuple[str, LanguageCode], Translation | None] = {}
+
+    def __getitem__(self, key: tuple[str, LanguageCode]) -> Translation:
+        if key in self._decoded:
+            translation = self._decoded[key]
+        else:
+            num, language_code = key
+            i = self.catalog.index.get(num)
+            translation = self.catalog.translation(i, language_code) if i is not None else None
+            self._decoded[key] = translation
+        if translation is None:
+            raise KeyError(key)
+        return translation
+
+    def __iter__(self) -> Iterator[tuple[str, LanguageCode]]:
+        for num, i in self.catalog.index.items():
+            for language in self.catalog.languages:
+                if self.catalog.has_translation(i, language):
+                    yield num, language
+
+    def __len__(self) -> int:
+        return self.catalog.translation_count
+
+
+class MmapCatalogSource:
+    """Serves the catalog from the memory-mapped catalog file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def fetch_version(self) -> str | None:
+        return read_catalog_version(self.path)
+
+    async def fetch_catalog(self) -> tuple[Mapping[str, Question],
+                                           Mapping[tuple[str, LanguageCode], Translation]]:
+        catalog = CatalogFile(self.path)
+        logger.info(f"Catalog file {self.path} mapped: {catalog.question_count} questions, "
+                    f"languages {', '.join(catalog.languages)}")
+        return LazyQuestions(catalog), LazyTranslations(catalog)
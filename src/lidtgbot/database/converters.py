@@ -0,0 +1,66 @@
+"""Conversion of Firestore document data to model objects"""
+from typing import Any
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import Translation
+from lidtgbot.models.user import User
+from lidtgbot.models.broadcast import Broadcast
+
+
+def question_from_dict(data: dict[str, Any]) -> Question:
+    """Convert Firestore question data to Question object"""
+    return Question(
+        num=data['num'],
+        solution=data['solution'],
+        category=data['category'],
+        image=data.get('image', None),
+        # Only valid if it was uploaded from the current image
+        image_file_id=(data.get('image_file_id')
+                       if data.get('image_file_source') == data.get('image') else None),
+        created_at=data['created_at'],
+        updated_at=data['updated_at']
+    )
+
+
+def translation_from_dict(data: dict[str, Any]) -> Translation:
+    """Convert Firestore translation data to Translation object"""
+    return Translation(
+        language_code=data['language_code'],
+        question=data['question'],
+        context=data['context'],
+        option_a=data['option_a'],
+        option_b=data['option_b'],
+        option_c=data['option_c'],
+        option_d=data['option_d'],
+    )
+
+
+def user_from_dict(data: dict[str, Any]) -> User:
+    """Convert Firestore user data to User object"""
+    return User(
+        user_id=data['user_id'],
+        first_name=data['first_name'],
+        created_at=data['created_at'],
+        updated_at=data.get('updated_at', data['created_at']),
+        total_questions_answered=data.get('total_questions_answered', 0),
+        username=data.get('username'),
+        last_name=data.get('last_name'),
+        language_code=data.get('language_code'),
+        federal_state=data.get('federal_state', None)
+    )
+
+
+def broadcast_from_dict(data: dict[str, Any]) -> Broadcast:
+    """Convert Firestore broadcast data to Broadcast object"""
+    return Broadcast(
+        broadcast_id=data['broadcast_id'],
+        text=data['text'],
+        created_at=data['created_at'],
+        updated_at=data['updated_at'],
+        federal_state=data.get('federal_state'),
+        language_code=data.get('language_code'),
+        cursor=data.get('cursor'),
+        sent=data.get('sent', 0),
+        blocked=data.get('blocked', 0),
+        failed=data.get('failed', 0),
+        finished=data.get('finished', False),
+    )
@@ -0,0 +1,76 @@
+import random
+import secrets
+import logging
+from array import array
+from lidtgbot.models.exam import ExamPaper, GENERAL_QUESTIONS, STATE_QUESTIONS
+from lidtgbot.models.federal_state import FederalState
+from lidtgbot.database.question_bank import QuestionBank, question_bank
+
+logger = logging.getLogger(__name__)
+
+
+def _draw(rng: random.Random, pool: array, count: int) -> list[int]:
+    """
+    Draw count distinct items with a sparse Fisher-Yates shuffle.
+    Costs O(count) regardless of the pool size and only depends on
+    Random.randrange, so papers stay reproducible from the seed.
+    """
+    if count > len(pool):
+        raise ValueError(f"Cannot draw {count} questions from a pool of {len(pool)}")
+    swapped: dict[int, int] = {}
+    drawn = []
+    last = len(pool) - 1
+    for i in range(count):
+        j = rng.randrange(i, last + 1)
+        drawn.append(pool[swapped.get(j, j)])
+        swapped[j] = swapped.get(i, i)
+    return drawn
+
+
+class ExamGenerator:
+    """
+    Draws exam papers from index arrays that are precomputed whenever the
+    question bank is (re)loaded: one array of general questions and one per
+    federal state. Generating a paper runs no queries and takes constant time.
+    """
+
+    def __init__(self, bank: QuestionBank):
+        self.bank = bank
+        self.catalog_version: str | None = None
+        self._general = array('H')
+        self._by_state: dict[FederalState, array] = {}
+        bank.add_reload_listener(self.rebuild)
+
+    def rebuild(self, bank: QuestionBank) -> None:
+        """Precompute the index arrays for the current catalog"""
+        self._general = array('H', bank.general_indices)
+        self._by_state = {
+            state: array('H', bank.state_indices(state))
+            for state in bank.categories if bank.state_indices(state)
+        }
+        self.catalog_version = bank.version
+        logger.info(f"Exam generator indexed {len(self._general)} general questions "
+                    f"and {len(self._by_state)} federal states")
+
+    def can_draw(self, federal_state: FederalState) -> bool:
+        """Whether the catalog has enough general and state questions for a paper"""
+        return (len(self._general) >= GENERAL_QUESTIONS
+                and len(self._by_state.get(federal_state, ())) >= STATE_QUESTIONS)
+
+    def paper(self, federal_state: FederalState, seed: int | None = None) -> ExamPaper:
+        """Draw a paper of 30 general and 3 state questions, reproducible from the seed"""
+        if seed is None:
+            seed = secrets.randbits(32)
+        rng = random.Random(seed)
+        indices = _draw(rng, self._general, GENERAL_QUESTIONS)
+        indices += _draw(rng, self._by_state.get(federal_state, array('H')), STATE_QUESTIONS)
+        return ExamPaper(
+            seed=seed,
+            federal_state=federal_state,
+            catalog_version=self.catalog_version,
+            indices=array('H', indices),
+        )
+
+
+# Global instance
+exam_generator = ExamGenerator(question_bank)
@@ -1,23 +1,81 @@
 import os
 import json
+import asyncio
 import logging
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore import Client
+import threading
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable
+from lidtgbot.database.memory_client import MemoryFirestore
+from lidtgbot.database.resilience import Resilience, has_increment, resilience
+from lidtgbot.metrics import metrics
+from lidtgbot.settings.config import (
+    FIRESTORE_BACKEND,
+    FIRESTORE_GET_ALL_CHUNK_SIZE,
+    FIRESTORE_MAX_CONCURRENT_RPCS,
+    FIRESTORE_MEMORY_LATENCY,
+)
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import (
+        AsyncClient,
+        AsyncDocumentReference,
+        AsyncQuery,
+        AsyncWriteBatch,
+        DocumentSnapshot,
+    )
+    from google.cloud.firestore_v1.async_aggregation import AsyncAggregationQuery
 
 logger = logging.getLogger(__name__)
 
 
 class FirestoreClient:
-    """Simple Firestore client for Leben in Deutschland test bot"""
+    """Simple Firestore client for Leben in Deutschland test bot
+    
+    All repositories go through the async helpers below (get, set, update, ...)
+    so that Firestore I/O never blocks the bot's event loop and the number of
+    RPCs in flight is capped by a single semaphore. Every RPC goes through
+    the shared Resilience policy: transient failures of idempotent calls are
+    retried, slow document reads may be hedged and a circuit breaker fails
+    calls fast while Firestore is degraded. Commits and writes with Increment
+    transforms are never retried, as they might have been applied already.
+    
+    Nothing is imported or connected until the client is first used (or
+    initialize() is called), so importing the bot stays cheap and works
+    without credentials.
+    """
     
-    def __init__(self):
-        self.db: Client | None = None
-        self._initialize_firebase()
+    def __init__(self, max_concurrent_rpcs: int = FIRESTORE_MAX_CONCURRENT_RPCS,
+                 backend: str = FIRESTORE_BACKEND, policy: Resilience = resilience):
+        self.backend = backend
+        self.resilience = policy
+        self._db: 'AsyncClient | MemoryFirestore | None' = None
+        self._init_lock = threading.Lock()
+        self._rpc_slots = asyncio.Semaphore(max_concurrent_rpcs)
+    
+    @property
+    def db(self) -> 'AsyncClient | MemoryFirestore':
+        """The underlying client, initialized on first access"""
+        if self._db is None:
+            self.initialize()
+        return self._db
+    
+    def initialize(self) -> None:
+        """Create the underlying client if that has not happened yet"""
+        with self._init_lock:
+            if self._db is not None:
+                return
+            if self.backend == 'memory':
+                self._db = MemoryFirestore(latency=FIRESTORE_MEMORY_LATENCY)
+                logger.info("Using in-memory Firestore stand-in")
+            else:
+                self._initialize_firebase()
     
     def _initialize_firebase(self):
         """Initialize Firebase connection"""
         try:
+            import firebase_admin
+            from firebase_admin import credentials, firestore_async
+            
             # Check if Firebase is already initialized
             if not firebase_admin._apps:
                 service_account_key = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY')
@@ -28,7 +86,7 @@ class FirestoreClient:
                 cred = credentials.Certificate(service_account_info)
                 firebase_admin.initialize_app(cred)
             
-            self.db = firestore.client()
+            self._db = firestore_async.client()
             logger.info("Firebase initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Firebase: {e}")
@@ -37,7 +95,95 @@ class FirestoreClient:
     @property
     def is_initialized(self) -> bool:
         """Check if Firebase is properly initialized"""
-        return self.db is not None
+        return self._db is not None
+    
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Hold one of the limited RPC slots for the duration of a call"""
+        async with self._rpc_slots:
+            yield
+    
+    async def get(self, doc_ref: 'AsyncDocumentReference',
+                  field_paths: list[str] | None = None) -> 'DocumentSnapshot':
+        """Read a single document, optionally only some of its fields"""
+        async def attempt() -> 'DocumentSnapshot':
+            async with self._slot():
+                return await doc_ref.get(field_paths=field_paths)
+        doc = await self.resilience.call('get', attempt, hedge=True)
+        metrics.count_firestore('get', 'read')
+        return doc
+    
+    async def set(self, doc_ref: 'AsyncDocumentReference', data: dict[str, Any],
+                  merge: bool = False) -> None:
+        """Create or overwrite a single document"""
+        async def attempt() -> None:
+            async with self._slot():
+                await doc_ref.set(data, merge=merge)
+        await self.resilience.call('set', attempt, idempotent=not has_increment(data))
+        metrics.count_firestore('set', 'write')
+    
+    async def update(self, doc_ref: 'AsyncDocumentReference', data: dict[str, Any]) -> None:
+        """Update fields of an existing document"""
+        async def attempt() -> None:
+            async with self._slot():
+                await doc_ref.update(data)
+        await self.resilience.call('update', attempt, idempotent=not has_increment(data))
+        metrics.count_firestore('update', 'write')
+    
+    async def commit(self, batch: 'AsyncWriteBatch') -> None:
+        """Commit a write batch"""
+        # Committing clears the batch, count its writes first
+        writes = len(batch)
+
+        async def attempt() -> None:
+            async with self._slot():
+                await batch.commit()
+        await self.resilience.call('commit', attempt, idempotent=False)
+        metrics.count_firestore('commit', 'write', writes)
+    
+    async def get_all(self, doc_refs: Iterable['AsyncDocumentReference']) -> list['DocumentSnapshot']:
+        """Read several documents in one round trip"""
+        doc_refs = list(doc_refs)
+        async def attempt() -> list['DocumentSnapshot']:
+            async with self._slot():
+                return [doc async for doc in self.db.get_all(doc_refs)]
+        docs = await self.resilience.call('get_all', attempt, hedge=True)
+        metrics.count_firestore('get_all', 'read', len(docs))
+        return docs
+    
+    async def get_many(self, doc_refs: Iterable['AsyncDocumentReference'],
+                       chunk_size: int = FIRESTORE_GET_ALL_CHUNK_SIZE) -> list['DocumentSnapshot | None']:
+        """
+        Read many documents with get_all in chunks committed in parallel.
+        Returns one snapshot per reference in request order (None if Firestore returned none).
+        """
+        doc_refs = list(doc_refs)
+        # Each document is read once, however often it is requested
+        unique = list({doc_ref.path: doc_ref for doc_ref in doc_refs}.values())
+        chunks = await asyncio.gather(*(
+            self.get_all(unique[start:start + chunk_size])
+            for start in range(0, len(unique), chunk_size)
+        ))
+        # get_all does not guarantee order, so match results by path
+        by_path = {doc.reference.path: doc for docs in chunks for doc in docs}
+        return [by_path.get(doc_ref.path) for doc_ref in doc_refs]
+    
+    async def aggregate(self, query: 'AsyncAggregationQuery') -> dict[str, float]:
+        """Run count()/sum() aggregations in one round trip, results by alias"""
+        async def attempt() -> list:
+            async with self._slot():
+                return await query.get()
+        results = await self.resilience.call('aggregate', attempt)
+        metrics.count_firestore('aggregate', 'read')
+        return {result.alias: result.value for result in results[0]}
+    
+    async def stream(self, query: 'AsyncQuery') -> AsyncIterator['DocumentSnapshot']:
+        """Stream the results of a query, holding one RPC slot while iterating (never retried)"""
+        metrics.count_firestore('stream', 'read', 0)
+        async with self.resilience.guard('stream'), self._slot():
+            async for doc in query.stream():
+                metrics.count_firestore(None, 'read')
+                yield doc
 
 # Global instance
 firestore_client = FirestoreClient()
@@ -0,0 +1,107 @@
+import logging
+from typing import TYPE_CHECKING
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.question_bank import QuestionBank, question_bank
+from lidtgbot.database.catalog_file import MmapCatalogSource
+from lidtgbot.settings.config import STORAGE_BACKEND
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
+
+logger = logging.getLogger(__name__)
+
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+
+class ImageFileStore:
+    """
+    Telegram file_ids of uploaded question images.
+
+    Once an image has been uploaded, the file_id Telegram returns is stored
+    on every question using that image (image_file_id, next to the image it
+    was uploaded from) and kept in a process-wide map keyed by the image
+    reference, so later sends reuse it instead of uploading again. The map
+    is filled on every (re)load of the question bank: from its questions, or,
+    when the bank maps the catalog file (which has no file_ids, they are saved
+    after it is written), with one query to the storage backend.
+    """
+
+    def __init__(self, bank: QuestionBank):
+        self._collection: 'AsyncCollectionReference | None' = None
+        self.bank = bank
+        self._file_ids: dict[str, str] = {}
+        bank.add_reload_listener(self._on_reload)
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The questions collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection('questions')
+        return self._collection
+
+    async def _on_reload(self, bank: QuestionBank) -> None:
+        if isinstance(bank.source, MmapCatalogSource):
+            try:
+                self._file_ids.update(await self.load_file_ids())
+            except Exception as e:
+                # Images without a known file_id are uploaded again
+                logger.error(f"Failed to load image file_ids: {e}")
+            return
+        for num in bank.nums:
+            question = bank.get_question(num)
+            if question.image and question.image_file_id:
+                self._file_ids[question.image] = question.image_file_id
+
+    @instrumented
+    async def load_file_ids(self) -> dict[str, str]:
+        """file_ids of all uploaded images stored in the storage backend"""
+        if STORAGE_BACKEND == 'sqlite':
+            from lidtgbot.database.sqlite_backend import sqlite_database
+            return sqlite_database.image_file_ids()
+        file_ids = {}
+        query = self.collection.select(['image', 'image_file_id', 'image_file_source'])
+        async for doc in firestore_client.stream(query):
+            data = doc.to_dict() or {}
+            # A file_id uploaded from an image the question no longer uses is stale
+            if data.get('image_file_id') and data.get('image_file_source') == data.get('image'):
+                file_ids[data['image']] = data['image_file_id']
+        return file_ids
+
+    def get_file_id(self, image: str) -> str | None:
+        """Get the file_id of an uploaded image"""
+        return self._file_ids.get(image)
+
+    def forget(self, image: str) -> None:
+        """Drop a file_id Telegram no longer accepts, so the image is uploaded again"""
+        self._file_ids.pop(image, None)
+
+    @instrumented
+    async def save_file_id(self, image: str, file_id: str) -> None:
+        """Remember the file_id of an image and store it on all questions using the image"""
+        self._file_ids[image] = file_id
+        if STORAGE_BACKEND == 'sqlite':
+            from lidtgbot.database.sqlite_backend import sqlite_database
+            count = sqlite_database.save_image_file_id(image, file_id)
+            logger.info(f"Stored file_id of image {image} on {count} questions")
+            return
+        nums = [num for num in self.bank.nums if self.bank.get_question(num).image == image]
+        try:
+            for start in range(0, len(nums), MAX_BATCH_SIZE):
+                batch = firestore_client.db.batch()
+                for num in nums[start:start + MAX_BATCH_SIZE]:
+                    batch.set(self.collection.document(num), {
+                        'image_file_id': file_id,
+                        'image_file_source': image,
+                    }, merge=True)
+                await firestore_client.commit(batch)
+            logger.info(f"Stored file_id of image {image} on {len(nums)} questions")
+
+        except Exception as e:
+            # The in-memory file_id is still used, it is only uploaded again after a restart
+            logger.error(f"Failed to store file_id of image {image}: {e}")
+
+
+# Global instance
+image_file_store = ImageFileStore(question_bank)
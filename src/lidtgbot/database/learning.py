@@ -0,0 +1,57 @@
+import logging
+from collections import OrderedDict
+from lidtgbot.models.user import User
+from lidtgbot.models.learning_state import LearningState, LearnScheduler, question_key
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.user import user_repository
+from lidtgbot.settings.config import LEARN_CACHE_SIZE
+from lidtgbot.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+class LearningStore:
+    """
+    Learn-mode schedulers of recently active users.
+
+    Review records live in the packed users/{id}.reviews field, which is read
+    once when a user starts learning in this process. After that, picking the
+    next question is a heap operation and every answer only queues the repacked
+    field in the user write buffer, so no Firestore query is ever needed.
+    """
+
+    def __init__(self, maxsize: int = LEARN_CACHE_SIZE):
+        self.maxsize = maxsize
+        # user_id -> (catalog version, federal state, scheduler)
+        self._schedulers: OrderedDict[int, tuple[str | None, str | None, LearnScheduler]] = OrderedDict()
+
+    @instrumented
+    async def get_scheduler(self, user: User) -> LearnScheduler:
+        """Get the user's scheduler, rebuilding it when the catalog or federal state changed"""
+        entry = self._schedulers.get(user.user_id)
+        if entry is not None:
+            version, federal_state, scheduler = entry
+            if version == question_bank.version and federal_state == user.federal_state:
+                self._schedulers.move_to_end(user.user_id)
+                return scheduler
+            state = scheduler.state
+        else:
+            state = LearningState.from_bytes(await user_repository.get_reviews(user.user_id))
+
+        keys = {index: question_key(question_bank.num_at(index))
+                for index in question_bank.relevant_indices(user.federal_state)}
+        scheduler = LearnScheduler(state, keys)
+        self._schedulers[user.user_id] = (question_bank.version, user.federal_state, scheduler)
+        self._schedulers.move_to_end(user.user_id)
+        while len(self._schedulers) > self.maxsize:
+            self._schedulers.popitem(last=False)
+        return scheduler
+
+    def record_answer(self, user_id: int, scheduler: LearnScheduler, index: int, is_correct: bool) -> None:
+        """Reschedule the answered question and queue the packed records for writing"""
+        scheduler.record_answer(index, is_correct)
+        user_repository.save_reviews(user_id, scheduler.state.to_bytes())
+
+
+# Global instance
+learning_store = LearningStore()
@@ -0,0 +1,313 @@
+"""In-memory stand-in for the Firestore AsyncClient
+
+Implements the subset of the client API used in lidtgbot.database
+(collection, document, subcollection, get, set, update, batch, get_all,
+stream, select, where, order_by, start_after, limit, collection_group,
+count/sum aggregations and Increment transforms), with optional simulated
+latency per RPC and a counter for every operation. Enabled with
+FIRESTORE_BACKEND=memory.
+"""
+import copy
+import asyncio
+from collections import Counter
+from typing import Any, AsyncIterator, Iterable
+
+
+def _is_increment(value: Any) -> bool:
+    # firestore Increment transforms, matched by name to avoid importing the client
+    return type(value).__name__ == 'Increment' and hasattr(value, 'value')
+
+
+def _merge(target: dict[str, Any], data: dict[str, Any]) -> None:
+    """Merge data into a stored document like set(merge=True): nested maps are
+    merged and Increment transforms add to the stored number"""
+    for key, value in data.items():
+        if _is_increment(value):
+            current = target.get(key)
+            target[key] = (current if isinstance(current, (int, float)) else 0) + value.value
+        elif isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+class MemoryDocumentSnapshot:
+    def __init__(self, reference: 'MemoryDocumentReference', data: dict[str, Any] | None):
+        self.reference = reference
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class MemoryQuery:
+    """A collection or collection group scan, optionally projected, filtered, ordered and paged"""
+
+    def __init__(self, client: 'MemoryFirestore', parent_path: str | None, collection_id: str,
+                 fields: list[str] | None = None, all_descendants: bool = False,
+                 filters: tuple[tuple[str, Any], ...] = (), order: str | None = None,
+                 cursor: Any = None, limit_to: int | None = None):
+        self._client = client
+        self._parent_path = parent_path
+        self._collection_id = collection_id
+        self._fields = fields
+        self._all_descendants = all_descendants
+        self._filters = filters
+        self._order = order
+        self._cursor = cursor
+        self._limit = limit_to
+
+    def _copy(self, **changes: Any) -> 'MemoryQuery':
+        options = {
+            'fields': self._fields, 'all_descendants': self._all_descendants, 'filters': self._filters,
+            'order': self._order, 'cursor': self._cursor, 'limit_to': self._limit,
+        }
+        return MemoryQuery(self._client, self._parent_path, self._collection_id, **{**options, **changes})
+
+    def select(self, field_paths: Iterable[str]) -> 'MemoryQuery':
+        return self._copy(fields=list(field_paths))
+
+    def where(self, field_path: str | None = None, op_string: str | None = None, value: Any = None,
+              *, filter: Any = None) -> 'MemoryQuery':
+        """Only equality filters are supported, given directly or as a FieldFilter"""
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string != '==':
+            raise NotImplementedError(f"Unsupported filter operator {op_string!r}")
+        return self._copy(filters=self._filters + ((field_path, value),))
+
+    def order_by(self, field_path: str) -> 'MemoryQuery':
+        """Ordering by a single field (ascending), '__name__' orders by document ID"""
+        return self._copy(order=field_path)
+
+    def start_after(self, document_fields: dict[str, Any]) -> 'MemoryQuery':
+        if self._order is None:
+            raise ValueError("A cursor requires order_by()")
+        return self._copy(cursor=document_fields[self._order])
+
+    def limit(self, count: int) -> 'MemoryQuery':
+        return self._copy(limit_to=count)
+
+    def count(self, alias: str | None = None) -> 'MemoryAggregationQuery':
+        return MemoryAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str | None = None) -> 'MemoryAggregationQuery':
+        return MemoryAggregationQuery(self).sum(field_ref, alias)
+
+    def _matches(self, path: str) -> bool:
+        parts = path.split('/')
+        if parts[-2] != self._collection_id:
+            return False
+        data = self._client._documents[path]
+        if any(data.get(field) != value for field, value in self._filters):
+            return False
+        if self._all_descendants:
+            # Collection group: any collection with this ID at any depth
+            return True
+        return '/'.join(parts[:-2]) == (self._parent_path or '')
+
+    def _sort_key(self, path: str) -> Any:
+        if self._order == '__name__':
+            return path.rsplit('/', 1)[-1]
+        return self._client._documents[path].get(self._order)
+
+    def _paths(self) -> list[str]:
+        paths = [path for path in sorted(self._client._documents) if self._matches(path)]
+        if self._order is not None:
+            paths.sort(key=self._sort_key)
+            if self._cursor is not None:
+                paths = [path for path in paths if self._sort_key(path) > self._cursor]
+        if self._limit is not None:
+            paths = paths[:self._limit]
+        return paths
+
+    async def stream(self) -> AsyncIterator[MemoryDocumentSnapshot]:
+        await self._client._rpc('stream')
+        for path in self._paths():
+            data = self._client._documents[path]
+            if self._fields is not None:
+                data = {key: value for key, value in data.items() if key in self._fields}
+            self._client.ops['read'] += 1
+            yield MemoryDocumentSnapshot(self._client._reference(path), data)
+
+
+class MemoryAggregationResult:
+    def __init__(self, alias: str, value: float):
+        self.alias = alias
+        self.value = value
+
+
+class MemoryAggregationQuery:
+    """count() and sum() over the documents matching a query, in one round trip"""
+
+    def __init__(self, query: MemoryQuery):
+        self._query = query
+        self._aggregations: list[tuple[str, str | None]] = []
+
+    def count(self, alias: str | None = None) -> 'MemoryAggregationQuery':
+        self._aggregations.append((alias or f"field_{len(self._aggregations) + 1}", None))
+        return self
+
+    def sum(self, field_ref: str, alias: str | None = None) -> 'MemoryAggregationQuery':
+        self._aggregations.append((alias or f"field_{len(self._aggregations) + 1}", field_ref))
+        return self
+
+    async def get(self) -> list[list[MemoryAggregationResult]]:
+        client = self._query._client
+        await client._rpc('aggregate')
+        documents = [client._documents[path] for path in self._query._paths()]
+        # Firestore bills one read per batch of up to 1000 index entries
+        client.ops['read'] += max(1, -(-len(documents) // 1000))
+        results = []
+        for alias, field in self._aggregations:
+            if field is None:
+                value = len(documents)
+            else:
+                value = sum(data.get(field) or 0 for data in documents
+                            if isinstance(data.get(field), (int, float)))
+            results.append(MemoryAggregationResult(alias, value))
+        return [results]
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client: 'MemoryFirestore', parent_path: str | None, collection_id: str):
+        super().__init__(client, parent_path, collection_id)
+        self.id = collection_id
+        self.path = f"{parent_path}/{collection_id}" if parent_path else collection_id
+
+    @property
+    def parent(self) -> 'MemoryDocumentReference | None':
+        return self._client._reference(self._parent_path) if self._parent_path else None
+
+    def document(self, document_id: str) -> 'MemoryDocumentReference':
+        return MemoryDocumentReference(self._client, self, document_id)
+
+
+class MemoryDocumentReference:
+    def __init__(self, client: 'MemoryFirestore', parent: MemoryCollectionReference, document_id: str):
+        self._client = client
+        self.parent = parent
+        self.id = document_id
+        self.path = f"{parent.path}/{document_id}"
+
+    def collection(self, collection_id: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self._client, self.path, collection_id)
+
+    async def get(self, field_paths: list[str] | None = None) -> MemoryDocumentSnapshot:
+        await self._client._rpc('get')
+        self._client.ops['read'] += 1
+        data = self._client._documents.get(self.path)
+        if data is not None and field_paths is not None:
+            data = {key: value for key, value in data.items() if key in field_paths}
+        return MemoryDocumentSnapshot(self, data)
+
+    async def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        await self._client._rpc('set')
+        self._client._write(self.path, data, merge)
+
+    async def update(self, data: dict[str, Any]) -> None:
+        await self._client._rpc('update')
+        if self.path not in self._client._documents:
+            raise KeyError(f"No document to update: {self.path}")
+        self._client._write(self.path, data, merge=True)
+
+
+class MemoryWriteBatch:
+    def __init__(self, client: 'MemoryFirestore'):
+        self._client = client
+        # Data None deletes the document
+        self._writes: list[tuple[str, dict[str, Any] | None, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference: MemoryDocumentReference, data: dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((reference.path, data, merge))
+
+    def update(self, reference: MemoryDocumentReference, data: dict[str, Any]) -> None:
+        self._writes.append((reference.path, data, True))
+
+    def delete(self, reference: MemoryDocumentReference) -> None:
+        self._writes.append((reference.path, None, False))
+
+    async def commit(self) -> None:
+        if len(self._writes) > 500:
+            raise ValueError("A write batch can contain at most 500 operations")
+        await self._client._rpc('commit')
+        for path, data, merge in self._writes:
+            if data is None:
+                self._client._delete(path)
+            else:
+                self._client._write(path, data, merge)
+        self._writes = []
+
+
+class MemoryFirestore:
+    """In-memory Firestore with per-RPC latency and operation counters"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        # 'get', 'set', 'update', 'commit', 'get_all', 'stream', 'aggregate' count RPCs,
+        # 'read' and 'write' count documents
+        self.ops: Counter[str] = Counter()
+        self._documents: dict[str, dict[str, Any]] = {}
+
+    def reset_counters(self) -> None:
+        self.ops.clear()
+
+    @property
+    def rpcs(self) -> int:
+        """Number of round trips made so far"""
+        return sum(count for op, count in self.ops.items() if op not in ('read', 'write'))
+
+    async def _rpc(self, op: str) -> None:
+        self.ops[op] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            # Still yield to the event loop like a real RPC would
+            await asyncio.sleep(0)
+
+    def _reference(self, path: str) -> MemoryDocumentReference:
+        parts = path.split('/')
+        collection = MemoryCollectionReference(self, '/'.join(parts[:-2]) or None, parts[-2])
+        return collection.document(parts[-1])
+
+    def _write(self, path: str, data: dict[str, Any], merge: bool) -> None:
+        self.ops['write'] += 1
+        if not merge or path not in self._documents:
+            self._documents[path] = {}
+        _merge(self._documents[path], data)
+
+    def _delete(self, path: str) -> None:
+        self.ops['write'] += 1
+        self._documents.pop(path, None)
+
+    def collection(self, collection_id: str) -> MemoryCollectionReference:
+        return MemoryCollectionReference(self, None, collection_id)
+
+    def collection_group(self, collection_id: str) -> MemoryQuery:
+        return MemoryQuery(self, None, collection_id, all_descendants=True)
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    async def get_all(self, references: list[MemoryDocumentReference],
+                      field_paths: list[str] | None = None) -> AsyncIterator[MemoryDocumentSnapshot]:
+        await self._rpc('get_all')
+        for reference in references:
+            self.ops['read'] += 1
+            yield MemoryDocumentSnapshot(reference, self._documents.get(reference.path))
@@ -0,0 +1,283 @@
+import copy
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any
+from telegram.ext import BasePersistence, PersistenceInput
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.settings.config import PERSISTENCE_CACHE_SIZE, PERSISTENCE_FLUSH_INTERVAL
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference, AsyncWriteBatch
+    from telegram.ext._utils.types import CDCData, ConversationDict, ConversationKey
+
+logger = logging.getLogger(__name__)
+
+USER_DATA_COLLECTION = 'user_data'
+CHAT_DATA_COLLECTION = 'chat_data'
+CONVERSATIONS_COLLECTION = 'conversations'
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+
+class DataStore:
+    """
+    Lazily loaded, dirty-tracked data dicts of one collection, keyed by user or chat ID.
+
+    A document is read the first time its ID is seen in this process. The last
+    loaded or written contents of up to maxsize recently used IDs are kept, so
+    data that PTB hands back unchanged costs no write; changed data is queued
+    until the next flush. An evicted ID is read again on its next update. If a
+    read fails, the update runs with the data in memory and the read is
+    retried on the next one.
+    """
+
+    def __init__(self, collection_name: str, maxsize: int = PERSISTENCE_CACHE_SIZE):
+        self.collection_name = collection_name
+        self.maxsize = maxsize
+        self._collection: 'AsyncCollectionReference | None' = None
+        # Contents as stored in Firestore, least recently used first
+        self._persisted: OrderedDict[int, dict[str, Any]] = OrderedDict()
+        # Changes not yet written; None deletes the document
+        self._dirty: dict[int, dict[str, Any] | None] = {}
+        self._loading: dict[int, asyncio.Future[dict[str, Any]]] = {}
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection(self.collection_name)
+        return self._collection
+
+    @instrumented
+    async def _load(self, key: int) -> dict[str, Any]:
+        try:
+            doc = await firestore_client.get(self.collection.document(str(key)))
+            stored = (doc.to_dict() or {}).get('data') or {}
+            self._remember(key, copy.deepcopy(stored))
+            return stored
+        except Exception as e:
+            logger.error(f"Failed to load {self.collection_name} of {key}: {e}")
+            raise
+
+    def _remember(self, key: int, stored: dict[str, Any]) -> None:
+        """Keep the stored contents of a key, evicting the least recently used when full"""
+        self._persisted[key] = stored
+        self._persisted.move_to_end(key)
+        while len(self._persisted) > self.maxsize:
+            self._persisted.popitem(last=False)
+
+    async def refresh(self, key: int, data: dict[str, Any]) -> None:
+        """Fill data with the stored contents on first access; values already set in memory win"""
+        if key in self._persisted:
+            self._persisted.move_to_end(key)
+            return
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(self._load(key))
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        try:
+            # Concurrent updates of one chat share the read, cancelling one must not cancel it
+            stored = await asyncio.shield(task)
+        except Exception:
+            # Already logged by _load; writes of an unloaded key only merge fields, so nothing is lost
+            logger.warning(f"Processing an update with unloaded {self.collection_name} of {key}")
+            return
+        for field, value in stored.items():
+            data.setdefault(field, value)
+
+    def stage(self, key: int, data: dict[str, Any]) -> None:
+        """Queue data for writing unless it equals what is stored or queued already"""
+        latest = self._dirty[key] if key in self._dirty else self._persisted.get(key)
+        if data != latest:
+            self._dirty[key] = data
+
+    def drop(self, key: int) -> None:
+        """Queue the deletion of a document"""
+        self._dirty[key] = None
+
+    def take(self) -> dict[int, dict[str, Any] | None]:
+        """Remove and return all queued changes"""
+        dirty, self._dirty = self._dirty, {}
+        return dirty
+
+    def add_to_batch(self, batch: 'AsyncWriteBatch', key: int, data: dict[str, Any] | None) -> None:
+        doc_ref = self.collection.document(str(key))
+        if data is None:
+            batch.delete(doc_ref)
+        elif key in self._persisted:
+            batch.set(doc_ref, {'data': data})
+        else:
+            # Never loaded here, so only add fields instead of replacing unknown stored data
+            batch.set(doc_ref, {'data': data}, merge=True)
+
+    def written(self, key: int, data: dict[str, Any] | None) -> None:
+        """Record a committed write"""
+        if data is None:
+            self._remember(key, {})
+        elif key in self._persisted:
+            self._remember(key, data)
+
+    def requeue(self, key: int, data: dict[str, Any] | None) -> None:
+        """Queue a write again after a failed commit, unless newer data was queued meanwhile"""
+        self._dirty.setdefault(key, data)
+
+
+class FirestorePersistence(BasePersistence[dict, dict, dict]):
+    """
+    PTB persistence of user_data, chat_data and conversation states in Firestore.
+
+    Data is loaded per user or chat on the first update that needs it, via
+    refresh_user_data/refresh_chat_data, instead of all at startup. PTB hands
+    back a copy of the data of every user and chat it processed updates for;
+    only data that actually changed is queued, and a background task writes
+    the queue every PERSISTENCE_FLUSH_INTERVAL seconds as WriteBatch commits
+    of up to 500 documents.
+
+    bot_data and callback data are shared by all processes and are not
+    persisted. Conversation states of a ConversationHandler are read when it
+    is added, as PTB requires.
+    """
+
+    def __init__(self, flush_interval: float = PERSISTENCE_FLUSH_INTERVAL):
+        super().__init__(store_data=PersistenceInput(bot_data=False, callback_data=False),
+                         update_interval=flush_interval)
+        self.flush_interval = flush_interval
+        self.user_data = DataStore(USER_DATA_COLLECTION)
+        self.chat_data = DataStore(CHAT_DATA_COLLECTION)
+        self._conversations: dict[tuple[str, 'ConversationKey'], object | None] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    @property
+    def conversations_collection(self) -> 'AsyncCollectionReference':
+        return firestore_client.db.collection(CONVERSATIONS_COLLECTION)
+
+    @staticmethod
+    def _conversation_id(name: str, key: 'ConversationKey') -> str:
+        return f"{name}:{'_'.join(str(part) for part in key)}"
+
+    async def get_user_data(self) -> dict[int, dict]:
+        # Loaded per user in refresh_user_data
+        return {}
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        # Loaded per chat in refresh_chat_data
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> 'CDCData | None':
+        return None
+
+    @instrumented
+    async def get_conversations(self, name: str) -> 'ConversationDict':
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        try:
+            query = self.conversations_collection.where(filter=FieldFilter('name', '==', name))
+            conversations = {}
+            async for doc in firestore_client.stream(query):
+                data = doc.to_dict() or {}
+                conversations[tuple(data['key'])] = data['state']
+            return conversations
+        except Exception as e:
+            logger.error(f"Failed to load conversations of {name}: {e}")
+            raise
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self.user_data.refresh(user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self.chat_data.refresh(chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self.user_data.stage(user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self.chat_data.stage(chat_id, data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data: 'CDCData') -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: 'ConversationKey',
+                                  new_state: object | None) -> None:
+        self._conversations[(name, key)] = new_state
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.user_data.drop(user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self.chat_data.drop(chat_id)
+
+    @instrumented
+    async def flush(self) -> None:
+        """Write all queued changes in batches"""
+        writes: list[tuple[DataStore | None, Any, Any]] = [
+            (store, key, data) for store in (self.user_data, self.chat_data)
+            for key, data in store.take().items()
+        ]
+        conversations, self._conversations = self._conversations, {}
+        writes += [(None, key, state) for key, state in conversations.items()]
+        if not writes:
+            return
+
+        for start in range(0, len(writes), MAX_BATCH_SIZE):
+            chunk = writes[start:start + MAX_BATCH_SIZE]
+            batch = firestore_client.db.batch()
+            for store, key, data in chunk:
+                if store is not None:
+                    store.add_to_batch(batch, key, data)
+                    continue
+                name, conversation_key = key
+                doc_ref = self.conversations_collection.document(self._conversation_id(name, conversation_key))
+                if data is None:
+                    batch.delete(doc_ref)
+                else:
+                    batch.set(doc_ref, {'name': name, 'key': list(conversation_key), 'state': data})
+            try:
+                await firestore_client.commit(batch)
+                for store, key, data in chunk:
+                    if store is not None:
+                        store.written(key, data)
+                logger.debug(f"Flushed persistence data of {len(chunk)} users, chats and conversations")
+            except Exception as e:
+                logger.error(f"Failed to flush persistence data of {len(chunk)} documents: {e}")
+                # Re-queue, letting changes queued in the meantime win
+                for store, key, data in chunk:
+                    if store is not None:
+                        store.requeue(key, data)
+                    else:
+                        self._conversations.setdefault(key, data)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing periodically in the background"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out everything still queued"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+
+# Global instance
+firestore_persistence = FirestorePersistence()
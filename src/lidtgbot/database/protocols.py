@@ -0,0 +1,123 @@
+"""Interfaces of the storage backends
+
+The Firestore repositories and the SQLite backend (STORAGE_BACKEND=sqlite)
+both implement these, and the global instances in lidtgbot.database are
+created for the configured backend.
+"""
+from typing import AsyncIterator, Literal, Mapping, Protocol
+from lidtgbot.models.user import User
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import Translation, LanguageCode
+from lidtgbot.models.federal_state import FederalState
+from lidtgbot.models.quiz_session import QuizSession
+from lidtgbot.models.stats import QuestionStats, UsageStats
+
+
+class UserStore(Protocol):
+    async def ensure_user(self, user_id: int, first_name: str, username: str | None = None,
+                          last_name: str | None = None, language_code: str | None = None,
+                          update_activity: bool = False) -> User: ...
+
+    async def get_user(self, user_id: int) -> User | None: ...
+
+    async def get_users(self, user_ids: list[int]) -> list[User | None]: ...
+
+    async def get_or_create_user(self, user_id: int, first_name: str, username: str | None = None,
+                                 last_name: str | None = None, language_code: str | None = None) -> User: ...
+
+    async def update_federal_state(self, user_id: int, federal_state: FederalState | None) -> None: ...
+
+    async def add_questions_answered(self, user: User, count: int = 1) -> User: ...
+
+    async def record_answer(self, user: User, num: str, is_correct: bool) -> User: ...
+
+    async def get_reviews(self, user_id: int) -> bytes | None: ...
+
+    def save_reviews(self, user_id: int, reviews: bytes) -> None: ...
+
+    async def update_user_activity(self, user_id: int) -> None: ...
+
+    async def get_users_page(self, federal_state: FederalState | None = None,
+                             language_code: str | None = None, page_size: int = 500,
+                             start_after: str | None = None) -> list[User]: ...
+
+    def iter_user_pages(self, federal_state: FederalState | None = None,
+                        language_code: str | None = None, page_size: int = 500,
+                        start_after: str | None = None) -> AsyncIterator[list[User]]: ...
+
+    def start(self) -> None:
+        """Start background work, e.g. flushing buffered writes"""
+
+    async def stop(self) -> None:
+        """Stop background work and write out everything pending"""
+
+
+class StatsStore(Protocol):
+    """Usage statistics; the record_* calls are made by the user repository"""
+
+    def record_new_user(self, federal_state: str | None, language_code: str | None) -> None: ...
+
+    def record_federal_state_change(self, old: str | None, new: str | None) -> None: ...
+
+    def record_language_change(self, old: str | None, new: str | None) -> None: ...
+
+    def record_answers(self, count: int = 1) -> None: ...
+
+    async def get_stats(self) -> UsageStats: ...
+
+    async def rebuild(self) -> UsageStats: ...
+
+    def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class QuestionStatsStore(Protocol):
+    """Global per-question answer counters"""
+
+    def record_answer(self, num: str, is_correct: bool) -> None: ...
+
+    async def get_question_stats(self, num: str) -> QuestionStats: ...
+
+    def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+
+class SessionCheckpoints(Protocol):
+    """Where quiz sessions are checkpointed"""
+
+    async def read(self, user_id: int) -> tuple[bytes, str | None] | None:
+        """Packed state and catalog version of the user's last checkpoint"""
+
+    async def write(self, sessions: list[QuizSession]) -> None:
+        """Write the sessions in one transaction or batch"""
+
+
+class QuestionStore(Protocol):
+    async def create_question(self, num: str, solution: Literal['a', 'b', 'c', 'd'], category: str,
+                              image: str | None = None) -> Question: ...
+
+    async def get_question(self, num: str) -> Question | None: ...
+
+    async def get_questions(self, nums: list[str]) -> list[Question | None]: ...
+
+
+class TranslationStore(Protocol):
+    """Translations of one question"""
+    num: str
+
+    async def create_translation(self, language_code: LanguageCode, question: str, context: str,
+                                 option_a: str, option_b: str, option_c: str,
+                                 option_d: str) -> Translation: ...
+
+    async def get_translation(self, language_code: LanguageCode) -> Translation | None: ...
+
+
+class CatalogSource(Protocol):
+    """Where the question bank loads the whole catalog from"""
+
+    async def fetch_version(self) -> str | None: ...
+
+    async def fetch_catalog(self) -> tuple[Mapping[str, Question],
+                                           Mapping[tuple[str, LanguageCode], Translation]]: ...
@@ -1,9 +1,16 @@
 import logging
 from datetime import datetime, timezone
-from typing import Literal
-from google.cloud.firestore import CollectionReference
+from typing import TYPE_CHECKING, Literal
 from lidtgbot.models.question import Question
 from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.converters import question_from_dict
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.protocols import QuestionStore
+from lidtgbot.settings.config import STORAGE_BACKEND
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
 
 logger = logging.getLogger(__name__)
 
@@ -12,10 +19,16 @@ class QuestionRepository:
     """Repository for question operations with Firestore"""
     
     def __init__(self):
-        if not firestore_client.is_initialized or firestore_client.db is None:
-            raise RuntimeError("Firestore client is not initialized")
-        self.collection: CollectionReference = firestore_client.db.collection('questions')
+        self._collection: 'AsyncCollectionReference | None' = None
+    
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The questions collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection('questions')
+        return self._collection
     
+    @instrumented
     async def create_question(self, num: str, 
                               solution: Literal['a', 'b', 'c', 'd'], 
                               category: str,
@@ -34,7 +47,7 @@ class QuestionRepository:
             
             # Use question number as document ID for easy retrieval
             doc_ref = self.collection.document(num)
-            doc_ref.set(question_data)
+            await firestore_client.set(doc_ref, question_data)
             
             logger.info(f"Question {num} created successfully")
             return Question(**question_data)
@@ -43,32 +56,52 @@ class QuestionRepository:
             logger.error(f"Failed to create question {num}: {e}")
             raise
     
+    @instrumented
     async def get_question(self, num: str) -> Question | None:
-        """Get question by num"""
+        """Get question by num, served from the question bank once it is loaded"""
+        if question_bank.is_loaded:
+            return question_bank.get_question(num)
         try:
             doc_ref = self.collection.document(num)
-            doc = doc_ref.get()
+            doc = await firestore_client.get(doc_ref)
             
             if doc.exists:
                 data = doc.to_dict()
                 if data is None:
                     return None
                 
-                # Convert Firestore data to Question object
-                return Question(
-                    num=data['num'],
-                    solution=data['solution'],
-                    category=data['category'],
-                    image=data.get('image', None),
-                    created_at=data['created_at'],
-                    updated_at=data['updated_at']
-                )
+                return question_from_dict(data)
             return None
         
         except Exception as e:
             logger.error(f"Failed to get question {num}: {e}")
             raise    
+    
+    @instrumented
+    async def get_questions(self, nums: list[str]) -> list[Question | None]:
+        """Get questions by num in request order, with get_all unless the question bank is loaded"""
+        if question_bank.is_loaded:
+            return [question_bank.get_question(num) for num in nums]
+        try:
+            docs = await firestore_client.get_many(self.collection.document(num) for num in nums)
+            questions = []
+            for doc in docs:
+                data = doc.to_dict() if doc is not None and doc.exists else None
+                questions.append(question_from_dict(data) if data else None)
+            return questions
+        
+        except Exception as e:
+            logger.error(f"Failed to get {len(nums)} questions: {e}")
+            raise
+
+
+def create_question_repository() -> QuestionStore:
+    """Question repository of the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteQuestionRepository
+        return SqliteQuestionRepository()
+    return QuestionRepository()
 
 
 # Global instance
-question_repository = QuestionRepository()
+question_repository = create_question_repository()
@@ -0,0 +1,240 @@
+import os
+import uuid
+import asyncio
+import inspect
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Mapping
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import Translation, LanguageCode
+from lidtgbot.models.federal_state import FEDERAL_STATES, FederalState
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.converters import question_from_dict, translation_from_dict
+from lidtgbot.database.catalog_file import LazyQuestions
+from lidtgbot.database.protocols import CatalogSource
+from lidtgbot.settings.config import CATALOG_FILE, CATALOG_RELOAD_INTERVAL, STORAGE_BACKEND
+from lidtgbot.metrics import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Document holding the catalog version marker, bumped by every import
+CATALOG_META_COLLECTION = 'meta'
+CATALOG_META_DOCUMENT = 'catalog'
+
+
+class FirestoreCatalogSource:
+    """Reads the catalog from questions/* with their translations subcollections"""
+    
+    @instrumented
+    async def fetch_version(self) -> str | None:
+        """Read the current catalog version marker"""
+        doc_ref = firestore_client.db.collection(CATALOG_META_COLLECTION).document(CATALOG_META_DOCUMENT)
+        doc = await firestore_client.get(doc_ref)
+        if not doc.exists:
+            return None
+        data = doc.to_dict() or {}
+        return data.get('version')
+    
+    @instrumented
+    async def fetch_catalog(self) -> tuple[dict[str, Question], dict[tuple[str, LanguageCode], Translation]]:
+        """Read all questions with one query and all translations with one collection group query"""
+        questions: dict[str, Question] = {}
+        async for doc in firestore_client.stream(firestore_client.db.collection('questions')):
+            data = doc.to_dict()
+            if data is not None:
+                questions[doc.id] = question_from_dict(data)
+        
+        translations: dict[tuple[str, LanguageCode], Translation] = {}
+        async for doc in firestore_client.stream(firestore_client.db.collection_group('translations')):
+            data = doc.to_dict()
+            if data is None:
+                continue
+            # questions/{num}/translations/{lang}
+            num = doc.reference.parent.parent.id
+            translations[(num, data['language_code'])] = translation_from_dict(data)
+        return questions, translations
+
+
+class QuestionBank:
+    """Process-wide in-memory copy of the question catalog
+    
+    Loads the whole catalog once from its source (catalog file, Firestore or
+    SQLite) and indexes it by num, category and language. Every question also gets a stable
+    small integer index (its position in the catalog) so that per-user state
+    can refer to questions compactly. Questions whose category is a federal
+    state code are state questions, all others are general questions. A background task polls the catalog
+    version marker and reloads the bank when it changes.
+    """
+    
+    def __init__(self, source: CatalogSource):
+        self.source = source
+        self.version: str | None = None
+        self._questions: Mapping[str, Question] = {}
+        self._nums: list[str] = []
+        self._index: dict[str, int] = {}
+        self._general_indices: list[int] = []
+        self._state_indices: dict[FederalState, list[int]] = {}
+        self._by_category: dict[str, list[str]] = {}
+        self._translations: Mapping[tuple[str, LanguageCode], Translation] = {}
+        self._loaded = False
+        self._reload_task: asyncio.Task | None = None
+        self._listeners: list[Callable[['QuestionBank'], Awaitable[None] | None]] = []
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Check if the catalog has been loaded"""
+        return self._loaded
+    
+    @property
+    def nums(self) -> list[str]:
+        """All question numbers in catalog index order"""
+        return list(self._nums)
+    
+    @property
+    def categories(self) -> list[str]:
+        """All known question categories"""
+        return list(self._by_category)
+    
+    def get_question(self, num: str) -> Question | None:
+        """Get question by num"""
+        return self._questions.get(num)
+    
+    def get_translation(self, num: str, language_code: LanguageCode) -> Translation | None:
+        """Get translation of a question by language code"""
+        return self._translations.get((num, language_code))
+    
+    def nums_in_category(self, category: str) -> list[str]:
+        """Get numbers of all questions in a category"""
+        return self._by_category.get(category, [])
+    
+    def index_of(self, num: str) -> int | None:
+        """Get the catalog index of a question"""
+        return self._index.get(num)
+    
+    def num_at(self, index: int) -> str:
+        """Get the question number at a catalog index"""
+        return self._nums[index]
+    
+    @property
+    def general_indices(self) -> list[int]:
+        """Catalog indexes of all general questions"""
+        return self._general_indices
+    
+    def state_indices(self, federal_state: FederalState) -> list[int]:
+        """Catalog indexes of the questions of one federal state"""
+        return self._state_indices.get(federal_state, [])
+    
+    def relevant_indices(self, federal_state: FederalState | None) -> list[int]:
+        """Catalog indexes of the questions a user of a federal state can get in the test"""
+        if federal_state is None:
+            return self._general_indices
+        return self._general_indices + self.state_indices(federal_state)
+    
+    def add_reload_listener(self, listener: Callable[['QuestionBank'], Awaitable[None] | None]) -> None:
+        """Register a callback, or coroutine function, invoked after every (re)load, e.g. to rebuild derived indexes"""
+        self._listeners.append(listener)
+    
+    async def load(self) -> None:
+        """Load the whole catalog from the source and swap in new indexes"""
+        try:
+            version = await self.source.fetch_version()
+            questions, translations = await self.source.fetch_catalog()
+            
+            nums = sorted(questions)
+            # Catalog file questions stay undecoded, their index has the categories
+            category_of: Callable[[str], str] = (
+                questions.category if isinstance(questions, LazyQuestions)
+                else lambda num: questions[num].category
+            )
+            by_category: dict[str, list[str]] = {}
+            general_indices: list[int] = []
+            state_indices: dict[FederalState, list[int]] = {}
+            for index, num in enumerate(nums):
+                category = category_of(num)
+                by_category.setdefault(category, []).append(num)
+                if category in FEDERAL_STATES:
+                    state_indices.setdefault(category, []).append(index)
+                else:
+                    general_indices.append(index)
+            
+            # Swap all indexes at once so readers never see a half-loaded bank
+            self._questions = questions
+            self._nums = nums
+            self._index = {num: index for index, num in enumerate(nums)}
+            self._general_indices = general_indices
+            self._state_indices = state_indices
+            self._translations = translations
+            self._by_category = by_category
+            self.version = version
+            self._loaded = True
+            logger.info(f"Question bank loaded: {len(questions)} questions, "
+                        f"{len(translations)} translations, version {version}")
+        
+        except Exception as e:
+            logger.error(f"Failed to load question bank: {e}")
+            raise
+        
+        for listener in self._listeners:
+            result = listener(self)
+            if inspect.isawaitable(result):
+                await result
+    
+    async def refresh(self) -> bool:
+        """Reload the catalog if the version marker changed. Returns True if reloaded"""
+        version = await self.source.fetch_version()
+        if self._loaded and version == self.version:
+            return False
+        await self.load()
+        return True
+    
+    async def _reload_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                # Keep serving the current copy, try again on the next tick
+                logger.error(f"Question bank reload failed: {e}")
+    
+    def start(self, interval: float = CATALOG_RELOAD_INTERVAL) -> None:
+        """Start polling the version marker in the background"""
+        if self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._reload_loop(interval))
+    
+    async def stop(self) -> None:
+        """Stop the background reload task"""
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            try:
+                await self._reload_task
+            except asyncio.CancelledError:
+                pass
+            self._reload_task = None
+
+
+@instrumented
+async def bump_catalog_version() -> str:
+    """Write a new catalog version marker so running bots reload their question bank"""
+    version = uuid.uuid4().hex
+    doc_ref = firestore_client.db.collection(CATALOG_META_COLLECTION).document(CATALOG_META_DOCUMENT)
+    await firestore_client.set(doc_ref, {
+        'version': version,
+        'updated_at': datetime.now(timezone.utc),
+    })
+    logger.info(f"Catalog version bumped to {version}")
+    return version
+
+
+def create_catalog_source() -> CatalogSource:
+    """The catalog file if there is one, otherwise the configured storage backend"""
+    if CATALOG_FILE and os.path.exists(CATALOG_FILE):
+        from lidtgbot.database.catalog_file import MmapCatalogSource
+        return MmapCatalogSource(CATALOG_FILE)
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteCatalogSource
+        return SqliteCatalogSource()
+    return FirestoreCatalogSource()
+
+
+# Global instance
+question_bank = QuestionBank(create_catalog_source())
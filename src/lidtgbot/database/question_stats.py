@@ -0,0 +1,128 @@
+import random
+import asyncio
+import logging
+from collections import Counter
+from typing import TYPE_CHECKING
+from lidtgbot.models.stats import QuestionStats
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.protocols import QuestionStatsStore
+from lidtgbot.settings.config import QUESTION_STATS_SHARDS, STORAGE_BACKEND, USER_FLUSH_INTERVAL
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
+
+logger = logging.getLogger(__name__)
+
+# question_stats/{num}/shards/{0..QUESTION_STATS_SHARDS-1}
+QUESTION_STATS_COLLECTION = 'question_stats'
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+
+class QuestionStatsRepository:
+    """
+    Global per-question answer counters.
+
+    Answers are counted in memory and flushed periodically, one Increment
+    write per answered question into a random one of its shards, in batches
+    of up to 500 questions. No answer ever needs a read or a transaction, and
+    the shards spread the writes of many processes to a hot question.
+    """
+
+    def __init__(self, shards: int = QUESTION_STATS_SHARDS, flush_interval: float = USER_FLUSH_INTERVAL):
+        self._collection: 'AsyncCollectionReference | None' = None
+        self.shards = max(shards, 1)
+        self.flush_interval = flush_interval
+        # num -> ('answered' | 'correct') -> delta
+        self._pending: dict[str, Counter[str]] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The question stats collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection(QUESTION_STATS_COLLECTION)
+        return self._collection
+
+    def _shards(self, num: str) -> 'AsyncCollectionReference':
+        return self.collection.document(num).collection('shards')
+
+    def record_answer(self, num: str, is_correct: bool) -> None:
+        counts = self._pending.setdefault(num, Counter())
+        counts['answered'] += 1
+        if is_correct:
+            counts['correct'] += 1
+
+    @instrumented
+    async def flush(self) -> None:
+        """Write all pending counts as Increment transforms"""
+        from google.cloud.firestore_v1.transforms import Increment
+
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        items = list(pending.items())
+        for start in range(0, len(items), MAX_BATCH_SIZE):
+            chunk = items[start:start + MAX_BATCH_SIZE]
+            batch = firestore_client.db.batch()
+            for num, counts in chunk:
+                shard = self._shards(num).document(str(random.randrange(self.shards)))
+                batch.set(shard, {field: Increment(delta) for field, delta in counts.items()}, merge=True)
+            try:
+                await firestore_client.commit(batch)
+            except Exception as e:
+                logger.error(f"Failed to flush answer counters of {len(chunk)} questions: {e}")
+                for num, counts in chunk:
+                    self._pending.setdefault(num, Counter()).update(counts)
+
+    @instrumented
+    async def get_question_stats(self, num: str) -> QuestionStats:
+        """Sum up the shards of a question, plus the answers of this process not flushed yet"""
+        try:
+            stats = QuestionStats(num)
+            async for doc in firestore_client.stream(self._shards(num)):
+                data = doc.to_dict() or {}
+                stats.answered += data.get('answered', 0)
+                stats.correct += data.get('correct', 0)
+            pending = self._pending.get(num, {})
+            stats.answered += pending.get('answered', 0)
+            stats.correct += pending.get('correct', 0)
+            return stats
+
+        except Exception as e:
+            logger.error(f"Failed to get answer counters of question {num}: {e}")
+            raise
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing periodically in the background"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out the pending counts"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+
+def create_question_stats_repository() -> QuestionStatsStore:
+    """Answer counters of the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteQuestionStatsRepository
+        return SqliteQuestionStatsRepository()
+    return QuestionStatsRepository()
+
+
+# Global instance
+question_stats_repository = create_question_stats_repository()
@@ -0,0 +1,196 @@
+import time
+import random
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+from array import array
+from datetime import datetime, timezone
+from lidtgbot.models.exam import ExamPaper
+from lidtgbot.models.quiz_session import QuizSession
+from lidtgbot.database.exam import exam_generator
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.protocols import SessionCheckpoints
+from lidtgbot.settings.config import QUIZ_CHECKPOINT_EVERY, QUIZ_IDLE_TIMEOUT, STORAGE_BACKEND
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
+
+logger = logging.getLogger(__name__)
+
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+
+class FirestoreSessionCheckpoints:
+    """Quiz session checkpoints in the quiz_sessions collection"""
+
+    def __init__(self):
+        self._collection: 'AsyncCollectionReference | None' = None
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The quiz sessions collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection('quiz_sessions')
+        return self._collection
+
+    async def read(self, user_id: int) -> tuple[bytes, str | None] | None:
+        doc = await firestore_client.get(self.collection.document(str(user_id)))
+        data = doc.to_dict() if doc.exists else None
+        if data is None:
+            return None
+        return data['state'], data.get('catalog_version')
+
+    async def write(self, sessions: list[QuizSession]) -> None:
+        now = datetime.now(timezone.utc)
+        batch = firestore_client.db.batch()
+        for session in sessions:
+            batch.set(self.collection.document(str(session.user_id)), {
+                'state': session.to_bytes(),
+                'catalog_version': session.catalog_version,
+                'updated_at': now,
+            })
+        await firestore_client.commit(batch)
+
+
+class QuizSessionStore:
+    """
+    In-memory quiz sessions with checkpointed persistence.
+
+    Sessions are read from the checkpoints (Firestore or SQLite) once per
+    process and then only kept in memory. A session is written back in the background every
+    QUIZ_CHECKPOINT_EVERY answers, and together with all other idle sessions
+    once it has not been touched for QUIZ_IDLE_TIMEOUT seconds, after which
+    it is dropped from memory. Answering a question therefore never waits
+    for the database.
+    """
+
+    def __init__(self, checkpoints: SessionCheckpoints | None = None,
+                 checkpoint_every: int = QUIZ_CHECKPOINT_EVERY, idle_timeout: float = QUIZ_IDLE_TIMEOUT):
+        self.checkpoints = checkpoints if checkpoints is not None else FirestoreSessionCheckpoints()
+        self.checkpoint_every = checkpoint_every
+        self.idle_timeout = idle_timeout
+        self._sessions: dict[int, QuizSession] = {}
+        self._idle_task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+
+    @instrumented
+    async def get_session(self, user_id: int) -> QuizSession | None:
+        """Get the user's session from memory, loading the last checkpoint on first access"""
+        session = self._sessions.get(user_id)
+        if session is not None:
+            return session
+        try:
+            stored = await self.checkpoints.read(user_id)
+            if stored is None:
+                return None
+            state, catalog_version = stored
+            session = QuizSession.from_bytes(user_id, state, catalog_version)
+            if session.exam_seed is not None:
+                self._draw_exam_order(session)
+            # Another coroutine may have loaded or started a session meanwhile
+            return self._sessions.setdefault(user_id, session)
+
+        except Exception as e:
+            logger.error(f"Failed to load quiz session for user {user_id}: {e}")
+            raise
+
+    def start_session(self, user_id: int, indices: list[int],
+                      catalog_version: str | None, shuffle: bool = True) -> QuizSession:
+        """Start a new session over the given catalog indexes, in random order unless shuffle is False"""
+        order = array('H', indices)
+        if shuffle:
+            random.shuffle(order)
+        session = QuizSession(user_id=user_id, order=order, catalog_version=catalog_version)
+        # Count the new session as dirty so it is persisted on the next checkpoint
+        session.answers_since_checkpoint = 1
+        self._sessions[user_id] = session
+        return session
+
+    def start_exam(self, user_id: int, paper: ExamPaper) -> QuizSession:
+        """Start an exam session over the paper, in its order; only the seed is persisted"""
+        session = self.start_session(user_id, list(paper.indices), paper.catalog_version, shuffle=False)
+        session.exam_seed = paper.seed
+        session.exam_state = paper.federal_state
+        return session
+
+    @staticmethod
+    def _draw_exam_order(session: QuizSession) -> None:
+        """Draw a loaded exam session's paper again, if the catalog it was drawn from is still current"""
+        if (session.catalog_version == exam_generator.catalog_version
+                and exam_generator.can_draw(session.exam_state)):
+            session.order = exam_generator.paper(session.exam_state, session.exam_seed).indices
+
+    def record_answer(self, session: QuizSession, is_correct: bool) -> None:
+        """Record an answer in memory, checkpointing in the background every N answers"""
+        session.record_answer(is_correct)
+        if session.answers_since_checkpoint >= self.checkpoint_every:
+            task = asyncio.create_task(self.checkpoint([session]))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    @instrumented
+    async def checkpoint(self, sessions: list[QuizSession]) -> None:
+        """Write sessions to the checkpoints in batches"""
+        for start in range(0, len(sessions), MAX_BATCH_SIZE):
+            chunk = sessions[start:start + MAX_BATCH_SIZE]
+            pending = [session.answers_since_checkpoint for session in chunk]
+            for session in chunk:
+                session.answers_since_checkpoint = 0
+            try:
+                await self.checkpoints.write(chunk)
+                logger.debug(f"Checkpointed {len(chunk)} quiz sessions")
+            except Exception as e:
+                logger.error(f"Failed to checkpoint {len(chunk)} quiz sessions: {e}")
+                # Keep them dirty so the next checkpoint retries
+                for session, count in zip(chunk, pending):
+                    session.answers_since_checkpoint += count
+
+    async def checkpoint_idle(self, force: bool = False) -> None:
+        """Checkpoint and evict sessions idle for longer than the timeout (or all, if forced)"""
+        now = time.monotonic()
+        idle = [session for session in self._sessions.values()
+                if force or now - session.last_activity >= self.idle_timeout]
+        if not idle:
+            return
+        await self.checkpoint([session for session in idle if session.answers_since_checkpoint])
+        for session in idle:
+            # Only evict what was persisted and not touched while we were writing
+            if not session.answers_since_checkpoint and self._sessions.get(session.user_id) is session:
+                del self._sessions[session.user_id]
+
+    async def _idle_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self.checkpoint_idle()
+
+    def start(self) -> None:
+        """Start checkpointing idle sessions in the background"""
+        if self._idle_task is None:
+            self._idle_task = asyncio.create_task(self._idle_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and checkpoint every session with unsaved answers"""
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+            try:
+                await self._idle_task
+            except asyncio.CancelledError:
+                pass
+            self._idle_task = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        await self.checkpoint_idle(force=True)
+
+
+def create_quiz_session_store() -> QuizSessionStore:
+    """Quiz sessions checkpointed to the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteSessionCheckpoints
+        return QuizSessionStore(SqliteSessionCheckpoints())
+    return QuizSessionStore()
+
+
+# Global instance
+quiz_session_store = create_quiz_session_store()
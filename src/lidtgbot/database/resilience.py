@@ -0,0 +1,280 @@
+"""Retries, hedged reads and a circuit breaker for Firestore RPCs
+
+The FirestoreClient helpers run every RPC through Resilience.call, so all
+repositories share one policy:
+
+- idempotent calls that fail with a transient error (unavailable, deadline
+  exceeded, internal, too many requests, aborted, connection errors) are
+  retried with full-jitter exponential backoff, as long as the next attempt
+  can start before the call's overall deadline
+- with FIRESTORE_HEDGE_READS, a document read still running after the p95 of
+  the recent reads of its kind is duplicated and the first answer is used
+- after FIRESTORE_BREAKER_FAILURES consecutive transient failures the
+  breaker opens and calls fail fast with CircuitOpenError, which repositories
+  may answer from their caches; after FIRESTORE_BREAKER_RESET seconds one
+  probe call is let through and closes the breaker again if it succeeds
+
+Errors that are not transient (not found, invalid argument, ...) are raised
+right away and count as a healthy answer for the breaker.
+"""
+import time
+import random
+import asyncio
+import logging
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from functools import cache
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from lidtgbot.metrics import metrics
+from lidtgbot.settings.config import (
+    FIRESTORE_BREAKER_FAILURES,
+    FIRESTORE_BREAKER_RESET,
+    FIRESTORE_DEADLINE,
+    FIRESTORE_HEDGE_MIN_DELAY,
+    FIRESTORE_HEDGE_READS,
+    FIRESTORE_RETRY_ATTEMPTS,
+    FIRESTORE_RETRY_BASE_DELAY,
+    FIRESTORE_RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Recent read latencies kept per RPC kind, and the number needed before reads are hedged
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """Firestore is failing fast because the circuit breaker is open"""
+
+
+@cache
+def _transient_errors() -> tuple[type[BaseException], ...]:
+    errors: tuple[type[BaseException], ...] = (TimeoutError, ConnectionError)
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return errors
+    return errors + (
+        exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded,
+        exceptions.InternalServerError,
+        exceptions.TooManyRequests,
+        exceptions.Aborted,
+    )
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error is worth retrying and counts against Firestore's health"""
+    return isinstance(error, _transient_errors())
+
+
+def has_increment(data: dict) -> bool:
+    """Whether a write contains Increment transforms, which must not be applied twice"""
+    for value in data.values():
+        # firestore Increment transforms, matched by name to avoid importing the client
+        if type(value).__name__ == 'Increment':
+            return True
+        if isinstance(value, dict) and has_increment(value):
+            return True
+    return False
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful reads of one kind"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._p95: float | None = None
+        self._stale = 0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._stale += 1
+
+    def p95(self) -> float | None:
+        """p95 of the window, None until there are enough samples"""
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        # Sorting the window on every read would cost more than the hedging saves
+        if self._p95 is None or self._stale >= MIN_LATENCY_SAMPLES:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            self._stale = 0
+        return self._p95
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one probe through per reset timeout"""
+
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    # Values of the firestore_circuit_state gauge
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = FIRESTORE_BREAKER_FAILURES,
+                 reset_timeout: float = FIRESTORE_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Firestore circuit breaker {self.state} -> {state}")
+            self.state = state
+            metrics.set_circuit_state(state, self.STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may go to Firestore now"""
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            self._transition(self.HALF_OPEN)
+        # Half-open: one probe at a time, a probe that never reported back is replaced
+        if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+            return False
+        self._probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_started = None
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+            self._transition(self.OPEN)
+
+
+class Resilience:
+    """Retry, hedging and circuit breaker policy shared by all Firestore calls"""
+
+    def __init__(self, attempts: int = FIRESTORE_RETRY_ATTEMPTS,
+                 base_delay: float = FIRESTORE_RETRY_BASE_DELAY,
+                 max_delay: float = FIRESTORE_RETRY_MAX_DELAY,
+                 deadline: float = FIRESTORE_DEADLINE,
+                 hedge_reads: bool = FIRESTORE_HEDGE_READS,
+                 hedge_min_delay: float = FIRESTORE_HEDGE_MIN_DELAY,
+                 breaker: CircuitBreaker | None = None):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.hedge_reads = hedge_reads
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: defaultdict[str, LatencyWindow] = defaultdict(LatencyWindow)
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before the given retry (1 = first retry)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def _admit(self, rpc: str) -> None:
+        if not self.breaker.allow():
+            metrics.count_firestore_event('firestore_circuit_rejections_total', rpc)
+            raise CircuitOpenError(f"Firestore circuit breaker is open, {rpc} rejected")
+
+    def _record(self, error: Exception) -> bool:
+        """Report a failed call to the breaker, True if the error is transient"""
+        if not is_transient(error):
+            self.breaker.record_success()
+            return False
+        self.breaker.record_failure()
+        return True
+
+    async def call(self, rpc: str, attempt: Callable[[], Awaitable[T]],
+                   idempotent: bool = True, hedge: bool = False) -> T:
+        """
+        Run one Firestore call. attempt starts a fresh RPC each time it is called.
+
+        Args:
+            rpc: RPC kind, for metrics and latency tracking
+            attempt: Coroutine function performing the RPC
+            idempotent: Whether the RPC may be retried after a transient failure
+            hedge: Whether a slow attempt may be duplicated (reads only)
+
+        Raises:
+            CircuitOpenError: The breaker is open
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        retry = 0
+        while True:
+            self._admit(rpc)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    if hedge and self.hedge_reads:
+                        result = await self._hedged(rpc, attempt)
+                    else:
+                        result = await attempt()
+            except Exception as e:
+                if not self._record(e):
+                    raise
+                retry += 1
+                delay = self.backoff(retry)
+                if (not idempotent or retry >= self.attempts or self.breaker.state == CircuitBreaker.OPEN
+                        or loop.time() + delay >= deadline):
+                    raise
+                metrics.count_firestore_event('firestore_retries_total', rpc)
+                logger.warning(f"Firestore {rpc} failed ({e!r}), retry {retry} in {delay * 1000:.0f} ms")
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    @asynccontextmanager
+    async def guard(self, rpc: str) -> AsyncIterator[None]:
+        """Circuit breaker only, for calls that cannot be retried such as streamed queries"""
+        self._admit(rpc)
+        try:
+            yield
+        except Exception as e:
+            self._record(e)
+            raise
+        self.breaker.record_success()
+
+    async def _timed(self, rpc: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        result = await attempt()
+        self._latencies[rpc].observe(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, rpc: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Duplicate the read if it is slower than the recent p95, first success wins"""
+        p95 = self._latencies[rpc].p95()
+        if p95 is None:
+            return await self._timed(rpc, attempt)
+        primary = asyncio.ensure_future(self._timed(rpc, attempt))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(p95, self.hedge_min_delay))
+            if not done:
+                metrics.count_firestore_event('firestore_hedged_reads_total', rpc)
+                tasks.add(asyncio.ensure_future(self._timed(rpc, attempt)))
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            # Every attempt failed, report the first one's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# Global instance
+resilience = Resilience()
@@ -0,0 +1,592 @@
+"""SQLite storage backend for single-node deployments and offline runs
+
+Users, questions, translations, quiz session checkpoints and answer
+counters live in one SQLite file (SQLITE_PATH)
+opened in WAL mode, so reads never wait for writes. All statements are
+constant SQL with parameters and are kept compiled in the connection's
+statement cache. Point reads take microseconds, so they run directly on the
+event loop instead of being buffered or cached like the Firestore reads.
+Usage statistics are counted from the users table when asked for, so there
+are no counters to keep in sync. The catalog import uses executemany upserts
+in a single transaction.
+"""
+import os
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Iterator, Literal
+from lidtgbot.models.user import User
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import Translation, LanguageCode
+from lidtgbot.models.federal_state import FEDERAL_STATES, FederalState
+from lidtgbot.models.quiz_session import QuizSession
+from lidtgbot.models.stats import QuestionStats, UsageStats, federal_state_bucket, language_bucket
+from lidtgbot.models.translation import LANGUAGE_CODES
+from lidtgbot.database.converters import question_from_dict, translation_from_dict, user_from_dict
+from lidtgbot.settings.config import SQLITE_PATH
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    username TEXT,
+    last_name TEXT,
+    language_code TEXT,
+    federal_state TEXT,
+    total_questions_answered INTEGER NOT NULL DEFAULT 0,
+    reviews BLOB,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_federal_state ON users (federal_state, user_id);
+CREATE INDEX IF NOT EXISTS users_language_code ON users (language_code, user_id);
+CREATE TABLE IF NOT EXISTS questions (
+    num TEXT PRIMARY KEY,
+    solution TEXT NOT NULL,
+    category TEXT NOT NULL,
+    image TEXT,
+    image_file_id TEXT,
+    image_file_source TEXT,
+    content_hash TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS translations (
+    num TEXT NOT NULL REFERENCES questions (num),
+    language_code TEXT NOT NULL,
+    question TEXT NOT NULL,
+    context TEXT,
+    option_a TEXT NOT NULL,
+    option_b TEXT NOT NULL,
+    option_c TEXT NOT NULL,
+    option_d TEXT NOT NULL,
+    content_hash TEXT,
+    PRIMARY KEY (num, language_code)
+);
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    user_id INTEGER PRIMARY KEY,
+    state BLOB NOT NULL,
+    catalog_version TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    num TEXT PRIMARY KEY,
+    answered INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+USER_COLUMNS = ('user_id', 'first_name', 'username', 'last_name', 'language_code', 'federal_state',
+                'total_questions_answered', 'created_at', 'updated_at')
+SELECT_USER = f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE user_id = ?"
+INSERT_USER = (f"INSERT INTO users ({', '.join(USER_COLUMNS)}) "
+               f"VALUES ({', '.join(':' + column for column in USER_COLUMNS)})")
+UPDATE_PROFILE = """
+UPDATE users SET first_name = :first_name, username = :username, last_name = :last_name,
+                 language_code = :language_code, updated_at = :updated_at
+WHERE user_id = :user_id
+"""
+UPSERT_QUESTION = """
+INSERT INTO questions (num, solution, category, image, content_hash, created_at, updated_at)
+VALUES (:num, :solution, :category, :image, :content_hash, :now, :now)
+ON CONFLICT (num) DO UPDATE SET
+    solution = excluded.solution, category = excluded.category, image = excluded.image,
+    content_hash = excluded.content_hash, updated_at = excluded.updated_at
+WHERE questions.content_hash IS NOT excluded.content_hash
+"""
+UPSERT_TRANSLATION = """
+INSERT INTO translations (num, language_code, question, context, option_a, option_b, option_c,
+                          option_d, content_hash)
+VALUES (:num, :language_code, :question, :context, :option_a, :option_b, :option_c, :option_d,
+        :content_hash)
+ON CONFLICT (num, language_code) DO UPDATE SET
+    question = excluded.question, context = excluded.context, option_a = excluded.option_a,
+    option_b = excluded.option_b, option_c = excluded.option_c, option_d = excluded.option_d,
+    content_hash = excluded.content_hash
+WHERE translations.content_hash IS NOT excluded.content_hash
+"""
+UPSERT_QUIZ_SESSION = """
+INSERT INTO quiz_sessions (user_id, state, catalog_version, updated_at)
+VALUES (:user_id, :state, :catalog_version, :updated_at)
+ON CONFLICT (user_id) DO UPDATE SET
+    state = excluded.state, catalog_version = excluded.catalog_version, updated_at = excluded.updated_at
+"""
+COUNT_ANSWER = """
+INSERT INTO question_stats (num, answered, correct) VALUES (?, 1, ?)
+ON CONFLICT (num) DO UPDATE SET answered = answered + 1, correct = correct + excluded.correct
+"""
+# Keys of one catalog import, for deleting everything else; run one by one, since
+# executescript() would commit the import transaction
+IMPORTED_KEYS = (
+    "CREATE TEMP TABLE IF NOT EXISTS imported_questions (num TEXT PRIMARY KEY)",
+    "CREATE TEMP TABLE IF NOT EXISTS kept_questions (num TEXT PRIMARY KEY)",
+    "CREATE TEMP TABLE IF NOT EXISTS imported_translations (num TEXT, language_code TEXT, "
+    "PRIMARY KEY (num, language_code))",
+    "DELETE FROM temp.imported_questions",
+    "DELETE FROM temp.kept_questions",
+    "DELETE FROM temp.imported_translations",
+)
+# Stored rows that an import did not contain
+NOT_IMPORTED_TRANSLATIONS = (
+    "FROM translations WHERE num NOT IN (SELECT num FROM temp.kept_questions) "
+    "AND (num, language_code) NOT IN (SELECT num, language_code FROM temp.imported_translations)"
+)
+NOT_IMPORTED_QUESTIONS = "FROM questions WHERE num NOT IN (SELECT num FROM temp.imported_questions)"
+CATALOG_VERSION_KEY = 'catalog_version'
+# Keys per IN (...) query of bulk reads, below SQLite's limit on bound parameters
+MAX_IN_KEYS = 500
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _select_in(connection: sqlite3.Connection, sql: str, keys: list[Any],
+               *params: Any) -> Iterator[sqlite3.Row]:
+    """Run a query whose {keys} placeholder is an IN list, in chunks of MAX_IN_KEYS keys"""
+    unique = list(dict.fromkeys(keys))
+    for start in range(0, len(unique), MAX_IN_KEYS):
+        chunk = unique[start:start + MAX_IN_KEYS]
+        yield from connection.execute(sql.format(keys=', '.join('?' * len(chunk))), (*chunk, *params))
+
+
+def _dates(data: dict[str, Any]) -> dict[str, Any]:
+    """Parse the ISO timestamps of a row"""
+    for key in ('created_at', 'updated_at'):
+        if isinstance(data.get(key), str):
+            data[key] = datetime.fromisoformat(data[key])
+    return data
+
+
+class SqliteDatabase:
+    """SQLite connection in WAL mode, opened and migrated on first use"""
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit, multi-statement writes use transaction()
+            connection = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Durable at checkpoints only, which is enough with WAL
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA busy_timeout = 5000")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            logger.info(f"SQLite database {self.path} opened")
+        return self._connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def catalog_version(self) -> str | None:
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (CATALOG_VERSION_KEY,)).fetchone()
+        return row['value'] if row else None
+
+    def get_translations(self, nums: list[str], language_code: LanguageCode,
+                         fallback: LanguageCode | None = 'de') -> list[Translation | None]:
+        """Translations of many questions in request order, falling back to another language"""
+        languages = [language_code] if fallback is None else [language_code, fallback]
+        found: dict[tuple[str, str], Translation] = {}
+        for row in _select_in(self.connection,
+                              "SELECT * FROM translations WHERE num IN ({keys}) AND language_code IN (?, ?)",
+                              nums, language_code, languages[-1]):
+            found[(row['num'], row['language_code'])] = translation_from_dict(dict(row))
+        return [next((found[(num, language)] for language in languages if (num, language) in found), None)
+                for num in nums]
+
+    def image_file_ids(self) -> dict[str, str]:
+        """file_ids of all uploaded images, keyed by image reference"""
+        return {row['image']: row['image_file_id'] for row in self.connection.execute(
+            "SELECT DISTINCT image, image_file_id FROM questions "
+            "WHERE image_file_id IS NOT NULL AND image_file_source = image"
+        )}
+
+    def save_image_file_id(self, image: str, file_id: str) -> int:
+        """Store the file_id of an uploaded image on all questions using it"""
+        cursor = self.connection.execute(
+            "UPDATE questions SET image_file_id = ?, image_file_source = image WHERE image = ?", (file_id, image)
+        )
+        return cursor.rowcount
+
+    def import_catalog(self, questions: list[dict[str, Any]], translations: list[dict[str, Any]],
+                       keep: set[str] | None = None, dry_run: bool = False, prune: bool = False,
+                       max_removed_fraction: float = 1.0) -> tuple[int, int, int, int]:
+        """
+        Upsert questions and translations whose content hash changed in one transaction. Those
+        not imported, except the questions in keep, are only deleted with prune, and pruning more
+        than max_removed_fraction of the stored ones raises ValueError. Returns the number of
+        questions and translations written and removed, or to remove without prune (rolled back
+        if dry_run).
+        """
+        keep = keep or set()
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            stored_questions = connection.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+            stored_translations = connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            before = connection.total_changes
+            connection.executemany(UPSERT_QUESTION, questions)
+            written_questions = connection.total_changes - before
+            before = connection.total_changes
+            connection.executemany(UPSERT_TRANSLATION, translations)
+            written_translations = connection.total_changes - before
+
+            # Imported keys in temporary tables, so the deletes need no huge IN lists
+            for statement in IMPORTED_KEYS:
+                connection.execute(statement)
+            connection.executemany("INSERT INTO temp.imported_questions VALUES (?)",
+                                   [(num,) for num in {question['num'] for question in questions} | keep])
+            connection.executemany("INSERT INTO temp.kept_questions VALUES (?)", [(num,) for num in keep])
+            connection.executemany("INSERT INTO temp.imported_translations VALUES (?, ?)",
+                                   [(t['num'], t['language_code']) for t in translations])
+            removed_translations = connection.execute(f"SELECT COUNT(*) {NOT_IMPORTED_TRANSLATIONS}").fetchone()[0]
+            removed_questions = connection.execute(f"SELECT COUNT(*) {NOT_IMPORTED_QUESTIONS}").fetchone()[0]
+            if prune:
+                for kind, removed, stored in (("questions", removed_questions, stored_questions),
+                                              ("translations", removed_translations, stored_translations)):
+                    if removed > stored * max_removed_fraction:
+                        raise ValueError(f"Refusing to delete {removed} of {stored} stored {kind}")
+                connection.execute(f"DELETE {NOT_IMPORTED_TRANSLATIONS}")
+                connection.execute(f"DELETE {NOT_IMPORTED_QUESTIONS}")
+            if written_questions or written_translations or (prune and (removed_questions or removed_translations)):
+                # Tell running bots to reload their question bank
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   (CATALOG_VERSION_KEY, uuid.uuid4().hex))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("ROLLBACK" if dry_run else "COMMIT")
+        return written_questions, written_translations, removed_questions, removed_translations
+
+
+# Global instance
+sqlite_database = SqliteDatabase()
+
+
+class SqliteUserRepository:
+    """Users in SQLite; counters are updated in place, so no read-modify-write"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    def _get(self, user_id: int) -> User | None:
+        row = self.database.connection.execute(SELECT_USER, (user_id,)).fetchone()
+        return user_from_dict(_dates(dict(row))) if row else None
+
+    async def ensure_user(self, user_id: int, first_name: str, username: str | None = None,
+                          last_name: str | None = None, language_code: str | None = None,
+                          update_activity: bool = False) -> User:
+        """Create the user or update the profile fields that changed"""
+        try:
+            now = _now()
+            profile = {
+                'user_id': user_id,
+                'first_name': first_name,
+                'username': username,
+                'last_name': last_name,
+                'language_code': language_code,
+            }
+            user = self._get(user_id)
+            if user is None:
+                data = {**profile, 'federal_state': None, 'total_questions_answered': 0,
+                        'created_at': now, 'updated_at': now}
+                self.database.connection.execute(INSERT_USER, data)
+                logger.info(f"User {user_id} created successfully")
+                return user_from_dict(_dates(data))
+
+            changed = any(getattr(user, key) != value for key, value in profile.items())
+            if not changed and not update_activity:
+                return user
+            updated_at = now if update_activity else user.updated_at.isoformat()
+            self.database.connection.execute(UPDATE_PROFILE, {**profile, 'updated_at': updated_at})
+            return replace(user, **profile, updated_at=datetime.fromisoformat(updated_at))
+
+        except Exception as e:
+            logger.error(f"Failed to ensure user {user_id}: {e}")
+            raise
+
+    async def get_user(self, user_id: int) -> User | None:
+        """Get user by ID"""
+        return self._get(user_id)
+
+    async def get_users(self, user_ids: list[int]) -> list[User | None]:
+        """Get users by ID in request order"""
+        found = {row['user_id']: user_from_dict(_dates(dict(row))) for row in _select_in(
+            self.database.connection, f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE user_id IN ({{keys}})",
+            user_ids
+        )}
+        return [found.get(user_id) for user_id in user_ids]
+
+    async def get_or_create_user(self, user_id: int, first_name: str, username: str | None = None,
+                                 last_name: str | None = None, language_code: str | None = None) -> User:
+        return await self.ensure_user(user_id, first_name, username, last_name, language_code)
+
+    async def update_federal_state(self, user_id: int, federal_state: FederalState | None) -> None:
+        """Set the user's federal state"""
+        try:
+            self.database.connection.execute("UPDATE users SET federal_state = ?, updated_at = ? WHERE user_id = ?",
+                                             (federal_state, _now(), user_id))
+            logger.info(f"User {user_id} federal state set to {federal_state}")
+
+        except Exception as e:
+            logger.error(f"Failed to update federal state for user {user_id}: {e}")
+            raise
+
+    async def add_questions_answered(self, user: User, count: int = 1) -> User:
+        """Add to the user's answer counter"""
+        self.database.connection.execute(
+            "UPDATE users SET total_questions_answered = total_questions_answered + ? WHERE user_id = ?",
+            (count, user.user_id)
+        )
+        return replace(user, total_questions_answered=user.total_questions_answered + count)
+
+    async def record_answer(self, user: User, num: str, is_correct: bool) -> User:
+        """Count an answer for the user and in the global counters of the question"""
+        SqliteQuestionStatsRepository(self.database).record_answer(num, is_correct)
+        return await self.add_questions_answered(user)
+
+    async def get_reviews(self, user_id: int) -> bytes | None:
+        """Get the packed learn-mode review records of a user"""
+        row = self.database.connection.execute("SELECT reviews FROM users WHERE user_id = ?",
+                                               (user_id,)).fetchone()
+        return row['reviews'] if row else None
+
+    def save_reviews(self, user_id: int, reviews: bytes) -> None:
+        """Store the packed learn-mode review records of a user"""
+        self.database.connection.execute("UPDATE users SET reviews = ? WHERE user_id = ?", (reviews, user_id))
+
+    async def update_user_activity(self, user_id: int) -> None:
+        """Update the user's last activity timestamp"""
+        self.database.connection.execute("UPDATE users SET updated_at = ? WHERE user_id = ?",
+                                         (_now(), user_id))
+
+    async def get_users_page(self, federal_state: FederalState | None = None,
+                             language_code: str | None = None, page_size: int = 500,
+                             start_after: str | None = None) -> list[User]:
+        """Get one page of users ordered by user ID, optionally filtered"""
+        rows = self.database.connection.execute(
+            f"SELECT {', '.join(USER_COLUMNS)} FROM users "
+            "WHERE (:federal_state IS NULL OR federal_state = :federal_state) "
+            "AND (:language_code IS NULL OR language_code = :language_code) "
+            "AND (:start_after IS NULL OR user_id > :start_after) "
+            "ORDER BY user_id LIMIT :page_size",
+            {'federal_state': federal_state, 'language_code': language_code,
+             'start_after': int(start_after) if start_after is not None else None, 'page_size': page_size}
+        ).fetchall()
+        return [user_from_dict(_dates(dict(row))) for row in rows]
+
+    async def iter_user_pages(self, federal_state: FederalState | None = None,
+                              language_code: str | None = None, page_size: int = 500,
+                              start_after: str | None = None) -> AsyncIterator[list[User]]:
+        """Stream all (matching) users page by page"""
+        while True:
+            users = await self.get_users_page(federal_state, language_code, page_size, start_after)
+            if not users:
+                return
+            yield users
+            if len(users) < page_size:
+                return
+            start_after = str(users[-1].user_id)
+
+    def start(self) -> None:
+        """Nothing runs in the background, every write goes straight to the database"""
+
+    async def stop(self) -> None:
+        self.database.close()
+
+
+class SqliteQuestionRepository:
+    """Questions in SQLite"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    async def create_question(self, num: str, solution: Literal['a', 'b', 'c', 'd'], category: str,
+                              image: str | None = None) -> Question:
+        """Create or replace a question"""
+        now = _now()
+        data = {'num': num, 'solution': solution, 'category': category, 'image': image,
+                'content_hash': None, 'now': now}
+        self.database.connection.execute(UPSERT_QUESTION, data)
+        logger.info(f"Question {num} created successfully")
+        return Question(num=num, solution=solution, category=category, image=image,
+                        created_at=datetime.fromisoformat(now), updated_at=datetime.fromisoformat(now))
+
+    async def get_question(self, num: str) -> Question | None:
+        """Get question by num"""
+        row = self.database.connection.execute("SELECT * FROM questions WHERE num = ?", (num,)).fetchone()
+        return question_from_dict(_dates(dict(row))) if row else None
+
+    async def get_questions(self, nums: list[str]) -> list[Question | None]:
+        """Get questions by num in request order"""
+        found = {row['num']: question_from_dict(_dates(dict(row))) for row in _select_in(
+            self.database.connection, "SELECT * FROM questions WHERE num IN ({keys})", nums
+        )}
+        return [found.get(num) for num in nums]
+
+
+class SqliteTranslationRepository:
+    """Translations of one question in SQLite"""
+
+    def __init__(self, num: str, database: SqliteDatabase = sqlite_database):
+        self.num = num
+        self.database = database
+
+    async def create_translation(self, language_code: LanguageCode, question: str, context: str,
+                                 option_a: str, option_b: str, option_c: str,
+                                 option_d: str) -> Translation:
+        """Create or replace a translation"""
+        translation = Translation(language_code=language_code, question=question, context=context,
+                                  option_a=option_a, option_b=option_b, option_c=option_c,
+                                  option_d=option_d)
+        self.database.connection.execute(UPSERT_TRANSLATION, {
+            'num': self.num, 'language_code': language_code, 'question': question, 'context': context,
+            'option_a': option_a, 'option_b': option_b, 'option_c': option_c, 'option_d': option_d,
+            'content_hash': None,
+        })
+        logger.info(f"Translation {language_code} created successfully")
+        return translation
+
+    async def get_translation(self, language_code: LanguageCode) -> Translation | None:
+        """Get translation by language code"""
+        row = self.database.connection.execute(
+            "SELECT * FROM translations WHERE num = ? AND language_code = ?", (self.num, language_code)
+        ).fetchone()
+        return translation_from_dict(dict(row)) if row else None
+
+
+class SqliteCatalogSource:
+    """Reads the catalog for the question bank from SQLite"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    async def fetch_version(self) -> str | None:
+        return self.database.catalog_version()
+
+    async def fetch_catalog(self) -> tuple[dict[str, Question], dict[tuple[str, LanguageCode], Translation]]:
+        connection = self.database.connection
+        questions = {row['num']: question_from_dict(_dates(dict(row)))
+                     for row in connection.execute("SELECT * FROM questions")}
+        translations = {(row['num'], row['language_code']): translation_from_dict(dict(row))
+                        for row in connection.execute("SELECT * FROM translations")}
+        return questions, translations
+
+
+class SqliteSessionCheckpoints:
+    """Quiz session checkpoints in SQLite"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    async def read(self, user_id: int) -> tuple[bytes, str | None] | None:
+        row = self.database.connection.execute(
+            "SELECT state, catalog_version FROM quiz_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return (row['state'], row['catalog_version']) if row else None
+
+    async def write(self, sessions: list[QuizSession]) -> None:
+        now = _now()
+        with self.database.transaction() as connection:
+            connection.executemany(UPSERT_QUIZ_SESSION, [
+                {'user_id': session.user_id, 'state': session.to_bytes(),
+                 'catalog_version': session.catalog_version, 'updated_at': now}
+                for session in sessions
+            ])
+
+
+class SqliteStatsRepository:
+    """Usage statistics counted from the users table with GROUP BY queries"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    # The users table is the only source, nothing to record
+    def record_new_user(self, federal_state: str | None, language_code: str | None) -> None:
+        pass
+
+    def record_federal_state_change(self, old: str | None, new: str | None) -> None:
+        pass
+
+    def record_language_change(self, old: str | None, new: str | None) -> None:
+        pass
+
+    def record_answers(self, count: int = 1) -> None:
+        pass
+
+    async def get_stats(self) -> UsageStats:
+        """Count users by federal state and language and sum up their answers"""
+        connection = self.database.connection
+        row = connection.execute(
+            "SELECT COUNT(*) AS users, COALESCE(SUM(total_questions_answered), 0) AS answers FROM users"
+        ).fetchone()
+        stats = UsageStats(registered_users=row['users'], answers=row['answers'])
+        stats.federal_states = dict.fromkeys((*FEDERAL_STATES, federal_state_bucket(None)), 0)
+        for row in connection.execute("SELECT federal_state, COUNT(*) AS count FROM users GROUP BY federal_state"):
+            stats.federal_states[federal_state_bucket(row['federal_state'])] += row['count']
+        stats.languages = dict.fromkeys((*LANGUAGE_CODES, language_bucket(None)), 0)
+        for row in connection.execute("SELECT language_code, COUNT(*) AS count FROM users GROUP BY language_code"):
+            stats.languages[language_bucket(row['language_code'])] += row['count']
+        return stats
+
+    async def rebuild(self) -> UsageStats:
+        """Always exact, so the same as get_stats()"""
+        return await self.get_stats()
+
+    def start(self) -> None:
+        """Nothing runs in the background"""
+
+    async def stop(self) -> None:
+        pass
+
+
+class SqliteQuestionStatsRepository:
+    """Per-question answer counters in SQLite, incremented in place"""
+
+    def __init__(self, database: SqliteDatabase = sqlite_database):
+        self.database = database
+
+    def record_answer(self, num: str, is_correct: bool) -> None:
+        self.database.connection.execute(COUNT_ANSWER, (num, int(is_correct)))
+
+    async def get_question_stats(self, num: str) -> QuestionStats:
+        row = self.database.connection.execute(
+            "SELECT answered, correct FROM question_stats WHERE num = ?", (num,)
+        ).fetchone()
+        return QuestionStats(num, row['answered'], row['correct']) if row else QuestionStats(num)
+
+    def start(self) -> None:
+        """Nothing runs in the background"""
+
+    async def stop(self) -> None:
+        pass
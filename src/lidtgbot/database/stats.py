@@ -0,0 +1,214 @@
+import random
+import asyncio
+import logging
+from collections import Counter
+from typing import TYPE_CHECKING
+from lidtgbot.models.stats import (
+    NO_FEDERAL_STATE,
+    OTHER_LANGUAGE,
+    UsageStats,
+    federal_state_bucket,
+    language_bucket,
+)
+from lidtgbot.models.federal_state import FEDERAL_STATES
+from lidtgbot.models.translation import LANGUAGE_CODES
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.protocols import StatsStore
+from lidtgbot.settings.config import STATS_SHARDS, STORAGE_BACKEND, USER_FLUSH_INTERVAL
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
+
+logger = logging.getLogger(__name__)
+
+# stats/users/shards/{0..STATS_SHARDS-1}
+STATS_COLLECTION = 'stats'
+STATS_DOCUMENT = 'users'
+USERS_COLLECTION = 'users'
+
+
+class StatsRepository:
+    """
+    Usage statistics kept in sharded counter documents.
+
+    Changes are summed up in memory and flushed periodically as Increment
+    transforms into one randomly picked shard, so concurrent processes rarely
+    write the same document. Reading the statistics costs one read per shard,
+    however many users there are. rebuild() recomputes the counters with
+    count()/sum() aggregation queries if they ever drift. The shards keep
+    the registered user count in their 'users' field.
+    """
+
+    def __init__(self, shards: int = STATS_SHARDS, flush_interval: float = USER_FLUSH_INTERVAL):
+        self._collection: 'AsyncCollectionReference | None' = None
+        self.shards = shards
+        self.flush_interval = flush_interval
+        # (field, bucket) -> delta, bucket is None for top-level counters
+        self._pending: Counter[tuple[str, str | None]] = Counter()
+        # A flush must not land in a shard that a concurrent rebuild overwrites
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The counter shards collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = (firestore_client.db.collection(STATS_COLLECTION)
+                                .document(STATS_DOCUMENT).collection('shards'))
+        return self._collection
+
+    def record_new_user(self, federal_state: str | None, language_code: str | None) -> None:
+        self._pending[('users', None)] += 1
+        self._pending[('federal_states', federal_state_bucket(federal_state))] += 1
+        self._pending[('languages', language_bucket(language_code))] += 1
+
+    def record_federal_state_change(self, old: str | None, new: str | None) -> None:
+        old, new = federal_state_bucket(old), federal_state_bucket(new)
+        if old != new:
+            self._pending[('federal_states', old)] -= 1
+            self._pending[('federal_states', new)] += 1
+
+    def record_language_change(self, old: str | None, new: str | None) -> None:
+        old, new = language_bucket(old), language_bucket(new)
+        if old != new:
+            self._pending[('languages', old)] -= 1
+            self._pending[('languages', new)] += 1
+
+    def record_answers(self, count: int = 1) -> None:
+        self._pending[('answers', None)] += count
+
+    @instrumented
+    async def flush(self) -> None:
+        """Add all pending changes to one shard with a single write"""
+        async with self._lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        from google.cloud.firestore_v1.transforms import Increment
+
+        pending = {key: delta for key, delta in self._pending.items() if delta}
+        self._pending = Counter()
+        if not pending:
+            return
+        data: dict = {}
+        for (field, bucket), delta in pending.items():
+            if bucket is None:
+                data[field] = Increment(delta)
+            else:
+                data.setdefault(field, {})[bucket] = Increment(delta)
+        try:
+            shard = self.collection.document(str(random.randrange(self.shards)))
+            await firestore_client.set(shard, data, merge=True)
+        except Exception as e:
+            logger.error(f"Failed to flush usage statistics: {e}")
+            self._pending.update(pending)
+
+    @instrumented
+    async def get_stats(self) -> UsageStats:
+        """Sum up all shards, plus the changes of this process not flushed yet"""
+        try:
+            stats = UsageStats()
+            totals = [(doc.to_dict() or {}) async for doc in firestore_client.stream(self.collection)]
+            totals.append({})
+            for (field, bucket), delta in self._pending.items():
+                if bucket is None:
+                    totals[-1][field] = delta
+                else:
+                    totals[-1].setdefault(field, {})[bucket] = delta
+            for data in totals:
+                stats.registered_users += data.get('users', 0)
+                stats.answers += data.get('answers', 0)
+                for bucket, count in data.get('federal_states', {}).items():
+                    stats.federal_states[bucket] = stats.federal_states.get(bucket, 0) + count
+                for bucket, count in data.get('languages', {}).items():
+                    stats.languages[bucket] = stats.languages.get(bucket, 0) + count
+            return stats
+
+        except Exception as e:
+            logger.error(f"Failed to get usage statistics: {e}")
+            raise
+
+    @instrumented
+    async def rebuild(self) -> UsageStats:
+        """Recompute the counters with aggregation queries and reset the shards to them"""
+        async with self._lock:
+            return await self._rebuild()
+
+    async def _rebuild(self) -> UsageStats:
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        # The users collection already reflects everything recorded so far, counting the
+        # pending changes on top of it would count them twice. Changes recorded while the
+        # queries run stay pending and are flushed into the new totals.
+        self._pending.clear()
+        try:
+            users = firestore_client.db.collection(USERS_COLLECTION)
+
+            async def count(field: str, value: str) -> int:
+                query = users.where(filter=FieldFilter(field, '==', value)).count(alias='count')
+                return int((await firestore_client.aggregate(query))['count'])
+
+            totals_query = users.count(alias='users').sum('total_questions_answered', alias='answers')
+            totals, state_counts, language_counts = await asyncio.gather(
+                firestore_client.aggregate(totals_query),
+                asyncio.gather(*(count('federal_state', state) for state in FEDERAL_STATES)),
+                asyncio.gather(*(count('language_code', language) for language in LANGUAGE_CODES)),
+            )
+
+            stats = UsageStats(registered_users=int(totals['users']), answers=int(totals['answers']))
+            stats.federal_states = dict(zip(FEDERAL_STATES, state_counts))
+            stats.federal_states[NO_FEDERAL_STATE] = stats.registered_users - sum(state_counts)
+            stats.languages = dict(zip(LANGUAGE_CODES, language_counts))
+            stats.languages[OTHER_LANGUAGE] = stats.registered_users - sum(language_counts)
+
+            # Everything in shard 0, the other shards start again from zero
+            batch = firestore_client.db.batch()
+            batch.set(self.collection.document('0'), {
+                'users': stats.registered_users,
+                'answers': stats.answers,
+                'federal_states': stats.federal_states,
+                'languages': stats.languages,
+            })
+            for shard in range(1, self.shards):
+                batch.set(self.collection.document(str(shard)), {})
+            await firestore_client.commit(batch)
+            logger.info(f"Usage statistics rebuilt: {stats.registered_users} registered users")
+            return stats
+
+        except Exception as e:
+            logger.error(f"Failed to rebuild usage statistics: {e}")
+            raise
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing periodically in the background"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out the pending changes"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+
+def create_stats_repository() -> StatsStore:
+    """Usage statistics of the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteStatsRepository
+        return SqliteStatsRepository()
+    return StatsRepository()
+
+
+# Global instance
+stats_repository = create_stats_repository()
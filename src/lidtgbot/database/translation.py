@@ -1,24 +1,35 @@
 import logging
-from typing import Literal
-from google.cloud.firestore import CollectionReference
-from lidtgbot.models.translation import Translation
+from typing import TYPE_CHECKING
+from lidtgbot.models.translation import Translation, LanguageCode
 from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.converters import translation_from_dict
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.protocols import TranslationStore
+from lidtgbot.settings.config import STORAGE_BACKEND
+from lidtgbot.metrics import instrumented
 
-logger = logging.getLogger(__name__)
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
 
-# Define the language code type for reuse
-LanguageCode = Literal['de', 'en', 'tr', 'ru', 'fr', 'ar', 'uk', 'hi']
+logger = logging.getLogger(__name__)
 
 
 class TranslationRepository:
     """Repository for Translation operations with Firestore"""
     
     def __init__(self, num: str):
-        if not firestore_client.is_initialized or firestore_client.db is None:
-            raise RuntimeError("Firestore client is not initialized")
-        self.collection: CollectionReference = firestore_client.db.collection(
-            'questions').document(num).collection('translations')
+        self.num = num
+        self._collection: 'AsyncCollectionReference | None' = None
+    
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The translations subcollection of the question, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection(
+                'questions').document(self.num).collection('translations')
+        return self._collection
     
+    @instrumented
     async def create_translation(self,
                                 language_code: LanguageCode,
                                 question: str,
@@ -41,7 +52,7 @@ class TranslationRepository:
             
             # Use translation language code as document ID for easy retrieval
             doc_ref = self.collection.document(language_code)
-            doc_ref.set(translation_data)
+            await firestore_client.set(doc_ref, translation_data)
             
             logger.info(f"Translation {language_code} created successfully")
             return Translation(
@@ -58,29 +69,70 @@ class TranslationRepository:
             logger.error(f"Failed to create translation for {language_code}: {e}")
             raise
     
+    @instrumented
     async def get_translation(self, language_code: LanguageCode) -> Translation | None:
-        """Get Translation by language code"""
+        """Get Translation by language code, served from the question bank once it is loaded"""
+        if question_bank.is_loaded:
+            return question_bank.get_translation(self.num, language_code)
         try:
             doc_ref = self.collection.document(language_code)
-            doc = doc_ref.get()
+            doc = await firestore_client.get(doc_ref)
             
             if doc.exists:
                 data = doc.to_dict()
                 if data is None:
                     return None
                 
-                # Convert Firestore data to Translation object
-                return Translation(
-                    language_code=data['language_code'],
-                    question=data['question'],
-                    context=data['context'],
-                    option_a=data['option_a'],
-                    option_b=data['option_b'],
-                    option_c=data['option_c'],
-                    option_d=data['option_d'],                   
-                )
+                return translation_from_dict(data)
             return None
         
         except Exception as e:
             logger.error(f"Failed to get translation {language_code}: {e}")
             raise    
+
+
+def create_translation_repository(num: str) -> TranslationStore:
+    """Translation repository of a question for the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteTranslationRepository
+        return SqliteTranslationRepository(num)
+    return TranslationRepository(num)
+
+
+@instrumented
+async def get_translations(nums: list[str], language_code: LanguageCode,
+                           fallback: LanguageCode | None = 'de') -> list[Translation | None]:
+    """
+    Get the translations of many questions into one language in request order,
+    falling back to another language where a question has none.
+    Without a loaded question bank, both languages are read with one get_all.
+    """
+    if question_bank.is_loaded:
+        translations = [question_bank.get_translation(num, language_code) for num in nums]
+        if fallback is None:
+            return translations
+        return [translation or question_bank.get_translation(num, fallback)
+                for num, translation in zip(nums, translations)]
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import sqlite_database
+        return sqlite_database.get_translations(nums, language_code, fallback)
+
+    try:
+        languages = [language_code]
+        if fallback is not None and fallback != language_code:
+            languages.append(fallback)
+        questions = firestore_client.db.collection('questions')
+        docs = await firestore_client.get_many(
+            questions.document(num).collection('translations').document(language)
+            for num in nums for language in languages
+        )
+        translations = []
+        for start in range(0, len(docs), len(languages)):
+            data = next((doc.to_dict() for doc in docs[start:start + len(languages)]
+                         if doc is not None and doc.exists), None)
+            translations.append(translation_from_dict(data) if data else None)
+        return translations
+
+    except Exception as e:
+        logger.error(f"Failed to get {len(nums)} translations for {language_code}: {e}")
+        raise
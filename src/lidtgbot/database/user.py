@@ -1,27 +1,161 @@
+import asyncio
 import logging
+from collections import Counter
+from dataclasses import replace
 from datetime import datetime, timezone
-from google.cloud.firestore import CollectionReference
+from typing import TYPE_CHECKING, Any, AsyncIterator
 from lidtgbot.models.user import User
+from lidtgbot.models.federal_state import FederalState
 from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.resilience import CircuitOpenError
+from lidtgbot.database.converters import user_from_dict
+from lidtgbot.database.user_cache import UserCache
+from lidtgbot.database.stats import stats_repository
+from lidtgbot.database.question_stats import question_stats_repository
+from lidtgbot.database.protocols import UserStore
+from lidtgbot.settings.config import STORAGE_BACKEND, USER_FLUSH_INTERVAL
+from lidtgbot.metrics import instrumented
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import AsyncCollectionReference
 
 logger = logging.getLogger(__name__)
 
+USERS_COLLECTION = 'users'
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+
+
+class UserWriteBuffer:
+    """Write-behind buffer for user profile and activity updates
+
+    Changes are coalesced per user in memory (the latest value of each field
+    wins, increments add up) and flushed periodically as WriteBatch commits
+    of up to 500 users. Counters are written as Increment transforms, so
+    they never depend on a value read before.
+    """
+
+    def __init__(self, collection_name: str, flush_interval: float = USER_FLUSH_INTERVAL):
+        self.collection_name = collection_name
+        self.flush_interval = flush_interval
+        self._pending: dict[int, dict[str, Any]] = {}
+        self._increments: dict[int, Counter[str]] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    def stage(self, user_id: int, fields: dict[str, Any]) -> None:
+        """Queue field changes for a user, merging with anything already queued"""
+        if fields:
+            self._pending.setdefault(user_id, {}).update(fields)
+
+    def increment(self, user_id: int, field: str, delta: int = 1) -> None:
+        """Queue an increment of a numeric field, added up with increments already queued"""
+        self._increments.setdefault(user_id, Counter())[field] += delta
+
+    def pending(self, user_id: int) -> dict[str, Any]:
+        """Get the queued but not yet flushed field changes for a user"""
+        return self._pending.get(user_id, {})
+
+    def apply_pending(self, user_id: int, data: dict[str, Any]) -> dict[str, Any]:
+        """Overlay the queued changes and increments on stored user data"""
+        data.update(self.pending(user_id))
+        for field, delta in self._increments.get(user_id, {}).items():
+            data[field] = (data.get(field) or 0) + delta
+        return data
+
+    def discard(self, user_id: int) -> None:
+        """Drop queued changes for a user, e.g. after they were written directly"""
+        self._pending.pop(user_id, None)
+
+    @instrumented
+    async def flush(self) -> None:
+        """Write all queued changes in batches"""
+        from google.cloud.firestore_v1.transforms import Increment
+
+        if not self._pending and not self._increments:
+            return
+        pending, self._pending = self._pending, {}
+        increments, self._increments = self._increments, {}
+        user_ids = list(pending.keys() | increments.keys())
+        collection = firestore_client.db.collection(self.collection_name)
+
+        for start in range(0, len(user_ids), MAX_BATCH_SIZE):
+            chunk = user_ids[start:start + MAX_BATCH_SIZE]
+            batch = firestore_client.db.batch()
+            for user_id in chunk:
+                data = dict(pending.get(user_id, {}))
+                for field, delta in increments.get(user_id, {}).items():
+                    # A field can't be set and transformed in one write
+                    data[field] = data[field] + delta if field in data else Increment(delta)
+                batch.set(collection.document(str(user_id)), data, merge=True)
+            try:
+                await firestore_client.commit(batch)
+                logger.debug(f"Flushed updates for {len(chunk)} users")
+            except Exception as e:
+                logger.error(f"Failed to flush updates for {len(chunk)} users: {e}")
+                # Re-queue, letting changes staged in the meantime win
+                for user_id in chunk:
+                    if user_id in pending:
+                        self._pending[user_id] = {**pending[user_id], **self._pending.get(user_id, {})}
+                    if user_id in increments:
+                        self._increments.setdefault(user_id, Counter()).update(increments[user_id])
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start flushing periodically in the background"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background task and write out everything still queued"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
 
 class UserRepository:
     """Repository for user operations with Firestore - Single call optimization"""
-    
+
     def __init__(self):
-        if not firestore_client.is_initialized or firestore_client.db is None:
-            raise RuntimeError("Firestore client is not initialized")
-        self.collection: CollectionReference = firestore_client.db.collection('users')
-    
+        self._collection: 'AsyncCollectionReference | None' = None
+        self.write_buffer = UserWriteBuffer(USERS_COLLECTION)
+        self.cache = UserCache()
+
+    @property
+    def collection(self) -> 'AsyncCollectionReference':
+        """The users collection, resolved on first use"""
+        if self._collection is None:
+            self._collection = firestore_client.db.collection(USERS_COLLECTION)
+        return self._collection
+
+    def start(self) -> None:
+        """Start flushing the write buffer in the background"""
+        self.write_buffer.start()
+
+    async def stop(self) -> None:
+        """Flush the write buffer and log how well the cache did"""
+        await self.write_buffer.stop()
+        logger.info(f"User cache stats: {self.cache.stats()}")
+
+    @instrumented
     async def ensure_user(self, user_id: int, first_name: str, username: str | None = None,
                          last_name: str | None = None, language_code: str | None = None,
                          update_activity: bool = False) -> User:
         """
-        Ensure user exists with a single Firestore operation.
-        This method uses set() with merge=True to either create or update the user.
-        
+        Ensure user exists with at most a single Firestore read.
+        Hot users are served from the in-process cache without any read.
+        New users are created right away. For existing users only the fields
+        that actually changed are queued in the write buffer, so an unchanged
+        profile costs no write at all.
+
         Args:
             user_id: Telegram user ID
             first_name: User's first name
@@ -29,14 +163,14 @@ class UserRepository:
             last_name: User's last name (optional)
             language_code: User's language code (optional)
             update_activity: Whether to update the updated_at timestamp
-            
+
         Returns:
             User object
         """
         try:
             now = datetime.now(timezone.utc)
             doc_ref = self.collection.document(str(user_id))
-            
+
             # Data that should always be updated
             user_data = {
                 'user_id': user_id,
@@ -45,104 +179,268 @@ class UserRepository:
                 'last_name': last_name,
                 'language_code': language_code,
             }
-            
-            if update_activity:
-                user_data['updated_at'] = now
-            
+
             # Data that should only be set on creation
             creation_data = {
                 'created_at': now,
                 'total_questions_answered': 0,
                 'federal_state': None
             }
-            
-            # First, try to get the document to see if it exists
-            doc = doc_ref.get()
-            
+
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                changes = {key: value for key, value in user_data.items()
+                           if getattr(cached, key) != value}
+                if update_activity:
+                    changes['updated_at'] = now
+                if not changes:
+                    return cached
+
+                if 'language_code' in changes:
+                    stats_repository.record_language_change(cached.language_code, language_code)
+                self.write_buffer.stage(user_id, changes)
+                user = replace(cached, **changes)
+                self.cache.put(user)
+                logger.debug(f"User {user_id} update queued: {sorted(changes)}")
+                return user
+
+            # Not cached - get the document to see if it exists
+            doc = await firestore_client.get(doc_ref)
+
             if doc.exists:
-                # User exists - only update the changeable fields
-                doc_ref.update(user_data)
-                
-                # Get the updated document data
                 existing_data = doc.to_dict()
                 if existing_data is None:
                     raise ValueError(f"User document {user_id} exists but has no data")
-                
-                # Merge the updated data
-                existing_data.update(user_data)
-                
-                logger.debug(f"User {user_id} updated")
-                return User(
-                    user_id=existing_data['user_id'],
-                    first_name=existing_data['first_name'],
-                    created_at=existing_data['created_at'],
-                    updated_at=existing_data.get('updated_at', existing_data['created_at']),
-                    total_questions_answered=existing_data.get('total_questions_answered', 0),
-                    username=existing_data.get('username'),
-                    last_name=existing_data.get('last_name'),
-                    language_code=existing_data.get('language_code'),
-                    federal_state=existing_data.get('federal_state', None)
-                )
+
+                # Changes not yet flushed are newer than the stored document
+                self.write_buffer.apply_pending(user_id, existing_data)
+
+                changes = {key: value for key, value in user_data.items()
+                           if existing_data.get(key) != value}
+                if update_activity:
+                    changes['updated_at'] = now
+
+                if 'language_code' in changes:
+                    stats_repository.record_language_change(existing_data.get('language_code'), language_code)
+                if changes:
+                    self.write_buffer.stage(user_id, changes)
+                    existing_data.update(changes)
+                    logger.debug(f"User {user_id} update queued: {sorted(changes)}")
+
+                user = user_from_dict(existing_data)
+                self.cache.put(user)
+                return user
             else:
                 # User doesn't exist - create with all data
-                all_data = {**user_data, **creation_data}
-                if not update_activity:
-                    all_data['updated_at'] = now
-                
-                doc_ref.set(all_data)
+                all_data = {**user_data, **creation_data, 'updated_at': now}
+
+                await firestore_client.set(doc_ref, all_data)
+                self.write_buffer.discard(user_id)
+                stats_repository.record_new_user(None, language_code)
                 logger.info(f"User {user_id} created successfully")
-                return User(**all_data)
-        
+                user = User(**all_data)
+                self.cache.put(user)
+                return user
+
+        except CircuitOpenError:
+            stale = self.cache.get_stale(user_id)
+            if stale is None:
+                raise
+            logger.warning(f"Firestore unavailable, serving cached user {user_id}")
+            return stale
         except Exception as e:
             logger.error(f"Failed to ensure user {user_id}: {e}")
             raise
-    
+
     # Keep original methods for backward compatibility
+    @instrumented
     async def get_user(self, user_id: int) -> User | None:
         """Get user by ID"""
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached
         try:
             doc_ref = self.collection.document(str(user_id))
-            doc = doc_ref.get()
-            
+            doc = await firestore_client.get(doc_ref)
+
             if doc.exists:
                 data = doc.to_dict()
                 if data is None:
                     return None
-                
-                return User(
-                    user_id=data['user_id'],
-                    first_name=data['first_name'],
-                    created_at=data['created_at'],
-                    updated_at=data['updated_at'],
-                    total_questions_answered=data.get('total_questions_answered', 0),
-                    username=data.get('username'),
-                    last_name=data.get('last_name'),
-                    language_code=data.get('language_code'),
-                    federal_state=data.get('federal_state', None)
-                )
+
+                self.write_buffer.apply_pending(user_id, data)
+                user = user_from_dict(data)
+                self.cache.put(user)
+                return user
             return None
-        
+
+        except CircuitOpenError:
+            stale = self.cache.get_stale(user_id)
+            if stale is None:
+                raise
+            logger.warning(f"Firestore unavailable, serving cached user {user_id}")
+            return stale
         except Exception as e:
             logger.error(f"Failed to get user {user_id}: {e}")
             raise
-    
+
+    @instrumented
+    async def get_users(self, user_ids: list[int]) -> list[User | None]:
+        """Get users by ID in request order, reading the ones not cached with get_all"""
+        users: dict[int, User | None] = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                users[user_id] = cached
+            else:
+                missing.append(user_id)
+        try:
+            docs = await firestore_client.get_many(self.collection.document(str(user_id)) for user_id in missing)
+            for user_id, doc in zip(missing, docs):
+                data = doc.to_dict() if doc is not None and doc.exists else None
+                if not data:
+                    users[user_id] = None
+                    continue
+                self.write_buffer.apply_pending(user_id, data)
+                users[user_id] = user_from_dict(data)
+                self.cache.put(users[user_id])
+            return [users[user_id] for user_id in user_ids]
+
+        except Exception as e:
+            logger.error(f"Failed to get {len(missing)} users: {e}")
+            raise
+
+    @instrumented
     async def get_or_create_user(self, user_id: int, first_name: str, username: str | None = None,
                                 last_name: str | None = None, language_code: str | None = None) -> User:
         """Backward compatibility method - delegates to ensure_user"""
         return await self.ensure_user(user_id, first_name, username, last_name, language_code, update_activity=False)
-    
-    async def update_user_activity(self, user_id: int) -> None:
-        """Update user's last activity timestamp"""
+
+    @instrumented
+    async def update_federal_state(self, user_id: int, federal_state: FederalState | None) -> None:
+        """Set the user's federal state, writing through to the cache and the usage statistics"""
+        try:
+            now = datetime.now(timezone.utc)
+            changes = {'federal_state': federal_state, 'updated_at': now}
+            doc_ref = self.collection.document(str(user_id))
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                previous = cached.federal_state
+            else:
+                doc = await firestore_client.get(doc_ref, field_paths=['federal_state'])
+                previous = (doc.to_dict() or {}).get('federal_state') if doc.exists else None
+            await firestore_client.set(doc_ref, changes, merge=True)
+            self.cache.update(user_id, **changes)
+            stats_repository.record_federal_state_change(previous, federal_state)
+            logger.info(f"User {user_id} federal state set to {federal_state}")
+
+        except Exception as e:
+            logger.error(f"Failed to update federal state for user {user_id}: {e}")
+            raise
+
+    @instrumented
+    async def add_questions_answered(self, user: User, count: int = 1) -> User:
+        """Add to the user's answer counter as an Increment queued in the write buffer,
+        written through to the cache"""
+        self.write_buffer.increment(user.user_id, 'total_questions_answered', count)
+        stats_repository.record_answers(count)
+        updated = replace(user, total_questions_answered=user.total_questions_answered + count)
+        self.cache.put(updated)
+        return updated
+
+    @instrumented
+    async def record_answer(self, user: User, num: str, is_correct: bool) -> User:
+        """Count an answer for the user and in the global counters of the question, without any read"""
+        question_stats_repository.record_answer(num, is_correct)
+        return await self.add_questions_answered(user)
+
+    @instrumented
+    async def get_reviews(self, user_id: int) -> bytes | None:
+        """Get the packed learn-mode review records of a user"""
+        pending = self.write_buffer.pending(user_id)
+        if 'reviews' in pending:
+            return pending['reviews']
         try:
             doc_ref = self.collection.document(str(user_id))
-            doc_ref.update({
-                'updated_at': datetime.now(timezone.utc)
-            })
-            logger.debug(f"Updated activity for user {user_id}")
-        
+            doc = await firestore_client.get(doc_ref, field_paths=['reviews'])
+            if doc.exists:
+                return (doc.to_dict() or {}).get('reviews')
+            return None
+
+        except Exception as e:
+            logger.error(f"Failed to get reviews of user {user_id}: {e}")
+            raise
+
+    def save_reviews(self, user_id: int, reviews: bytes) -> None:
+        """Queue the packed learn-mode review records of a user in the write buffer"""
+        self.write_buffer.stage(user_id, {'reviews': reviews})
+
+    @instrumented
+    async def get_users_page(self, federal_state: FederalState | None = None,
+                             language_code: str | None = None, page_size: int = 500,
+                             start_after: str | None = None) -> list[User]:
+        """
+        Get one page of users ordered by document ID, optionally filtered.
+
+        Args:
+            federal_state: Only users of this federal state (optional)
+            language_code: Only users with this language code (optional)
+            page_size: Maximum number of users in the page
+            start_after: Document ID of the last user of the previous page (optional)
+        """
+        from google.cloud.firestore_v1.base_query import FieldFilter
+
+        try:
+            query = self.collection
+            if federal_state is not None:
+                query = query.where(filter=FieldFilter('federal_state', '==', federal_state))
+            if language_code is not None:
+                query = query.where(filter=FieldFilter('language_code', '==', language_code))
+            query = query.order_by('__name__')
+            if start_after is not None:
+                query = query.start_after({'__name__': start_after})
+            query = query.limit(page_size)
+
+            users = []
+            async for doc in firestore_client.stream(query):
+                data = doc.to_dict()
+                if data is not None:
+                    users.append(user_from_dict(data))
+            return users
+
         except Exception as e:
-            logger.error(f"Failed to update activity for user {user_id}: {e}")
+            logger.error(f"Failed to get users after {start_after}: {e}")
             raise
 
+    async def iter_user_pages(self, federal_state: FederalState | None = None,
+                              language_code: str | None = None, page_size: int = 500,
+                              start_after: str | None = None) -> AsyncIterator[list[User]]:
+        """Stream all (matching) users page by page, one query per page, never holding more than a page"""
+        while True:
+            users = await self.get_users_page(federal_state, language_code, page_size, start_after)
+            if not users:
+                return
+            yield users
+            if len(users) < page_size:
+                return
+            start_after = str(users[-1].user_id)
+
+    @instrumented
+    async def update_user_activity(self, user_id: int) -> None:
+        """Queue an update of the user's last activity timestamp"""
+        now = datetime.now(timezone.utc)
+        self.write_buffer.stage(user_id, {'updated_at': now})
+        self.cache.update(user_id, updated_at=now)
+        logger.debug(f"Queued activity update for user {user_id}")
+
+def create_user_repository() -> UserStore:
+    """User repository of the configured storage backend"""
+    if STORAGE_BACKEND == 'sqlite':
+        from lidtgbot.database.sqlite_backend import SqliteUserRepository
+        return SqliteUserRepository()
+    return UserRepository()
+
+
 # Global instance
-user_repository = UserRepository()
\ No newline at end of file
+user_repository = create_user_repository()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Any
+from lidtgbot.models.user import User
+from lidtgbot.settings.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """Bounded LRU cache of User objects with TTL expiry, keyed by user_id
+
+    Expired entries are not served by get() but stay until they are replaced
+    or evicted, so get_stale() can answer while Firestore is unavailable.
+    """
+    
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, tuple[float, User]] = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, user_id: int) -> User | None:
+        """Get a cached user, or None if missing or expired"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+    
+    def get_stale(self, user_id: int) -> User | None:
+        """Get a cached user even if expired, for when Firestore cannot be asked"""
+        entry = self._entries.get(user_id)
+        return entry[1] if entry is not None else None
+    
+    def put(self, user: User) -> None:
+        """Store a user, evicting the least recently used entry when full"""
+        self._entries[user.user_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def update(self, user_id: int, **fields: Any) -> None:
+        """Write-through: apply field changes to a cached user, if present"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            expires_at, user = entry
+            self._entries[user_id] = (expires_at, replace(user, **fields))
+    
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user from the cache"""
+        self._entries.pop(user_id, None)
+    
+    def stats(self) -> dict[str, int | float]:
+        """Hit/miss counters for sizing the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
@@ -2,9 +2,11 @@ import logging
 from functools import wraps
 from telegram import Update, User
 from telegram.ext import ContextTypes
-from typing import Callable, Awaitable, TypeVar, ParamSpec
+from typing import Any, Callable, Awaitable, TypeVar, ParamSpec
 from lidtgbot.database.user import user_repository
 from lidtgbot.models.user import User as DbUser
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +19,15 @@ UserHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE, User], Awaitable[None
 UserDbHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE, User, DbUser], Awaitable[None]]
 
 
-def require_user(func: UserHandler) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]:
+def require_user(func: UserHandler) -> Callable[..., Awaitable[None]]:
     """
     Base decorator that ensures update.effective_user exists and is not a bot.
-    Passes the validated user as a third parameter to the handler.
+    Passes the validated user as a third parameter to the handler, followed by any
+    extra arguments the handler was called with (e.g. a callback payload).
+    Records the handler's latency, including its Bot API requests.
     """
     @wraps(func)
-    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args: Any) -> None:
         user = update.effective_user
         
         # Check if user exists
@@ -37,7 +41,8 @@ def require_user(func: UserHandler) -> Callable[[Update, ContextTypes.DEFAULT_TY
             return
         
         # Call the original function with the validated user
-        await func(update, context, user)
+        with metrics.time_handler(func.__name__):
+            await func(update, context, user, *args)
     
     return wrapper
 
@@ -52,27 +57,26 @@ def ensure_user_in_db(update_activity: bool = False):
     """
     def decorator(func: UserDbHandler) -> UserHandler:
         @wraps(func)
-        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User) -> None:
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User, *args: Any) -> None:
             try:
                 # Ensure user exists in database with single call
-                db_user = await user_repository.ensure_user(
-                    user_id=user.id,
-                    first_name=user.first_name,
-                    username=user.username,
-                    last_name=user.last_name,
-                    language_code=user.language_code,
-                    update_activity=update_activity
-                )
+                with metrics.time_user_lookup():
+                    db_user = await user_repository.ensure_user(
+                        user_id=user.id,
+                        first_name=user.first_name,
+                        username=user.username,
+                        last_name=user.last_name,
+                        language_code=user.language_code,
+                        update_activity=update_activity
+                    )
                 
                 # Call the original function with both user objects
-                await func(update, context, user, db_user)
+                await func(update, context, user, db_user, *args)
                 
             except Exception as e:
                 logger.error(f"Database error for user {user.id}: {e}")
                 if update.message:
-                    await update.message.reply_text(
-                        "Entschuldigung, ein Fehler ist aufgetreten. Versuche es später noch einmal."
-                    )
+                    await update.message.reply_text(render_message('error'))
                 return
         
         return wrapper
@@ -80,7 +84,7 @@ def ensure_user_in_db(update_activity: bool = False):
 
 
 # Convenience decorators for common use cases
-def require_user_with_db(func: UserDbHandler) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]:
+def require_user_with_db(func: UserDbHandler) -> Callable[..., Awaitable[None]]:
     """
     Convenience decorator that combines @require_user and @ensure_user_in_db()
     without activity update.
@@ -93,7 +97,7 @@ def require_user_with_db(func: UserDbHandler) -> Callable[[Update, ContextTypes.
     return require_user(ensure_user_in_db(update_activity=False)(func))
 
 
-def require_user_with_db_activity(func: UserDbHandler) -> Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[None]]:
+def require_user_with_db_activity(func: UserDbHandler) -> Callable[..., Awaitable[None]]:
     """
     Convenience decorator that combines @require_user and @ensure_user_in_db(update_activity=True)
     
@@ -3,7 +3,11 @@ from telegram import Update, User
 from telegram.ext import ContextTypes
 from lidtgbot.handlers.decorators import require_user_with_db
 from lidtgbot.models.user import User as DbUser
-from lidtgbot.keyboards.federal import create_federal_keyboard
+from lidtgbot.models.federal_state import FEDERAL_STATES
+from lidtgbot.database.user import user_repository
+from lidtgbot.keyboards.federal import FEDERAL_CANCEL_INDEX, create_federal_keyboard
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.callbacks import CallbackPayload
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +19,27 @@ async def federal_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
     logger.info(f"User {telegram_user.id} ({telegram_user.first_name}) invoked federal command")
     
     await update.message.reply_text(
-        f"Hallo {telegram_user.first_name}! Willkommen beim Leben in Deutschland Test Bot! 🇩🇪\n\n"
-        "Ich kann dir dabei helfen, dich auf den Test vorzubereiten.",
+        render_message('greeting', first_name=telegram_user.first_name),
         reply_markup=create_federal_keyboard(db_user)
     )
 
+
+@require_user_with_db
+async def federal_callback(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                           telegram_user: User, db_user: DbUser, payload: CallbackPayload) -> None:
+    """Handle a press on a federal state button"""
+    query = update.callback_query
+    await query.answer()
+    if payload.index == FEDERAL_CANCEL_INDEX:
+        await query.edit_message_text(render_message('federal_cancelled'))
+        return
+
+    states = list(FEDERAL_STATES.values())
+    if payload.index >= len(states):
+        logger.warning(f"User {telegram_user.id} pressed unknown federal state {payload.index}")
+        return
+    state = states[payload.index]
+    if state.code != db_user.federal_state:
+        await user_repository.update_federal_state(telegram_user.id, state.code)
+    logger.info(f"User {telegram_user.id} selected federal state {state.code}")
+    await query.edit_message_text(render_message('federal_saved', state=state.name_de))
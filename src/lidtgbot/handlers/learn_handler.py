@@ -0,0 +1,75 @@
+import logging
+from telegram import Chat, Update, User
+from telegram.ext import ContextTypes
+from lidtgbot.handlers.decorators import require_user_with_db, require_user_with_db_activity
+from lidtgbot.models.user import User as DbUser
+from lidtgbot.models.learning_state import LearnScheduler
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.learning import learning_store
+from lidtgbot.database.user import user_repository
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.keyboards.quiz import (
+    create_answer_keyboard,
+    grade,
+    pick_permutation,
+    render_question,
+    shown_solution,
+)
+from lidtgbot.callbacks import LEARN, CallbackPayload
+from lidtgbot.image_delivery import image_delivery
+
+logger = logging.getLogger(__name__)
+
+
+async def send_next_question(chat: Chat, scheduler: LearnScheduler, db_user: DbUser) -> None:
+    """Send the question picked by the scheduler with its answer buttons"""
+    index = scheduler.next_question()
+    permutation = pick_permutation()
+    text = render_question('learn_question', index, db_user, permutation) if index is not None else None
+    if text is None:
+        await chat.send_message(render_message('quiz_unavailable'))
+        return
+    await image_delivery.send_question(
+        chat, question_bank.num_at(index), text,
+        reply_markup=create_answer_keyboard(index, scheduler.nonce, permutation, action=LEARN)
+    )
+
+
+@require_user_with_db
+async def learn_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                        telegram_user: User, db_user: DbUser) -> None:
+    """Handle /learn command: spaced repetition over the user's relevant questions"""
+    logger.info(f"User {telegram_user.id} ({telegram_user.first_name}) invoked learn command")
+
+    if not question_bank.is_loaded:
+        await update.message.reply_text(render_message('quiz_unavailable'))
+        return
+
+    scheduler = await learning_store.get_scheduler(db_user)
+    await send_next_question(update.effective_chat, scheduler, db_user)
+
+
+@require_user_with_db_activity
+async def learn_answer_callback(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                telegram_user: User, db_user: DbUser, payload: CallbackPayload) -> None:
+    """Handle a press on a learn-mode answer button, graded from its signed payload"""
+    query = update.callback_query
+
+    scheduler = await learning_store.get_scheduler(db_user)
+    if scheduler.nonce != payload.nonce or scheduler.current != payload.index:
+        await query.answer(render_message('quiz_stale'))
+        return
+
+    question, is_correct = grade(payload)
+    learning_store.record_answer(telegram_user.id, scheduler, payload.index, is_correct)
+    await user_repository.record_answer(db_user, question.num, is_correct)
+    await query.answer()
+
+    chat = update.effective_chat
+    if is_correct:
+        await chat.send_message(render_message('quiz_correct'))
+    else:
+        await chat.send_message(render_message(
+            'quiz_wrong', solution=shown_solution(question, payload.permutation)
+        ))
+    await send_next_question(chat, scheduler, db_user)
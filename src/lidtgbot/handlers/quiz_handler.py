@@ -0,0 +1,117 @@
+import logging
+from telegram import Chat, Update, User
+from telegram.ext import ContextTypes
+from lidtgbot.handlers.decorators import require_user_with_db, require_user_with_db_activity
+from lidtgbot.models.user import User as DbUser
+from lidtgbot.models.quiz_session import QuizSession
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.quiz_session import quiz_session_store
+from lidtgbot.database.exam import exam_generator
+from lidtgbot.database.user import user_repository
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.keyboards.quiz import (
+    create_answer_keyboard,
+    grade,
+    pick_permutation,
+    render_question,
+    shown_solution,
+)
+from lidtgbot.callbacks import CallbackPayload
+from lidtgbot.image_delivery import image_delivery
+
+logger = logging.getLogger(__name__)
+
+
+async def send_question(chat: Chat, session: QuizSession, db_user: DbUser) -> None:
+    """Send the session's current question with its answer buttons"""
+    index = session.current_index
+    permutation = pick_permutation()
+    text = render_question('quiz_question', index, db_user, permutation,
+                           position=str(session.cursor + 1), total=str(len(session.order)))
+    if text is None:
+        await chat.send_message(render_message('quiz_unavailable'))
+        return
+    await image_delivery.send_question(chat, question_bank.num_at(index), text,
+                                       reply_markup=create_answer_keyboard(index, session.nonce, permutation))
+
+
+@require_user_with_db
+async def quiz_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                       telegram_user: User, db_user: DbUser) -> None:
+    """Handle /quiz command: continue the running quiz or start a new one"""
+    logger.info(f"User {telegram_user.id} ({telegram_user.first_name}) invoked quiz command")
+
+    if not question_bank.is_loaded:
+        await update.message.reply_text(render_message('quiz_unavailable'))
+        return
+
+    session = await quiz_session_store.get_session(telegram_user.id)
+    # Indexes are only meaningful for the catalog version the session was started with
+    if session is None or session.is_finished or session.catalog_version != question_bank.version:
+        session = quiz_session_store.start_session(
+            telegram_user.id,
+            question_bank.relevant_indices(db_user.federal_state),
+            question_bank.version
+        )
+
+    await send_question(update.effective_chat, session, db_user)
+
+
+@require_user_with_db
+async def exam_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                       telegram_user: User, db_user: DbUser) -> None:
+    """Handle /exam command: start a simulation of the 33-question test"""
+    logger.info(f"User {telegram_user.id} ({telegram_user.first_name}) invoked exam command")
+
+    if not question_bank.is_loaded:
+        await update.message.reply_text(render_message('quiz_unavailable'))
+        return
+    if db_user.federal_state is None:
+        await update.message.reply_text(render_message('exam_no_state'))
+        return
+    if not exam_generator.can_draw(db_user.federal_state):
+        logger.warning(f"Not enough questions for an exam paper of {db_user.federal_state}")
+        await update.message.reply_text(render_message('exam_unavailable'))
+        return
+
+    paper = exam_generator.paper(db_user.federal_state)
+    logger.info(f"User {telegram_user.id} got exam paper with seed {paper.seed}")
+    session = quiz_session_store.start_exam(telegram_user.id, paper)
+
+    await update.message.reply_text(render_message(
+        'exam_started', seed=str(paper.seed), total=str(len(paper.indices))
+    ))
+    await send_question(update.effective_chat, session, db_user)
+
+
+@require_user_with_db_activity
+async def quiz_answer_callback(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                               telegram_user: User, db_user: DbUser, payload: CallbackPayload) -> None:
+    """Handle a press on an answer button, graded from its signed payload"""
+    query = update.callback_query
+
+    session = await quiz_session_store.get_session(telegram_user.id)
+    if (session is None or session.nonce != payload.nonce or session.current_index != payload.index
+            or session.catalog_version != question_bank.version):
+        await query.answer(render_message('quiz_stale'))
+        return
+
+    question, is_correct = grade(payload)
+    quiz_session_store.record_answer(session, is_correct)
+    await user_repository.record_answer(db_user, question.num, is_correct)
+    await query.answer()
+
+    chat = update.effective_chat
+    if is_correct:
+        await chat.send_message(render_message('quiz_correct'))
+    else:
+        await chat.send_message(render_message(
+            'quiz_wrong', solution=shown_solution(question, payload.permutation)
+        ))
+
+    if session.is_finished:
+        await chat.send_message(render_message(
+            'quiz_finished', correct=str(session.correct_count), total=str(len(session.order))
+        ))
+    else:
+        await send_question(chat, session, db_user)
@@ -3,6 +3,7 @@ from telegram import Update, User
 from telegram.ext import ContextTypes
 from lidtgbot.database.user import user_repository
 from lidtgbot.handlers.decorators import require_user
+from lidtgbot.keyboards.messages import render_message
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +23,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE, user
         logger.info(f"User {user.id} ({user.first_name}) started the bot")
         
         await update.message.reply_text(
-            f"Hallo {user.first_name}! Willkommen beim Leben in Deutschland Test Bot! 🇩🇪\n\n"
-            "Ich kann dir dabei helfen, dich auf den Test vorzubereiten."
+            render_message('greeting', first_name=user.first_name)
         )
         
     except Exception as e:
         logger.error(f"Error in start command: {e}")
-        await update.message.reply_text(
-            "Entschuldigung, ein Fehler ist aufgetreten. Versuche es später noch einmal."
-        )
\ No newline at end of file
+        await update.message.reply_text(render_message('error'))
\ No newline at end of file
@@ -0,0 +1,36 @@
+import logging
+from telegram import Update, User
+from telegram.ext import ContextTypes
+from lidtgbot.handlers.decorators import require_user
+from lidtgbot.database.stats import stats_repository
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.settings.config import ADMIN_USER_IDS
+
+logger = logging.getLogger(__name__)
+
+
+def _format_counts(counts: dict[str, int]) -> str:
+    return "\n".join(f"{name}: {count}" for name, count in
+                     sorted(counts.items(), key=lambda item: item[1], reverse=True) if count)
+
+
+@require_user
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE, telegram_user: User) -> None:
+    """Handle /stats command (admins only): usage statistics, '/stats rebuild' recounts them"""
+    if telegram_user.id not in ADMIN_USER_IDS:
+        logger.warning(f"User {telegram_user.id} ({telegram_user.first_name}) is not allowed to use stats")
+        return
+    logger.info(f"Admin {telegram_user.id} ({telegram_user.first_name}) invoked stats command")
+
+    if context.args and context.args[0] == 'rebuild':
+        stats = await stats_repository.rebuild()
+    else:
+        stats = await stats_repository.get_stats()
+
+    await update.message.reply_text(render_message(
+        'stats',
+        registered_users=str(stats.registered_users),
+        answers=str(stats.answers),
+        federal_states=_format_counts(stats.federal_states),
+        languages=_format_counts(stats.languages),
+    ))
@@ -0,0 +1,129 @@
+"""Sends question images, uploading each image to Telegram only once
+
+The first send of an image uploads it (from IMAGE_DIR, or by URL) and stores
+the returned file_id; every later send reuses the file_id. Run as a module
+to upload all images ahead of a deploy, so no user waits for an upload.
+
+Usage:
+    python -m lidtgbot.image_delivery [--chat-id IMAGE_CACHE_CHAT_ID] [--force] [--keep]
+"""
+import os
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from telegram import Bot, Chat, InlineKeyboardMarkup, Message
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.image_file import image_file_store
+from lidtgbot.settings.config import IMAGE_CACHE_CHAT_ID, IMAGE_DIR, TELEGRAM_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+
+class ImageDelivery:
+    """Sends question images by file_id, uploading them on first use"""
+
+    def __init__(self, image_dir: str = IMAGE_DIR):
+        self.image_dir = Path(image_dir)
+        # One upload per image at a time, concurrent senders wait for its file_id
+        self._upload_locks: dict[str, asyncio.Lock] = {}
+
+    def _source(self, image: str) -> str | Path:
+        """URL or local file to upload an image from"""
+        if image.startswith(('http://', 'https://')):
+            return image
+        return self.image_dir / image
+
+    async def send_photo(self, bot: Bot, chat_id: int | str, image: str, **kwargs) -> Message:
+        """Send an image by its file_id, uploading it first if it has none yet"""
+        file_id = image_file_store.get_file_id(image)
+        if file_id is not None:
+            try:
+                return await bot.send_photo(chat_id, file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Stored file_id of image {image} rejected, uploading again: {e}")
+                image_file_store.forget(image)
+
+        lock = self._upload_locks.setdefault(image, asyncio.Lock())
+        async with lock:
+            # Another sender may have uploaded it while we waited
+            file_id = image_file_store.get_file_id(image)
+            if file_id is not None:
+                return await bot.send_photo(chat_id, file_id, **kwargs)
+            message = await bot.send_photo(chat_id, self._source(image), **kwargs)
+            # The largest size is last
+            await image_file_store.save_file_id(image, message.photo[-1].file_id)
+            return message
+
+    async def send_question(self, chat: Chat, num: str, text: str,
+                            reply_markup: InlineKeyboardMarkup | None = None) -> None:
+        """Send a question text, as the caption of the question's image if it has one"""
+        question = question_bank.get_question(num)
+        if question is None or not question.image:
+            await chat.send_message(text, reply_markup=reply_markup)
+            return
+        if len(text) <= MessageLimit.CAPTION_LENGTH:
+            await self.send_photo(chat.get_bot(), chat.id, question.image,
+                                  caption=text, reply_markup=reply_markup)
+        else:
+            await self.send_photo(chat.get_bot(), chat.id, question.image)
+            await chat.send_message(text, reply_markup=reply_markup)
+
+    async def prewarm(self, bot: Bot, chat_id: int | str, force: bool = False,
+                      keep: bool = False) -> int:
+        """Upload every catalog image without a file_id (all, if forced). Returns the number uploaded"""
+        images = sorted({
+            question.image for question in map(question_bank.get_question, question_bank.nums)
+            if question.image
+        })
+        if force:
+            for image in images:
+                image_file_store.forget(image)
+        uploaded = 0
+        for image in images:
+            if image_file_store.get_file_id(image) is not None:
+                continue
+            try:
+                message = await self.send_photo(bot, chat_id, image, disable_notification=True)
+            except Exception as e:
+                logger.error(f"Failed to upload image {image}: {e}")
+                continue
+            uploaded += 1
+            if not keep:
+                await message.delete()
+        logger.info(f"Uploaded {uploaded} of {len(images)} images")
+        return uploaded
+
+
+# Global instance
+image_delivery = ImageDelivery()
+
+
+async def prewarm_images(chat_id: str, force: bool = False, keep: bool = False) -> int:
+    """Load the catalog and upload its images with the bot of BOT_TOKEN"""
+    token = os.getenv("BOT_TOKEN")
+    if not token:
+        raise ValueError("BOT_TOKEN environment variable not set")
+    await question_bank.load()
+    async with Bot(token, base_url=TELEGRAM_BASE_URL) as bot:
+        return await image_delivery.prewarm(bot, chat_id, force, keep)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chat-id', default=IMAGE_CACHE_CHAT_ID,
+                        help="chat to upload the images to, e.g. a private channel")
+    parser.add_argument('--force', action='store_true', help="upload images that already have a file_id")
+    parser.add_argument('--keep', action='store_true', help="keep the upload messages in the chat")
+    args = parser.parse_args()
+    if not args.chat_id:
+        parser.error("--chat-id or IMAGE_CACHE_CHAT_ID is required")
+    return args
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    asyncio.run(prewarm_images(args.chat_id, args.force, args.keep))
@@ -1,12 +1,22 @@
 import logging
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from lidtgbot.models.user import User
-from lidtgbot.models.federal_state import FEDERAL_STATES
+from lidtgbot.models.federal_state import FEDERAL_STATES, FederalState
+from lidtgbot.keyboards.render_cache import render_cache
+from lidtgbot.callbacks import FEDERAL, CallbackPayload, callback_codec
 
 logger = logging.getLogger(__name__)
 
+KEYBOARD_LANGUAGES = ('de', 'en')
+# Federal state buttons carry the state's position in FEDERAL_STATES as index
+FEDERAL_CANCEL_INDEX = 0xFFFF
 
-def create_federal_keyboard(db_user: User) -> InlineKeyboardMarkup:
+
+def federal_callback_data(index: int) -> str:
+    return callback_codec.encode(CallbackPayload(FEDERAL, index))
+
+
+def build_federal_keyboard(language: str, selected: FederalState | None) -> InlineKeyboardMarkup:
     federal_states_list = list(FEDERAL_STATES.values())
     keyboard = []
     for i in range(0, len(federal_states_list), 2):
@@ -14,19 +24,32 @@ def create_federal_keyboard(db_user: User) -> InlineKeyboardMarkup:
         for j in range(2):
             if i + j < len(federal_states_list):
                 state = federal_states_list[i + j]
-                button_text = f"{state.emoji} {state.name_de}"
+                name = state.name_en if language == 'en' else state.name_de
+                button_text = f"{state.emoji} {name}"
                 # Add checkmark if this is the current state
-                if db_user.federal_state == state.code:
+                if selected == state.code:
                     button_text = f"✅ {button_text}"
                 
                 row.append(InlineKeyboardButton(
                     text=button_text,
-                    callback_data=f"federal_{state.code}"
+                    callback_data=federal_callback_data(i + j)
                 ))
         keyboard.append(row)
     
     # Add cancel button
-    keyboard.append([InlineKeyboardButton("❌ Abbrechen", callback_data="federal_cancel")])
+    cancel_text = "❌ Cancel" if language == 'en' else "❌ Abbrechen"
+    keyboard.append([InlineKeyboardButton(cancel_text, callback_data=federal_callback_data(FEDERAL_CANCEL_INDEX))])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     return reply_markup
+
+
+# One keyboard per language and selected state (or none)
+render_cache.register('federal_keyboard', build_federal_keyboard,
+                      [(language, selected) for language in KEYBOARD_LANGUAGES
+                       for selected in (None, *FEDERAL_STATES)])
+
+
+def create_federal_keyboard(db_user: User, language: str = 'de') -> InlineKeyboardMarkup:
+    """Get the prebuilt federal state keyboard with the user's state checked"""
+    return render_cache.get('federal_keyboard', language, db_user.federal_state)
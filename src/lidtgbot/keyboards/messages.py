@@ -0,0 +1,70 @@
+from lidtgbot.keyboards.render_cache import render_cache
+
+# Message templates by name and language, filled in with str.format
+TEMPLATES = {
+    'greeting': {
+        'de': "Hallo {first_name}! Willkommen beim Leben in Deutschland Test Bot! 🇩🇪\n\n"
+              "Ich kann dir dabei helfen, dich auf den Test vorzubereiten.",
+    },
+    'error': {
+        'de': "Entschuldigung, ein Fehler ist aufgetreten. Versuche es später noch einmal.",
+    },
+    'quiz_question': {
+        'de': "❓ Frage {num} ({position}/{total})\n\n{question}\n\n"
+              "A) {option_a}\nB) {option_b}\nC) {option_c}\nD) {option_d}",
+    },
+    'quiz_correct': {
+        'de': "✅ Richtig!",
+    },
+    'quiz_wrong': {
+        'de': "❌ Leider falsch. Richtig ist {solution}.",
+    },
+    'quiz_finished': {
+        'de': "🎉 Quiz beendet! Du hast {correct} von {total} Fragen richtig beantwortet.",
+    },
+    'learn_question': {
+        'de': "🧠 Frage {num}\n\n{question}\n\n"
+              "A) {option_a}\nB) {option_b}\nC) {option_c}\nD) {option_d}",
+    },
+    'exam_started': {
+        'de': "📝 Prüfungssimulation Nr. {seed}: {total} Fragen, davon 3 zu deinem Bundesland.",
+    },
+    'exam_no_state': {
+        'de': "Bitte wähle zuerst dein Bundesland mit /federal aus.",
+    },
+    'exam_unavailable': {
+        'de': "Für dein Bundesland sind gerade nicht genug Fragen für eine Prüfungssimulation verfügbar.",
+    },
+    'quiz_stale': {
+        'de': "Diese Frage ist nicht mehr aktiv.",
+    },
+    'stats': {
+        'de': "📊 Registrierte Nutzer: {registered_users}\nBeantwortete Fragen: {answers}\n\n"
+              "Bundesländer:\n{federal_states}\n\nSprachen:\n{languages}",
+    },
+    'federal_saved': {
+        'de': "✅ Dein Bundesland ist jetzt {state}.",
+    },
+    'federal_cancelled': {
+        'de': "Dein Bundesland wurde nicht geändert.",
+    },
+    'quiz_unavailable': {
+        'de': "Die Fragen sind gerade nicht verfügbar. Versuche es später noch einmal.",
+    },
+}
+
+
+def _template(name: str, language: str) -> str:
+    translations = TEMPLATES[name]
+    return translations.get(language, translations['de'])
+
+
+render_cache.register('template', _template,
+                      [(name, language) for name, translations in TEMPLATES.items()
+                       for language in translations])
+
+
+def render_message(name: str, language: str = 'de', **values: str) -> str:
+    """Fill in a cached message template"""
+    template = render_cache.get('template', name, language)
+    return template.format(**values) if values else template
@@ -0,0 +1,76 @@
+import random
+import logging
+from itertools import permutations
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from lidtgbot.models.user import User
+from lidtgbot.models.question import Question
+from lidtgbot.models.translation import LANGUAGE_CODES
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.keyboards.messages import render_message
+from lidtgbot.callbacks import QUIZ, CallbackPayload, callback_codec
+from lidtgbot.settings.config import SHUFFLE_ANSWER_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+ANSWER_OPTIONS = ('a', 'b', 'c', 'd')
+# Orders the options can be shown in, numbered for the callback payload; 0 is a, b, c, d
+ANSWER_PERMUTATIONS: tuple[tuple[str, ...], ...] = tuple(permutations(ANSWER_OPTIONS))
+
+
+def pick_permutation() -> int:
+    """Order to show the next question's options in"""
+    return random.randrange(len(ANSWER_PERMUTATIONS)) if SHUFFLE_ANSWER_OPTIONS else 0
+
+
+def create_answer_keyboard(index: int, nonce: int, permutation: int = 0,
+                           action: str = QUIZ) -> InlineKeyboardMarkup:
+    """Answer buttons for the question at a catalog index, each carrying a signed payload"""
+    row = [
+        InlineKeyboardButton(text=label.upper(), callback_data=callback_codec.encode(
+            CallbackPayload(action, index, position, permutation, nonce)
+        ))
+        for position, label in enumerate(ANSWER_OPTIONS)
+    ]
+    return InlineKeyboardMarkup([row])
+
+
+def grade(payload: CallbackPayload) -> tuple[Question, bool]:
+    """The pressed question and whether the pressed option is its solution"""
+    question = question_bank.get_question(question_bank.num_at(payload.index))
+    chosen = ANSWER_PERMUTATIONS[payload.permutation][payload.option]
+    return question, chosen == question.solution
+
+
+def shown_solution(question: Question, permutation: int) -> str:
+    """Label of the button the solution was shown on"""
+    return ANSWER_OPTIONS[ANSWER_PERMUTATIONS[permutation].index(question.solution)].upper()
+
+
+def user_language(db_user: User) -> str:
+    """Language to show questions in, German if the user's language has no translation"""
+    if db_user.language_code in LANGUAGE_CODES:
+        return db_user.language_code
+    return 'de'
+
+
+def render_question(template: str, index: int, db_user: User, permutation: int = 0,
+                    **values: str) -> str | None:
+    """Fill a question template with the question at a catalog index in the user's language,
+    its options in the order of the permutation"""
+    num = question_bank.num_at(index)
+    translation = (question_bank.get_translation(num, user_language(db_user))
+                   or question_bank.get_translation(num, 'de'))
+    if translation is None:
+        logger.error(f"Question {num} has no translation")
+        return None
+    shown = ANSWER_PERMUTATIONS[permutation]
+    return render_message(
+        template,
+        num=num,
+        question=translation.question,
+        option_a=getattr(translation, f'option_{shown[0]}'),
+        option_b=getattr(translation, f'option_{shown[1]}'),
+        option_c=getattr(translation, f'option_{shown[2]}'),
+        option_d=getattr(translation, f'option_{shown[3]}'),
+        **values,
+    )
@@ -0,0 +1,46 @@
+import logging
+from typing import Any, Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Cache of immutable keyboards and message templates.
+    
+    Each renderer is registered under a name together with the keys it can be
+    rendered for (e.g. language and selected state). warm() builds all of them
+    at startup; get() returns the prebuilt object, building unknown keys once.
+    InlineKeyboardMarkup objects are frozen, so they can be shared safely.
+    """
+    
+    def __init__(self):
+        self._builders: dict[str, Callable[..., Any]] = {}
+        self._keys: dict[str, list[tuple[Hashable, ...]]] = {}
+        self._cache: dict[tuple[str, tuple[Hashable, ...]], Any] = {}
+    
+    def register(self, name: str, builder: Callable[..., Any],
+                 keys: Iterable[tuple[Hashable, ...]] = ()) -> None:
+        """Register a renderer and the keys to prebuild in warm()"""
+        self._builders[name] = builder
+        self._keys[name] = list(keys)
+    
+    def get(self, name: str, *key: Hashable) -> Any:
+        """Get a rendered object by renderer name and key"""
+        try:
+            return self._cache[(name, key)]
+        except KeyError:
+            rendered = self._builders[name](*key)
+            self._cache[(name, key)] = rendered
+            return rendered
+    
+    def warm(self) -> None:
+        """Build every registered key ahead of time"""
+        for name, keys in self._keys.items():
+            for key in keys:
+                self.get(name, *key)
+        logger.info(f"Render cache warmed with {len(self._cache)} entries")
+
+
+# Global instance
+render_cache = RenderCache()
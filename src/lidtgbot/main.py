@@ -1,19 +1,166 @@
 import os
+import asyncio
 import logging
 from telegram.ext import Application, CommandHandler
+from lidtgbot.callbacks import FEDERAL, LEARN, QUIZ, callback_router
 from lidtgbot.handlers.start_handler import start_command
-from lidtgbot.handlers.federal_handler import federal_command 
+from lidtgbot.handlers.federal_handler import federal_callback, federal_command
+from lidtgbot.handlers.quiz_handler import quiz_command, quiz_answer_callback, exam_command
+from lidtgbot.handlers.learn_handler import learn_command, learn_answer_callback
+from lidtgbot.handlers.stats_handler import stats_command
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.question_bank import FirestoreCatalogSource, question_bank
+from lidtgbot.database.user import user_repository
+from lidtgbot.database.quiz_session import quiz_session_store
+from lidtgbot.database.stats import stats_repository
+from lidtgbot.database.question_stats import question_stats_repository
+from lidtgbot.database.persistence import firestore_persistence
+from lidtgbot.update_processor import PerUserUpdateProcessor
+from lidtgbot.keyboards.render_cache import render_cache
+from lidtgbot.metrics import InstrumentedRequest, metrics
+from lidtgbot.sharding import ShardedDispatcher, build_ingress_application
+from lidtgbot.settings.config import (
+    BOT_MODE,
+    CONCURRENT_UPDATES,
+    STORAGE_BACKEND,
+    TELEGRAM_BASE_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_URL,
+    WORKER_PROCESSES,
+)
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_warm_up_task: asyncio.Task | None = None
+
+
+async def load_question_bank() -> None:
+    try:
+        await question_bank.load()
+    except Exception as e:
+        # Repositories fall back to the database and the reload loop retries the bank
+        logger.error(f"Loading the question bank failed: {e}")
+
+
+async def warm_up() -> None:
+    """Load the question bank and connect to Firestore while the bot is already serving"""
+    from_firestore = isinstance(question_bank.source, FirestoreCatalogSource)
+    if not from_firestore:
+        # The catalog file and SQLite need no connection, the bank is ready even if Firestore is not
+        await load_question_bank()
+    if STORAGE_BACKEND == 'firestore':
+        try:
+            # Client creation parses credentials synchronously, keep it off the event loop
+            await asyncio.to_thread(firestore_client.initialize)
+        except Exception as e:
+            logger.error(f"Firestore initialization failed: {e}")
+    if from_firestore:
+        await load_question_bank()
+    question_bank.start()
+
+
+async def post_init(app: Application) -> None:
+    """Start warming up data in the background and start background tasks"""
+    global _warm_up_task
+    render_cache.warm()
+    _warm_up_task = asyncio.create_task(warm_up())
+    user_repository.start()
+    stats_repository.start()
+    question_stats_repository.start()
+    quiz_session_store.start()
+    if app.persistence is not None:
+        firestore_persistence.start()
+    # Worker processes share one port setting, so only a process with an updater serves /metrics
+    await metrics.start(serve=app.updater is not None)
+
+
+async def post_shutdown(app: Application) -> None:
+    """Stop background tasks and flush buffered writes"""
+    if _warm_up_task is not None and not _warm_up_task.done():
+        _warm_up_task.cancel()
+    await question_bank.stop()
+    await quiz_session_store.stop()
+    if app.persistence is not None:
+        await firestore_persistence.stop()
+    await user_repository.stop()
+    await stats_repository.stop()
+    await question_stats_repository.stop()
+    await metrics.stop()
+    for line in metrics.summary():
+        logger.info(line)
+
+
+def register_handlers(app: Application) -> None:
+    """Add all command and callback handlers"""
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("federal", federal_command))
+    app.add_handler(CommandHandler("quiz", quiz_command))
+    app.add_handler(CommandHandler("exam", exam_command))
+    app.add_handler(CommandHandler("learn", learn_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    # All inline buttons, dispatched by the action prefix of their signed payload
+    callback_router.register(QUIZ, quiz_answer_callback)
+    callback_router.register(LEARN, learn_answer_callback)
+    callback_router.register(FEDERAL, federal_callback)
+    app.add_handler(callback_router.handler())
+
+
+def build_application(token: str, with_updater: bool = True) -> Application:
+    """
+    Build the Application with handlers and concurrent, per-user ordered update processing.
+    Worker processes of the sharded mode build it without an updater.
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .base_url(TELEGRAM_BASE_URL)
+        # Same pool size as PTB's default request, with Bot API request timing
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if STORAGE_BACKEND == 'firestore':
+        # user_data, chat_data and conversation states survive restarts
+        builder = builder.persistence(firestore_persistence)
+    if not with_updater:
+        builder = builder.updater(None)
+    app = builder.build()
+    register_handlers(app)
+    return app
+
+
+def run(app: Application) -> None:
+    """Serve updates by polling or webhook, depending on BOT_MODE"""
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL environment variable not set")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+        )
+    elif BOT_MODE == 'polling':
+        app.run_polling()
+    else:
+        raise ValueError(f"Unknown BOT_MODE {BOT_MODE!r}, expected 'polling' or 'webhook'")
+
 
 def main():
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     if not BOT_TOKEN:
         raise ValueError("BOT_TOKEN environment variable not set")
-    app = Application.builder().token(BOT_TOKEN).build()
-    app.add_handler(CommandHandler("start", start_command))
-    app.add_handler(CommandHandler("federal", federal_command))
-    app.run_polling()
+    if WORKER_PROCESSES > 0:
+        dispatcher = ShardedDispatcher(BOT_TOKEN, WORKER_PROCESSES, build_application)
+        run(build_ingress_application(BOT_TOKEN, dispatcher))
+    else:
+        run(build_application(BOT_TOKEN))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,264 @@
+"""Latency histograms and Firestore operation counters
+
+Handler latency is recorded by the decorators in lidtgbot.handlers.decorators,
+Bot API request time by InstrumentedRequest, and Firestore RPCs and document
+reads/writes by the FirestoreClient helpers, attributed to the repository
+method marked with @instrumented that made them, together with their
+retries, hedged reads and circuit breaker rejections.
+
+Metrics are served in the Prometheus text format on METRICS_PORT (quantiles
+via histogram_quantile) and otherwise logged with p50/p95/p99 every
+METRICS_LOG_INTERVAL seconds, e.g. in worker processes of the sharded mode.
+"""
+import time
+import bisect
+import asyncio
+import logging
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Awaitable, Callable, Iterator, ParamSpec, TypeVar
+from telegram.request import HTTPXRequest
+from lidtgbot.settings.config import METRICS_LISTEN, METRICS_LOG_INTERVAL, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec('P')
+T = TypeVar('T')
+
+PREFIX = 'lidtgbot_'
+
+# Upper bounds (seconds) of the latency buckets, 1.5x apart from 0.5 ms to ~29 s
+BUCKETS = tuple(round(0.0005 * 1.5 ** i, 6) for i in range(28))
+
+# Metric families: name -> (label names, help text)
+HISTOGRAMS = {
+    'handler_latency_seconds': (('handler',), "Time to process one update, per handler"),
+    'user_lookup_seconds': (('handler',), "Time to load the user from cache or Firestore, per handler"),
+    'telegram_request_seconds': (('handler', 'method'), "Bot API request time, per handler and API method"),
+}
+COUNTERS = {
+    'firestore_rpcs_total': (('operation', 'rpc'), "Firestore round trips, per repository method"),
+    'firestore_documents_total': (('operation', 'kind'), "Firestore documents read or written, per repository method"),
+    'firestore_retries_total': (('operation', 'rpc'), "Firestore RPCs retried after a transient failure"),
+    'firestore_hedged_reads_total': (('operation', 'rpc'), "Duplicate Firestore reads sent because the first one was slow"),
+    'firestore_circuit_rejections_total': (('operation', 'rpc'), "Firestore calls failed fast by the open circuit breaker"),
+    'firestore_circuit_transitions_total': (('state',), "Firestore circuit breaker state changes, per new state"),
+}
+GAUGES = {
+    'firestore_circuit_state': ((), "Firestore circuit breaker state: 0 closed, 1 half-open, 2 open"),
+}
+
+# Handler and repository method the current coroutine is running in
+_handler: contextvars.ContextVar[str] = contextvars.ContextVar('metrics_handler', default='-')
+_operation: contextvars.ContextVar[str] = contextvars.ContextVar('metrics_operation', default='other')
+
+
+class Histogram:
+    """Latency histogram with fixed buckets"""
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        # The last bucket is +Inf
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            if n and cumulative + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                if i == len(BUCKETS):
+                    return lower
+                return lower + (BUCKETS[i] - lower) * (rank - cumulative) / n
+            cumulative += n
+        return BUCKETS[-1]
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    """In-process metric registry with a Prometheus endpoint and a periodic log dump"""
+
+    def __init__(self):
+        self.histograms: dict[str, dict[tuple[str, ...], Histogram]] = {name: {} for name in HISTOGRAMS}
+        self.counters: dict[str, Counter[tuple[str, ...]]] = {name: Counter() for name in COUNTERS}
+        self.gauges: dict[str, dict[tuple[str, ...], float]] = {name: {} for name in GAUGES}
+        self._server: asyncio.Server | None = None
+        self._log_task: asyncio.Task | None = None
+
+    def observe(self, name: str, labels: tuple[str, ...], seconds: float) -> None:
+        series = self.histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time_handler(self, handler: str) -> Iterator[None]:
+        """Time a handler; Bot API requests and user lookups inside it are attributed to it"""
+        token = _handler.set(handler)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('handler_latency_seconds', (handler,), time.perf_counter() - started)
+            _handler.reset(token)
+
+    @contextmanager
+    def time_user_lookup(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('user_lookup_seconds', (_handler.get(),), time.perf_counter() - started)
+
+    def observe_telegram(self, method: str, seconds: float) -> None:
+        self.observe('telegram_request_seconds', (_handler.get(), method), seconds)
+
+    def count_firestore(self, rpc: str | None, kind: str, documents: int = 1) -> None:
+        """Count one RPC (unless rpc is None) and the documents it read or wrote"""
+        operation = _operation.get()
+        if rpc is not None:
+            self.counters['firestore_rpcs_total'][(operation, rpc)] += 1
+        if documents:
+            self.counters['firestore_documents_total'][(operation, kind)] += documents
+
+    def count_firestore_event(self, name: str, rpc: str) -> None:
+        """Count a retry, hedged read or rejection of an RPC of the current repository method"""
+        self.counters[name][(_operation.get(), rpc)] += 1
+
+    def set_circuit_state(self, state: str, value: int) -> None:
+        self.counters['firestore_circuit_transitions_total'][(state,)] += 1
+        self.gauges['firestore_circuit_state'][()] = value
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, (label_names, help_text) in HISTOGRAMS.items():
+            lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} histogram"]
+            for labels, histogram in sorted(self.histograms[name].items()):
+                base = _labels(label_names, labels)
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+                lines.append(f"{PREFIX}{name}_sum{{{base}}} {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count{{{base}}} {histogram.count}")
+        for name, (label_names, help_text) in COUNTERS.items():
+            lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} counter"]
+            for labels, count in sorted(self.counters[name].items()):
+                lines.append(f"{PREFIX}{name}{{{_labels(label_names, labels)}}} {count}")
+        for name, (label_names, help_text) in GAUGES.items():
+            lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} gauge"]
+            for labels, value in sorted(self.gauges[name].items()):
+                lines.append(f"{PREFIX}{name}{{{_labels(label_names, labels)}}} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> list[str]:
+        """One human readable line per series, with p50/p95/p99 in milliseconds"""
+        lines = []
+        for name, series in self.histograms.items():
+            for labels, h in sorted(series.items()):
+                lines.append(f"{name}[{'/'.join(labels)}] n={h.count} p50={h.quantile(0.5) * 1000:.1f}ms "
+                             f"p95={h.quantile(0.95) * 1000:.1f}ms p99={h.quantile(0.99) * 1000:.1f}ms")
+        for name, counter in self.counters.items():
+            for labels, count in sorted(counter.items()):
+                lines.append(f"{name}[{'/'.join(labels)}] {count}")
+        for name, series in self.gauges.items():
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}[{'/'.join(labels)}] {value}")
+        return lines
+
+    async def _handle_scrape(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Skip the headers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[1] == b'/metrics':
+                status, body = '200 OK', self.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.error(f"Failed to serve metrics: {e}")
+        finally:
+            writer.close()
+
+    async def _log_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            for line in self.summary():
+                logger.info(line)
+
+    async def start(self, serve: bool = True, port: int = METRICS_PORT,
+                    log_interval: float = METRICS_LOG_INTERVAL) -> None:
+        """Serve /metrics on the port if enabled and allowed, otherwise log the metrics periodically"""
+        if serve and port and self._server is None:
+            self._server = await asyncio.start_server(self._handle_scrape, METRICS_LISTEN, port)
+            logger.info(f"Serving metrics on {METRICS_LISTEN}:{port}/metrics")
+        elif log_interval > 0 and self._log_task is None:
+            self._log_task = asyncio.create_task(self._log_loop(log_interval))
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._log_task is not None:
+            self._log_task.cancel()
+            try:
+                await self._log_task
+            except asyncio.CancelledError:
+                pass
+            self._log_task = None
+
+
+def instrumented(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+    """Attribute the Firestore operations of a repository method to it"""
+    name = func.__qualname__
+
+    @wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        token = _operation.set(name)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _operation.reset(token)
+
+    return wrapper
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records the time of every Bot API request"""
+
+    async def do_request(self, url: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, *args, **kwargs)
+        finally:
+            metrics.observe_telegram(url.rsplit('/', 1)[-1], time.perf_counter() - started)
+
+
+# Global instance
+metrics = Metrics()
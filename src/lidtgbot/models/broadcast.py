@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+from datetime import datetime
+from lidtgbot.models.federal_state import FederalState
+
+
+@dataclass
+class Broadcast:
+    """A message sent to all users matching the filters, with its progress"""
+    broadcast_id: str
+    text: str
+    created_at: datetime
+    updated_at: datetime
+    federal_state: FederalState | None = None
+    language_code: str | None = None
+    # Document ID of the last user whose page has been fully sent
+    cursor: str | None = None
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+    finished: bool = False
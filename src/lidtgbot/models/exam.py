@@ -0,0 +1,19 @@
+from array import array
+from dataclasses import dataclass
+from lidtgbot.models.federal_state import FederalState
+
+# The official test: 30 general questions plus 3 about the federal state
+GENERAL_QUESTIONS = 30
+STATE_QUESTIONS = 3
+
+
+@dataclass(frozen=True)
+class ExamPaper:
+    """
+    One exam paper as catalog indexes. A paper is fully determined by
+    (seed, federal_state, catalog_version), so only those need to be stored.
+    """
+    seed: int
+    federal_state: FederalState
+    catalog_version: str | None
+    indices: array
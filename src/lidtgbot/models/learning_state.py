@@ -0,0 +1,139 @@
+import time
+import zlib
+import heapq
+import random
+import struct
+from dataclasses import dataclass, field
+
+# One packed record per reviewed question: question key, due time and
+# interval in minutes, ease in per mille, repetitions and lapses
+_RECORD = struct.Struct('<IIIHBB')
+
+DEFAULT_EASE = 2500
+MIN_EASE = 1300
+MAX_EASE = 3500
+# Wrongly answered questions come back after this many minutes
+RELEARN_INTERVAL = 10
+FIRST_INTERVAL = 24 * 60
+SECOND_INTERVAL = 6 * 24 * 60
+# Longest interval, well within the uint32 minutes of the packed record
+MAX_INTERVAL = 365 * 24 * 60
+MAX_MINUTES = 0xFFFFFFFF
+
+
+def question_key(num: str) -> int:
+    """Stable 32-bit key of a question, independent of its position in the catalog"""
+    return zlib.crc32(num.encode('utf-8'))
+
+
+def now_minutes() -> int:
+    """Current time in minutes since the epoch"""
+    return int(time.time() // 60)
+
+
+@dataclass(slots=True)
+class ReviewRecord:
+    """Spaced repetition data of one question for one user (SM-2 style)"""
+    due: int
+    interval: int = 0
+    ease: int = DEFAULT_EASE
+    reps: int = 0
+    lapses: int = 0
+
+    def review(self, is_correct: bool, now: int) -> None:
+        """
+        Schedule the next review after an answer. An early review grows the
+        interval only by the time that actually passed since the last one, so
+        answering ahead of schedule never pushes a question further out than
+        answering on time would.
+        """
+        if is_correct:
+            self.reps = min(self.reps + 1, 255)
+            if self.reps == 1:
+                self.interval = FIRST_INTERVAL
+            elif self.reps == 2:
+                self.interval = SECOND_INTERVAL
+            else:
+                elapsed = max(now - (self.due - self.interval), 0)
+                grown = min(self.interval, elapsed) * self.ease // 1000
+                self.interval = min(max(self.interval, grown), MAX_INTERVAL)
+            self.ease = min(self.ease + 50, MAX_EASE)
+        else:
+            self.reps = 0
+            self.lapses = min(self.lapses + 1, 255)
+            self.interval = RELEARN_INTERVAL
+            self.ease = max(self.ease - 200, MIN_EASE)
+        self.due = min(now + self.interval, MAX_MINUTES)
+
+
+@dataclass
+class LearningState:
+    """Review records of one user, keyed by question_key"""
+    records: dict[int, ReviewRecord] = field(default_factory=dict)
+
+    def to_bytes(self) -> bytes:
+        """Pack all records into one binary field (16 bytes per question)"""
+        return b''.join(
+            _RECORD.pack(key, record.due, record.interval, record.ease, record.reps, record.lapses)
+            for key, record in self.records.items()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes | None) -> 'LearningState':
+        """Unpack records written by to_bytes"""
+        records = {}
+        for key, due, interval, ease, reps, lapses in _RECORD.iter_unpack(data or b''):
+            records[key] = ReviewRecord(due, interval, ease, reps, lapses)
+        return cls(records)
+
+
+class LearnScheduler:
+    """
+    Picks the next question to learn for one user.
+
+    Reviewed questions sit in a min-heap ordered by due time; unseen questions
+    wait in a shuffled list. The next question is the most overdue reviewed
+    one, otherwise an unseen one, otherwise the one due soonest. Picking and
+    recording an answer are O(log n). nonce tells the answer buttons of this
+    scheduler apart from those of one built for another catalog version.
+    """
+
+    def __init__(self, state: LearningState, keys: dict[int, int], rng: random.Random | None = None):
+        """keys maps the catalog index of every relevant question to its question_key"""
+        self.state = state
+        self.keys = keys
+        self.current: int | None = None
+        self.nonce = (rng or random).getrandbits(32)
+        self._heap: list[tuple[int, int]] = []
+        self._unseen: list[int] = []
+        for index, key in keys.items():
+            record = state.records.get(key)
+            if record is None:
+                self._unseen.append(index)
+            else:
+                self._heap.append((record.due, index))
+        heapq.heapify(self._heap)
+        (rng or random).shuffle(self._unseen)
+
+    def next_question(self, now: int | None = None) -> int | None:
+        """Catalog index of the question to ask next (the same one until it is answered)"""
+        if self.current is None:
+            now = now_minutes() if now is None else now
+            if self._heap and self._heap[0][0] <= now:
+                self.current = heapq.heappop(self._heap)[1]
+            elif self._unseen:
+                self.current = self._unseen.pop()
+            elif self._heap:
+                self.current = heapq.heappop(self._heap)[1]
+        return self.current
+
+    def record_answer(self, index: int, is_correct: bool, now: int | None = None) -> ReviewRecord:
+        """Update the review record of the current question and put it back in the queue"""
+        if index != self.current:
+            raise ValueError(f"Question {index} is not the current question")
+        now = now_minutes() if now is None else now
+        record = self.state.records.setdefault(self.keys[index], ReviewRecord(due=now))
+        record.review(is_correct, now)
+        heapq.heappush(self._heap, (record.due, index))
+        self.current = None
+        return record
@@ -11,3 +11,5 @@ class Question:
     created_at: datetime
     updated_at: datetime
     image: str | None = None
+    # Telegram file_id of the uploaded image, if it has been uploaded
+    image_file_id: str | None = None
@@ -0,0 +1,142 @@
+import sys
+import struct
+import time
+import random
+from array import array
+from dataclasses import dataclass, field
+from lidtgbot.models.federal_state import FEDERAL_STATES, FederalState
+
+# Serialized layout: format version, number of questions, cursor, nonce, then
+# the question order as uint16 catalog indexes and the answered/correct bitsets
+_HEADER = struct.Struct('<BHHI')
+_FORMAT_VERSION = 2
+# Version 1 had no nonce
+_HEADER_V1 = struct.Struct('<BHH')
+# Exam sessions store the paper's seed and federal state instead of the order
+_EXAM_HEADER = struct.Struct('<BHHIIB')
+_EXAM_FORMAT_VERSION = 3
+_STATE_CODES: list[FederalState] = list(FEDERAL_STATES)
+
+
+def new_nonce() -> int:
+    return random.getrandbits(32)
+
+
+def _little_endian(values: array) -> array:
+    """array.tobytes/frombytes use native byte order, the stored format is little-endian"""
+    if sys.byteorder == 'little':
+        return values
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped
+
+
+@dataclass
+class QuizSession:
+    """
+    Compact quiz state of one user.
+
+    order holds the shuffled catalog indexes of the session's questions, bit i
+    of answered/correct refers to position i in order, and cursor points at
+    the next question to ask. nonce tells the answer buttons of this session
+    apart from those of earlier sessions. An exam session is only stored as
+    its exam_seed and exam_state; after loading, its order is empty until
+    the paper is drawn again from the same catalog version.
+    """
+    user_id: int
+    order: array = field(default_factory=lambda: array('H'))
+    cursor: int = 0
+    answered: int = 0
+    correct: int = 0
+    catalog_version: str | None = None
+    nonce: int = field(default_factory=new_nonce)
+    exam_seed: int | None = None
+    exam_state: FederalState | None = None
+    last_activity: float = field(default_factory=time.monotonic)
+    answers_since_checkpoint: int = 0
+
+    @property
+    def is_finished(self) -> bool:
+        return self.cursor >= len(self.order)
+
+    @property
+    def current_index(self) -> int | None:
+        """Catalog index of the question to ask next"""
+        return None if self.is_finished else self.order[self.cursor]
+
+    @property
+    def answered_count(self) -> int:
+        return self.answered.bit_count()
+
+    @property
+    def correct_count(self) -> int:
+        return self.correct.bit_count()
+
+    def record_answer(self, is_correct: bool) -> None:
+        """Record the answer to the current question and move to the next one"""
+        if self.is_finished:
+            raise ValueError(f"Quiz session of user {self.user_id} is already finished")
+        bit = 1 << self.cursor
+        self.answered |= bit
+        if is_correct:
+            self.correct |= bit
+        else:
+            self.correct &= ~bit
+        self.cursor += 1
+        self.answers_since_checkpoint += 1
+        self.last_activity = time.monotonic()
+
+    def to_bytes(self) -> bytes:
+        """Pack the session into a few hundred bytes"""
+        length = len(self.order)
+        bitset_size = (length + 7) // 8
+        if self.exam_seed is not None and self.exam_state is not None:
+            header = _EXAM_HEADER.pack(_EXAM_FORMAT_VERSION, length, self.cursor, self.nonce,
+                                       self.exam_seed, _STATE_CODES.index(self.exam_state))
+        else:
+            header = (_HEADER.pack(_FORMAT_VERSION, length, self.cursor, self.nonce)
+                      + _little_endian(self.order).tobytes())
+        return (
+            header
+            + self.answered.to_bytes(bitset_size, 'little')
+            + self.correct.to_bytes(bitset_size, 'little')
+        )
+
+    @classmethod
+    def from_bytes(cls, user_id: int, data: bytes,
+                   catalog_version: str | None = None) -> 'QuizSession':
+        """Unpack a session written by to_bytes"""
+        format_version = data[0]
+        exam_seed = exam_state = None
+        if format_version == _EXAM_FORMAT_VERSION:
+            _, length, cursor, nonce, exam_seed, state = _EXAM_HEADER.unpack_from(data)
+            exam_state = _STATE_CODES[state]
+            offset = _EXAM_HEADER.size
+        elif format_version == _FORMAT_VERSION:
+            _, length, cursor, nonce = _HEADER.unpack_from(data)
+            offset = _HEADER.size
+        elif format_version == 1:
+            _, length, cursor = _HEADER_V1.unpack_from(data)
+            nonce = new_nonce()
+            offset = _HEADER_V1.size
+        else:
+            raise ValueError(f"Unsupported quiz session format {format_version}")
+        order = array('H')
+        if exam_seed is None:
+            order.frombytes(data[offset:offset + 2 * length])
+            order = _little_endian(order)
+            offset += 2 * length
+        bitset_size = (length + 7) // 8
+        answered = int.from_bytes(data[offset:offset + bitset_size], 'little')
+        correct = int.from_bytes(data[offset + bitset_size:offset + 2 * bitset_size], 'little')
+        return cls(
+            user_id=user_id,
+            order=order,
+            cursor=cursor,
+            answered=answered,
+            correct=correct,
+            catalog_version=catalog_version,
+            nonce=nonce,
+            exam_seed=exam_seed,
+            exam_state=exam_state,
+        )
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from lidtgbot.models.federal_state import FEDERAL_STATES
+from lidtgbot.models.translation import LANGUAGE_CODES
+
+# Bucket of users without a federal state, and of users whose language has no translation
+NO_FEDERAL_STATE = 'none'
+OTHER_LANGUAGE = 'other'
+
+
+def federal_state_bucket(federal_state: str | None) -> str:
+    return federal_state if federal_state in FEDERAL_STATES else NO_FEDERAL_STATE
+
+
+def language_bucket(language_code: str | None) -> str:
+    return language_code if language_code in LANGUAGE_CODES else OTHER_LANGUAGE
+
+
+@dataclass
+class UsageStats:
+    """
+    Number of registered users by federal state and language, and answers
+    given overall. Every user who ever started the bot counts, there is no
+    notion of inactive users to subtract.
+    """
+    registered_users: int = 0
+    answers: int = 0
+    federal_states: dict[str, int] = field(default_factory=dict)
+    languages: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class QuestionStats:
+    """How often a question was answered, and how often correctly, by all users"""
+    num: str
+    answered: int = 0
+    correct: int = 0
+
+    @property
+    def correct_ratio(self) -> float | None:
+        return self.correct / self.answered if self.answered else None
@@ -1,10 +1,14 @@
 from dataclasses import dataclass
-from typing import Literal
+from typing import Literal, get_args
+
+# Define the language code type for reuse
+LanguageCode = Literal['de', 'en', 'tr', 'ru', 'fr', 'ar', 'uk', 'hi']
+LANGUAGE_CODES: tuple[LanguageCode, ...] = get_args(LanguageCode)
 
 
 @dataclass
 class Translation:
-    language_code: Literal['de', 'en', 'tr', 'ru', 'fr', 'ar', 'uk', 'hi']
+    language_code: LanguageCode
     question: str
     option_a: str
     option_b: str
@@ -0,0 +1,107 @@
+"""Runtime configuration read from environment variables"""
+import os
+
+# Maximum number of Firestore RPCs in flight at once across the whole process
+FIRESTORE_MAX_CONCURRENT_RPCS = int(os.getenv('FIRESTORE_MAX_CONCURRENT_RPCS', '32'))
+# Documents per get_all call of bulk reads; larger reads are split into parallel calls
+FIRESTORE_GET_ALL_CHUNK_SIZE = int(os.getenv('FIRESTORE_GET_ALL_CHUNK_SIZE', '100'))
+# Transient Firestore failures: attempts per idempotent call, first and largest backoff (seconds,
+# full jitter) and the overall deadline of one call including its retries
+FIRESTORE_RETRY_ATTEMPTS = int(os.getenv('FIRESTORE_RETRY_ATTEMPTS', '4'))
+FIRESTORE_RETRY_BASE_DELAY = float(os.getenv('FIRESTORE_RETRY_BASE_DELAY', '0.05'))
+FIRESTORE_RETRY_MAX_DELAY = float(os.getenv('FIRESTORE_RETRY_MAX_DELAY', '1'))
+FIRESTORE_DEADLINE = float(os.getenv('FIRESTORE_DEADLINE', '10'))
+# Send a duplicate of a document read that takes longer than the recent p95 (but at least this many seconds)
+FIRESTORE_HEDGE_READS = os.getenv('FIRESTORE_HEDGE_READS', 'false').lower() in ('1', 'true', 'yes')
+FIRESTORE_HEDGE_MIN_DELAY = float(os.getenv('FIRESTORE_HEDGE_MIN_DELAY', '0.02'))
+# Circuit breaker: consecutive failed RPCs that open it, and seconds before a probe call is let through
+FIRESTORE_BREAKER_FAILURES = int(os.getenv('FIRESTORE_BREAKER_FAILURES', '8'))
+FIRESTORE_BREAKER_RESET = float(os.getenv('FIRESTORE_BREAKER_RESET', '10'))
+
+# How often (seconds) the question bank checks the catalog version marker
+CATALOG_RELOAD_INTERVAL = float(os.getenv('CATALOG_RELOAD_INTERVAL', '300'))
+# Binary catalog written by writequestions; if the file exists the question bank maps it
+# instead of reading questions from the database (empty = never use a catalog file)
+CATALOG_FILE = os.getenv('CATALOG_FILE', 'data/catalog.bin')
+
+# How often (seconds) buffered user profile/activity changes are flushed to Firestore
+USER_FLUSH_INTERVAL = float(os.getenv('USER_FLUSH_INTERVAL', '5'))
+
+# How often (seconds) changed user_data, chat_data and conversation states are written to Firestore
+PERSISTENCE_FLUSH_INTERVAL = float(os.getenv('PERSISTENCE_FLUSH_INTERVAL', '10'))
+# Number of users and of chats whose stored user_data/chat_data is remembered to skip unchanged writes
+PERSISTENCE_CACHE_SIZE = int(os.getenv('PERSISTENCE_CACHE_SIZE', '10000'))
+
+# In-process user cache: maximum number of users and seconds before an entry expires
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+
+# How updates reach the bot: 'polling' or 'webhook'
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+
+# Webhook mode: public base URL Telegram posts to, and the local server settings
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+
+# Bot API endpoint, overridable to point the bot at a local stand-in
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')
+
+# Number of updates processed at the same time; updates of one user stay in order
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Multi-process mode: number of worker processes behind one ingress process (0 = single process)
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '0'))
+# Seconds between worker heartbeats, and silence after which a worker is restarted
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv('WORKER_HEARTBEAT_INTERVAL', '5'))
+WORKER_HEARTBEAT_TIMEOUT = float(os.getenv('WORKER_HEARTBEAT_TIMEOUT', '30'))
+
+# Quiz sessions are checkpointed to Firestore every N answers or after this many idle seconds
+QUIZ_CHECKPOINT_EVERY = int(os.getenv('QUIZ_CHECKPOINT_EVERY', '10'))
+QUIZ_IDLE_TIMEOUT = float(os.getenv('QUIZ_IDLE_TIMEOUT', '300'))
+
+# Number of users whose learn-mode schedulers are kept in memory
+LEARN_CACHE_SIZE = int(os.getenv('LEARN_CACHE_SIZE', '1000'))
+
+# 'firestore' for the real database, 'memory' for the in-memory stand-in (benchmarks, offline runs)
+FIRESTORE_BACKEND = os.getenv('FIRESTORE_BACKEND', 'firestore')
+# Simulated round-trip latency (seconds) of the in-memory backend
+FIRESTORE_MEMORY_LATENCY = float(os.getenv('FIRESTORE_MEMORY_LATENCY', '0'))
+
+# Metrics: port of the Prometheus /metrics endpoint (0 = disabled) and the address it listens on
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '0.0.0.0')
+# Seconds between metric summaries in the log when the endpoint is not served (0 = disabled)
+METRICS_LOG_INTERVAL = float(os.getenv('METRICS_LOG_INTERVAL', '300'))
+
+# Directory question images are uploaded from, unless the image is a URL
+IMAGE_DIR = os.getenv('IMAGE_DIR', 'data/images')
+# Chat the image pre-warm command uploads to
+IMAGE_CACHE_CHAT_ID = os.getenv('IMAGE_CACHE_CHAT_ID')
+
+# Broadcasts: messages per second overall, seconds between two messages to one chat,
+# concurrent sends and users per page (progress is checkpointed after every page)
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+BROADCAST_CHAT_INTERVAL = float(os.getenv('BROADCAST_CHAT_INTERVAL', '1'))
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '8'))
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '200'))
+
+# Usage statistics: number of counter shards (more shards allow more concurrent increments)
+STATS_SHARDS = int(os.getenv('STATS_SHARDS', '10'))
+# Telegram user IDs allowed to use admin commands such as /stats, comma separated
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+
+# Counter shards per question for the global answer statistics (raise for many worker processes)
+QUESTION_STATS_SHARDS = int(os.getenv('QUESTION_STATS_SHARDS', '1'))
+
+# Storage of users, questions and translations: 'firestore' or 'sqlite' (single node, offline runs)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'firestore')
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/lidtgbot.sqlite3')
+
+# Key of the HMAC signing inline button payloads (defaults to one derived from BOT_TOKEN);
+# shared by all processes, changing it invalidates the buttons of sent messages
+CALLBACK_SECRET = os.getenv('CALLBACK_SECRET')
+# Show the answer options of quiz and learn questions in random order
+SHUFFLE_ANSWER_OPTIONS = os.getenv('SHUFFLE_ANSWER_OPTIONS', 'false').lower() in ('1', 'true', 'yes')
@@ -0,0 +1,210 @@
+"""Multi-process update dispatching sharded by user_id
+
+One ingress process receives updates (polling or webhook) and forwards each
+one to a worker process chosen by effective_user.id, so the updates and the
+in-memory caches of a user always live in the same worker. Workers run the
+regular handlers, send heartbeats back, and are restarted by the ingress
+process when they die or go silent. A restarted worker gets a new update
+queue: a worker killed while waiting in Queue.get() never releases the
+queue's reader lock, so nobody could read the old queue again.
+"""
+import time
+import queue
+import asyncio
+import logging
+import multiprocessing
+from dataclasses import dataclass, field
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+from lidtgbot.settings.config import (
+    TELEGRAM_BASE_URL,
+    WORKER_HEARTBEAT_INTERVAL,
+    WORKER_HEARTBEAT_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Builds a worker Application: app_factory(token, with_updater=False)
+AppFactory = Callable[..., Application]
+
+# Seconds a worker waits for an update before checking again, so that no thread stays blocked in get()
+QUEUE_POLL_INTERVAL = 1.0
+
+# Worker processes are spawned so that they never inherit the ingress event loop or gRPC channels
+mp = multiprocessing.get_context('spawn')
+
+
+def shard_for(update: Update, shards: int) -> int:
+    """Pick the worker for an update by user ID, falling back to the chat ID"""
+    if update.effective_user is not None:
+        key = update.effective_user.id
+    elif update.effective_chat is not None:
+        key = update.effective_chat.id
+    else:
+        key = update.update_id
+    return key % shards
+
+
+async def _run_worker(index: int, token: str, app_factory: AppFactory,
+                      updates: Any, health: Any) -> None:
+    app = app_factory(token, with_updater=False)
+    loop = asyncio.get_running_loop()
+    processed = 0
+
+    async def heartbeat() -> None:
+        while True:
+            health.put((index, time.time(), processed))
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+    async with app:
+        if app.post_init:
+            await app.post_init(app)
+        await app.start()
+        heartbeat_task = asyncio.create_task(heartbeat())
+        try:
+            while True:
+                try:
+                    data = await loop.run_in_executor(None, updates.get, True, QUEUE_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if data is None:
+                    break
+                await app.update_queue.put(Update.de_json(data, app.bot))
+                processed += 1
+        finally:
+            heartbeat_task.cancel()
+            await app.stop()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+
+
+def worker_main(index: int, token: str, app_factory: AppFactory, updates: Any, health: Any) -> None:
+    """Entry point of a worker process"""
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(name)s %(levelname)s %(message)s")
+    asyncio.run(_run_worker(index, token, app_factory, updates, health))
+
+
+@dataclass
+class WorkerHandle:
+    index: int
+    updates: Any
+    process: BaseProcess | None = None
+    last_heartbeat: float = field(default_factory=time.time)
+    processed: int = 0
+    restarts: int = 0
+
+
+class ShardedDispatcher:
+    """Forwards updates from the ingress Application to N worker processes"""
+
+    def __init__(self, token: str, workers: int, app_factory: AppFactory):
+        if workers < 1:
+            raise ValueError("At least one worker process is required")
+        self.token = token
+        self.app_factory = app_factory
+        self.health = mp.Queue()
+        self.workers = [WorkerHandle(index, mp.Queue()) for index in range(workers)]
+        self._monitor_task: asyncio.Task | None = None
+
+    def _spawn(self, worker: WorkerHandle) -> None:
+        worker.process = mp.Process(
+            target=worker_main,
+            args=(worker.index, self.token, self.app_factory, worker.updates, self.health),
+            name=f"lidtgbot-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        worker.last_heartbeat = time.time()
+        logger.info(f"Worker {worker.index} started with pid {worker.process.pid}")
+
+    def _restart(self, worker: WorkerHandle, reason: str) -> None:
+        logger.warning(f"Restarting worker {worker.index}: {reason}")
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join(5)
+        # The old queue may be locked by the dead process, its queued updates are lost
+        try:
+            lost = worker.updates.qsize()
+        except NotImplementedError:
+            lost = None
+        if lost:
+            logger.warning(f"Dropping {lost} updates queued for worker {worker.index}")
+        # Don't let the feeder thread of the old queue block exit on a pipe nobody reads
+        worker.updates.cancel_join_thread()
+        worker.updates.close()
+        worker.updates = mp.Queue()
+        worker.restarts += 1
+        self._spawn(worker)
+
+    def _drain_health(self) -> None:
+        while True:
+            try:
+                index, sent_at, processed = self.health.get_nowait()
+            except queue.Empty:
+                return
+            self.workers[index].last_heartbeat = sent_at
+            self.workers[index].processed = processed
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            self._drain_health()
+            now = time.time()
+            for worker in self.workers:
+                if worker.process is None or not worker.process.is_alive():
+                    exitcode = worker.process.exitcode if worker.process else None
+                    self._restart(worker, f"process exited with code {exitcode}")
+                elif now - worker.last_heartbeat > WORKER_HEARTBEAT_TIMEOUT:
+                    self._restart(worker, f"no heartbeat for {now - worker.last_heartbeat:.0f}s")
+
+    async def forward(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Ingress handler: hand the update to its shard"""
+        worker = self.workers[shard_for(update, len(self.workers))]
+        worker.updates.put(update.to_dict())
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Health of every worker as last reported"""
+        return [{
+            'index': worker.index,
+            'pid': worker.process.pid if worker.process else None,
+            'alive': bool(worker.process and worker.process.is_alive()),
+            'processed': worker.processed,
+            'restarts': worker.restarts,
+            'last_heartbeat': worker.last_heartbeat,
+        } for worker in self.workers]
+
+    async def start(self, app: Application) -> None:
+        """post_init hook of the ingress Application"""
+        for worker in self.workers:
+            self._spawn(worker)
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self, app: Application) -> None:
+        """post_shutdown hook: let every worker finish its queue and exit"""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        for worker in self.workers:
+            worker.updates.put(None)
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            if worker.process is not None:
+                await loop.run_in_executor(None, worker.process.join, 30)
+        self._drain_health()
+        logger.info(f"Workers stopped: {self.stats()}")
+
+
+def build_ingress_application(token: str, dispatcher: ShardedDispatcher) -> Application:
+    """Application that only receives updates and forwards them to the workers"""
+    app = (
+        Application.builder()
+        .token(token)
+        .base_url(TELEGRAM_BASE_URL)
+        .post_init(dispatcher.start)
+        .post_shutdown(dispatcher.stop)
+        .build()
+    )
+    app.add_handler(TypeHandler(Update, dispatcher.forward))
+    return app
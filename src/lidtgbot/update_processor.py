@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Awaitable
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates of different users concurrently while keeping the
+    updates of any one user (or chat, if there is no user) in order.
+
+    An update first waits for its turn among the updates of its user and only
+    then for one of the max_concurrent_updates slots, so a user sending many
+    updates at once occupies a single slot instead of starving everyone else.
+    """
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._waiting: dict[int, int] = {}
+    
+    @staticmethod
+    def _key(update: object) -> int | None:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+    
+    async def process_update(self, update: object, coroutine: Awaitable[object]) -> None:
+        key = self._key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        # asyncio.Lock wakes waiters in FIFO order, which preserves arrival order
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                # Takes the concurrency slot only now that it is this update's turn
+                await super().process_update(update, coroutine)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[object]) -> None:
+        await coroutine
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,162 @@
+"""Local stand-in for Telegram to exercise webhook mode
+
+Runs a minimal Bot API stub that answers the calls the bot makes (getMe,
+setWebhook, sendMessage, ...) and, once the bot has registered its webhook,
+POSTs synthetic /start and /federal updates from many users to it.
+
+Usage:
+    python -m lidtgbot.webhook_simulator --users 50 --updates 10
+
+and start the bot with:
+    BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 \\
+    TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot BOT_TOKEN=123:local python -m lidtgbot.main
+"""
+import json
+import time
+import asyncio
+import argparse
+import itertools
+import statistics
+from urllib.parse import parse_qsl
+import httpx
+
+COMMANDS = ('/start', '/federal')
+
+
+class FakeBotApi:
+    """Bot API stub that records every call and answers with minimal valid results"""
+
+    def __init__(self):
+        self.calls: dict[str, int] = {}
+        self.sent_messages: list[dict[str, str]] = []
+        self.webhook_url: str | None = None
+        self.webhook_set = asyncio.Event()
+        self._message_ids = itertools.count(1)
+
+    def handle(self, method: str, params: dict[str, str]) -> object:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'LiD Bot', 'username': 'lid_local_bot'}
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_set.set()
+            return True
+        if method == 'sendMessage':
+            self.sent_messages.append(params)
+            chat_id = int(params['chat_id'])
+            return {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return True
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            _, path, _ = request_line.decode().split(' ', 2)
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode().partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            # /bot<token>/<method>
+            method = path.rstrip('/').rsplit('/', 1)[-1]
+            if headers.get('content-type', '').startswith('application/json'):
+                params = json.loads(body or b'{}')
+            else:
+                params = dict(parse_qsl(body.decode()))
+            payload = json.dumps({'ok': True, 'result': self.handle(method, params)}).encode()
+
+            writer.write(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                + f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode()
+                + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    """A synthetic private-chat command message"""
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}', 'language_code': 'de'}
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text)}],
+        },
+    }
+
+
+async def post_updates(webhook_url: str, secret_token: str | None,
+                       users: int, updates_per_user: int, concurrency: int) -> list[float]:
+    """POST updates to the webhook, several users at a time, each user's updates in order"""
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret_token} if secret_token else {}
+    update_ids = itertools.count(1)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def run_user(client: httpx.AsyncClient, user_id: int) -> None:
+        for i in range(updates_per_user):
+            update = make_update(next(update_ids), user_id, COMMANDS[i % len(COMMANDS)])
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(webhook_url, json=update, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        await asyncio.gather(*(run_user(client, 100000 + n) for n in range(users)))
+    return latencies
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    api = FakeBotApi()
+    server = await asyncio.start_server(api.serve_connection, args.api_host, args.api_port)
+    print(f"Bot API stand-in listening on http://{args.api_host}:{args.api_port}/bot")
+
+    async with server:
+        print("Waiting for the bot to register its webhook...")
+        await api.webhook_set.wait()
+        webhook_url = args.webhook or api.webhook_url
+        print(f"Posting updates to {webhook_url}")
+
+        started = time.perf_counter()
+        latencies = await post_updates(webhook_url, args.secret_token, args.users,
+                                       args.updates, args.concurrency)
+        elapsed = time.perf_counter() - started
+        # Give the bot a moment to send its last replies
+        await asyncio.sleep(args.settle)
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"Posted {len(latencies)} updates in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s)")
+    print(f"Webhook POST latency p50={quantiles[49] * 1000:.1f}ms p95={quantiles[94] * 1000:.1f}ms "
+          f"p99={quantiles[98] * 1000:.1f}ms")
+    print(f"Bot API calls: {api.calls}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--api-host', default='127.0.0.1')
+    parser.add_argument('--api-port', type=int, default=8081)
+    parser.add_argument('--webhook', help="override the webhook URL registered by the bot")
+    parser.add_argument('--secret-token', help="value of WEBHOOK_SECRET_TOKEN")
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--updates', type=int, default=10, help="updates per user")
+    parser.add_argument('--concurrency', type=int, default=20, help="POSTs in flight")
+    parser.add_argument('--settle', type=float, default=2.0, help="seconds to wait for replies")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(simulate(parse_args()))
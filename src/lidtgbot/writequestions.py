@@ -1,54 +1,427 @@
-"""Writes questions to firestore"""
+"""Syncs questions from data/questions.json to firestore
+
+Only questions/{num} and translation documents whose content hash differs
+from the stored one are written. Questions and translations that are no
+longer in the file are reported, and only deleted with --prune; pruning
+more than MAX_PRUNE_FRACTION of the stored ones, a sign of a truncated or
+wrong file, also needs --force. A malformed record is skipped as a whole
+and its stored documents are kept. Documents left in question_bundles, a
+collection that is no longer read since the question bank serves questions
+from memory, are deleted too. Writes are grouped into WriteBatches of
+up to 500 operations and several batches are committed concurrently.
+
+With --backend sqlite the questions are upserted into the SQLite database
+(SQLITE_PATH) instead, in one transaction with executemany.
+
+Either way the whole catalog is then written to the binary catalog file
+(CATALOG_FILE, see lidtgbot.database.catalog_file) that bots map at startup,
+only once the database writes succeeded.
+Its version is a hash of the content, so an unchanged import does not make
+running bots reload.
+
+Usage:
+    python -m lidtgbot.writequestions [--path data/questions.json] [--dry-run] [--backend sqlite]
+                                      [--catalog-file data/catalog.bin] [--prune [--force]]
+"""
 import json
 import asyncio
-from lidtgbot.database.question import question_repository
-from lidtgbot.database.translation import TranslationRepository
-
-
-
-
-
-async def write_questions_to_firestore():
-
-    with open("data/questions.json", "r") as file:
-        d = json.load(file)
-        for question in d:
-            num = question['num']
-            solution = question['solution']
-            category = question['category']
-            image = question.get('image')
-            if image == '-':
-                image = None
-
-            # Create the question in Firestore
-            try:                
-                await question_repository.create_question(num, solution, category, image)
-                print(f"Question {num} created successfully")
-                translation_repository = TranslationRepository(num)
-                # Create translations for each language
-                await translation_repository.create_translation(
-                        language_code='de',
-                        question=question['question'],
-                        context=question.get('context'),
-                        option_a=question['a'],
-                        option_b=question['b'],
-                        option_c=question['c'],
-                        option_d=question['d']
-                    )
-                for lang, translation in question.get('translation', {}).items():
-                    await translation_repository.create_translation(
-                        language_code=lang,
-                        question=translation['question'],
-                        context=translation.get('context'),
-                        option_a=translation['a'],
-                        option_b=translation['b'],
-                        option_c=translation['c'],
-                        option_d=translation['d']
-                    )
-
-            except Exception as e:
-                print(f"Failed to create question {num}: {e}")
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Iterator, TextIO
+from google.cloud.firestore import AsyncDocumentReference
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.question_bank import bump_catalog_version
+from lidtgbot.database.catalog_file import write_catalog_file
+from lidtgbot.settings.config import CATALOG_FILE
+
+if TYPE_CHECKING:
+    from lidtgbot.database.sqlite_backend import SqliteDatabase
+
+DEFAULT_PATH = "data/questions.json"
+# Firestore limit on the number of writes in one batch
+MAX_BATCH_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+# Largest share of the stored questions or translations --prune deletes without --force
+MAX_PRUNE_FRACTION = 0.1
+# No longer written or read, superseded by the in-memory question bank
+BUNDLE_COLLECTION = 'question_bundles'
+
+
+@dataclass
+class Write:
+    doc_ref: AsyncDocumentReference
+    # None deletes the document
+    data: dict[str, Any] | None
+    merge: bool = False
+
+
+@dataclass
+class CatalogContent:
+    questions: list[dict[str, Any]] = field(default_factory=list)
+    translations: dict[tuple[str, str], dict[str, Any]] = field(default_factory=dict)
+    hashes: list[str] = field(default_factory=list)
+
+    def add(self, content: dict[str, Any], timestamps: dict[str, datetime],
+            translations: dict[str, dict[str, Any]]) -> None:
+        # Question content includes its num; translations are hashed with it, so that
+        # moving a translation to another question changes the version
+        self.questions.append({**content, **timestamps})
+        self.hashes.append(content_hash(content))
+        for lang, translation in translations.items():
+            self.translations[(content['num'], lang)] = translation
+            self.hashes.append(content_hash({'num': content['num'], **translation}))
+
+    @property
+    def version(self) -> str:
+        """Hash of the content, independent of timestamps and file order"""
+        return content_hash({'documents': sorted(self.hashes)})
+
+    def write(self, path: str) -> None:
+        size = write_catalog_file(path, self.version, self.questions, self.translations)
+        print(f"Catalog file {path}: {len(self.questions)} questions, {size} bytes, version {self.version}")
+
+
+@dataclass
+class SyncPlan:
+    writes: list[Write] = field(default_factory=list)
+    new_questions: list[str] = field(default_factory=list)
+    changed_questions: list[str] = field(default_factory=list)
+    new_translations: list[str] = field(default_factory=list)
+    changed_translations: list[str] = field(default_factory=list)
+    removed_questions: list[str] = field(default_factory=list)
+    removed_translations: list[str] = field(default_factory=list)
+    removed_bundles: list[str] = field(default_factory=list)
+    # Nums of skipped malformed records, whose stored documents are kept
+    skipped: set[str] = field(default_factory=set)
+    # Whether the removed questions and translations are deleted
+    prune: bool = False
+    unchanged: int = 0
+    # Everything in the JSON file, for the catalog file
+    catalog: CatalogContent = field(default_factory=CatalogContent)
+
+    def report(self) -> str:
+        removed = "Removed" if self.prune else "Not in the file (kept, --prune deletes them)"
+        lines = [
+            f"Questions: {len(self.new_questions)} new, {len(self.changed_questions)} changed",
+            f"Translations: {len(self.new_translations)} new, {len(self.changed_translations)} changed",
+            f"{removed}: {len(self.removed_questions)} questions, {len(self.removed_translations)} translations",
+            f"Removed bundles: {len(self.removed_bundles)}",
+            f"Unchanged documents: {self.unchanged}",
+            f"Writes: {len(self.writes)}",
+        ]
+        for title, items in (("New questions", self.new_questions),
+                             ("Changed questions", self.changed_questions),
+                             ("New translations", self.new_translations),
+                             ("Changed translations", self.changed_translations),
+                             (f"{removed}, questions", self.removed_questions),
+                             (f"{removed}, translations", self.removed_translations)):
+            if items:
+                lines.append(f"{title}: {', '.join(items)}")
+        return "\n".join(lines)
+
+
+def iter_json_array(file: TextIO, chunk_size: int = 64 * 1024) -> Iterator[dict[str, Any]]:
+    """Yield the items of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    started = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer:
+                if buffer[0] != '[':
+                    raise ValueError("Expected a JSON array")
+                buffer = buffer[1:]
+                started = True
+                continue
+        else:
+            if buffer.startswith(','):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith(']'):
+                return
+            if buffer:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    yield item
+                    buffer = buffer[end:]
+                    continue
+
+        if eof:
+            raise ValueError("Unexpected end of JSON array")
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def describe_error(error: Exception) -> str:
+    return f"missing {error}" if isinstance(error, KeyError) else str(error)
+
+
+def content_hash(data: dict[str, Any]) -> str:
+    """Stable hash of document content, used to skip unchanged documents"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def question_content(question: dict[str, Any]) -> dict[str, Any]:
+    image = question.get('image')
+    if image == '-':
+        image = None
+    if question['solution'] not in ('a', 'b', 'c', 'd'):
+        raise ValueError(f"invalid solution {question['solution']!r}")
+    return {
+        'num': str(question['num']),
+        'solution': question['solution'],
+        'category': question['category'],
+        'image': image,
+    }
+
+
+def translation_contents(question: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """German original plus every translation, keyed by language code"""
+    sources = {'de': question, **question.get('translation', {})}
+    return {
+        lang: {
+            'language_code': lang,
+            'question': source['question'],
+            'context': source.get('context'),
+            'option_a': source['a'],
+            'option_b': source['b'],
+            'option_c': source['c'],
+            'option_d': source['d'],
+        }
+        for lang, source in sources.items()
+    }
+
+
+async def load_stored_state() -> tuple[dict[str, dict[str, Any]], dict[tuple[str, str], str], list[str]]:
+    """Read content hashes of all stored questions and translations, and the ids of leftover bundles"""
+    questions: dict[str, dict[str, Any]] = {}
+    query = firestore_client.db.collection('questions').select(['content_hash', 'created_at', 'updated_at'])
+    async for doc in firestore_client.stream(query):
+        questions[doc.id] = doc.to_dict() or {}
+
+    translation_hashes: dict[tuple[str, str], str] = {}
+    query = firestore_client.db.collection_group('translations').select(['content_hash'])
+    async for doc in firestore_client.stream(query):
+        # questions/{num}/translations/{lang}
+        num = doc.reference.parent.parent.id
+        translation_hashes[(num, doc.id)] = (doc.to_dict() or {}).get('content_hash')
+
+    bundle_ids = []
+    query = firestore_client.db.collection(BUNDLE_COLLECTION).select([])
+    async for doc in firestore_client.stream(query):
+        bundle_ids.append(doc.id)
+
+    return questions, translation_hashes, sorted(bundle_ids)
+
+
+def plan_question(plan: SyncPlan, question: dict[str, Any], now: datetime,
+                  stored_questions: dict[str, dict[str, Any]],
+                  translation_hashes: dict[tuple[str, str], str]) -> None:
+    """Add the writes needed for one question and its translations to the plan"""
+    # Raises for a malformed record before anything is added to the plan
+    content = question_content(question)
+    translations = translation_contents(question)
+    num = content['num']
+    question_ref = firestore_client.db.collection('questions').document(num)
+
+    digest = content_hash(content)
+    stored = stored_questions.get(num)
+    timestamps = {'created_at': now, 'updated_at': now}
+    if stored is None:
+        plan.new_questions.append(num)
+        plan.writes.append(Write(question_ref, {**content, 'content_hash': digest, **timestamps}))
+    elif stored.get('content_hash') != digest:
+        plan.changed_questions.append(num)
+        timestamps['created_at'] = stored.get('created_at', now)
+        # Merge so that created_at of the existing document is kept
+        plan.writes.append(Write(question_ref, {
+            **content, 'content_hash': digest, 'updated_at': now,
+        }, merge=True))
+    else:
+        plan.unchanged += 1
+        timestamps = {'created_at': stored.get('created_at', now),
+                      'updated_at': stored.get('updated_at', now)}
+
+    plan.catalog.add(content, timestamps, translations)
+    for lang, translation in translations.items():
+        key = f"{num}/{lang}"
+        digest = content_hash(translation)
+        stored_hash = translation_hashes.get((num, lang))
+        if stored_hash == digest:
+            plan.unchanged += 1
+            continue
+        (plan.new_translations if stored_hash is None else plan.changed_translations).append(key)
+        plan.writes.append(Write(
+            question_ref.collection('translations').document(lang),
+            {**translation, 'content_hash': digest},
+        ))
+
+
+def plan_removals(plan: SyncPlan, stored_questions: dict[str, dict[str, Any]],
+                  translation_hashes: dict[tuple[str, str], str]) -> None:
+    """Collect the stored questions and translations that are no longer in the file, and delete them if pruning"""
+    questions = firestore_client.db.collection('questions')
+    kept = plan.skipped | {question['num'] for question in plan.catalog.questions}
+    for num, lang in sorted(translation_hashes):
+        if num not in plan.skipped and (num, lang) not in plan.catalog.translations:
+            plan.removed_translations.append(f"{num}/{lang}")
+            if plan.prune:
+                plan.writes.append(Write(questions.document(num).collection('translations').document(lang), None))
+    for num in sorted(stored_questions):
+        if num not in kept:
+            plan.removed_questions.append(num)
+            if plan.prune:
+                plan.writes.append(Write(questions.document(num), None))
+
+
+def check_prune(plan: SyncPlan, stored_questions: int, stored_translations: int) -> None:
+    """Refuse to prune more than MAX_PRUNE_FRACTION of the stored questions or translations"""
+    for kind, removed, stored in (("questions", len(plan.removed_questions), stored_questions),
+                                  ("translations", len(plan.removed_translations), stored_translations)):
+        if removed > stored * MAX_PRUNE_FRACTION:
+            raise ValueError(f"Refusing to delete {removed} of {stored} stored {kind}, "
+                             f"add --force if the file is right")
+
+
+def plan_bundle_removals(plan: SyncPlan, bundle_ids: list[str]) -> None:
+    """Add deletes of the bundle documents written by earlier imports"""
+    bundles = firestore_client.db.collection(BUNDLE_COLLECTION)
+    for bundle_id in bundle_ids:
+        plan.removed_bundles.append(bundle_id)
+        plan.writes.append(Write(bundles.document(bundle_id), None))
+
+
+async def commit_writes(writes: list[Write], concurrency: int = DEFAULT_CONCURRENCY) -> None:
+    """Commit writes in batches of up to 500, several batches at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def commit_chunk(chunk: list[Write]) -> None:
+        async with semaphore:
+            batch = firestore_client.db.batch()
+            for write in chunk:
+                if write.data is None:
+                    batch.delete(write.doc_ref)
+                else:
+                    batch.set(write.doc_ref, write.data, merge=write.merge)
+            await firestore_client.commit(batch)
+            print(f"Committed batch of {len(chunk)} writes")
+
+    await asyncio.gather(*(
+        commit_chunk(writes[start:start + MAX_BATCH_SIZE])
+        for start in range(0, len(writes), MAX_BATCH_SIZE)
+    ))
+
+
+async def write_questions_to_firestore(path: str = DEFAULT_PATH, dry_run: bool = False,
+                                       concurrency: int = DEFAULT_CONCURRENCY,
+                                       catalog_file: str | None = CATALOG_FILE,
+                                       prune: bool = False, force: bool = False) -> SyncPlan:
+    """Sync questions and translations to Firestore, then write the catalog file"""
+    stored_questions, translation_hashes, bundle_ids = await load_stored_state()
+    now = datetime.now(timezone.utc)
+
+    plan = SyncPlan(prune=prune)
+    with open(path, "r", encoding="utf-8") as file:
+        for question in iter_json_array(file):
+            try:
+                plan_question(plan, question, now, stored_questions, translation_hashes)
+            except (KeyError, ValueError) as e:
+                print(f"Skipping malformed question {question.get('num')}: {describe_error(e)}")
+                if question.get('num') is not None:
+                    plan.skipped.add(str(question['num']))
+    plan_removals(plan, stored_questions, translation_hashes)
+    plan_bundle_removals(plan, bundle_ids)
+
+    print(plan.report())
+    if prune and not force:
+        check_prune(plan, len(stored_questions), len(translation_hashes))
+    if dry_run:
+        return plan
+    if plan.writes:
+        await commit_writes(plan.writes, concurrency)
+        # Tell running bots to reload their question bank
+        await bump_catalog_version()
+    # Last, so that bots never map a catalog the database does not have
+    if catalog_file:
+        plan.catalog.write(catalog_file)
+    return plan
+
+
+def write_questions_to_sqlite(path: str = DEFAULT_PATH, dry_run: bool = False,
+                              database: 'SqliteDatabase | None' = None,
+                              catalog_file: str | None = CATALOG_FILE,
+                              prune: bool = False, force: bool = False) -> tuple[int, int, int, int]:
+    """Upsert new and changed questions and translations into SQLite, and write the catalog file"""
+    from lidtgbot.database.sqlite_backend import sqlite_database
+
+    now = datetime.now(timezone.utc)
+    questions: list[dict[str, Any]] = []
+    translations: list[dict[str, Any]] = []
+    skipped: set[str] = set()
+    catalog = CatalogContent()
+    with open(path, "r", encoding="utf-8") as file:
+        for question in iter_json_array(file):
+            try:
+                content = question_content(question)
+                contents = translation_contents(question)
+            except (KeyError, ValueError) as e:
+                print(f"Skipping malformed question {question.get('num')}: {describe_error(e)}")
+                if question.get('num') is not None:
+                    skipped.add(str(question['num']))
+                continue
+            questions.append({**content, 'content_hash': content_hash(content), 'now': now.isoformat()})
+            translations.extend({**translation, 'num': content['num'], 'content_hash': content_hash(translation)}
+                                for translation in contents.values())
+            catalog.add(content, {'created_at': now, 'updated_at': now}, contents)
+
+    written = (database or sqlite_database).import_catalog(
+        questions, translations, skipped, dry_run, prune, 1.0 if force else MAX_PRUNE_FRACTION)
+    print(f"Questions: {written[0]} new or changed of {len(questions)}")
+    print(f"Translations: {written[1]} new or changed of {len(translations)}")
+    removed = "Removed" if prune else "Not in the file (kept, --prune deletes them)"
+    print(f"{removed}: {written[2]} questions, {written[3]} translations")
+    if catalog_file and not dry_run:
+        catalog.write(catalog_file)
+    return written
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=DEFAULT_PATH, help="questions JSON file")
+    parser.add_argument('--dry-run', action='store_true', help="only report the diff")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of batches committed at the same time")
+    parser.add_argument('--backend', choices=('firestore', 'sqlite'), default='firestore',
+                        help="storage to write to")
+    parser.add_argument('--catalog-file', default=CATALOG_FILE,
+                        help="binary catalog file to write (empty to skip)")
+    parser.add_argument('--prune', action='store_true',
+                        help="delete stored questions and translations that are not in the file")
+    parser.add_argument('--force', action='store_true',
+                        help=f"prune even more than {MAX_PRUNE_FRACTION * 100:.0f}%% of them")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(write_questions_to_firestore())
+    args = parse_args()
+    try:
+        if args.backend == 'sqlite':
+            write_questions_to_sqlite(args.path, args.dry_run, catalog_file=args.catalog_file,
+                                      prune=args.prune, force=args.force)
+        else:
+            asyncio.run(write_questions_to_firestore(args.path, args.dry_run, args.concurrency,
+                                                     args.catalog_file, args.prune, args.force))
+    except ValueError as e:
+        raise SystemExit(str(e))
@@ -0,0 +1,113 @@
+"""Shared fixtures: every test runs against a fresh in-memory Firestore"""
+import os
+
+# Must be set before lidtgbot.database creates its client
+os.environ['FIRESTORE_BACKEND'] = 'memory'
+# The global repositories are the Firestore ones, SQLite and the catalog file are tested separately
+os.environ['STORAGE_BACKEND'] = 'firestore'
+os.environ['CATALOG_FILE'] = ''
+
+import json
+import time
+import statistics
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import pytest
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.memory_client import MemoryFirestore
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.user import USERS_COLLECTION, UserWriteBuffer, user_repository
+from lidtgbot.database.user_cache import UserCache
+from lidtgbot.database.stats import stats_repository
+
+# Scenarios measured in this session, printed as a table at the end
+RESULTS: list['Result'] = []
+
+
+@dataclass
+class Result:
+    name: str
+    calls: int
+    latencies: list[float]
+    rpcs: int
+    reads: int
+    writes: int
+    budget: float
+
+    @property
+    def rpcs_per_call(self) -> float:
+        return self.rpcs / self.calls
+
+    def row(self) -> str:
+        mean = statistics.fmean(self.latencies) * 1000
+        p95 = (statistics.quantiles(self.latencies, n=20)[18] if len(self.latencies) > 1
+               else self.latencies[0]) * 1000
+        return (f"{self.name:<34} {self.calls:>6} {mean:>9.3f} {p95:>9.3f} "
+                f"{self.rpcs_per_call:>8.2f} {self.budget:>7.2f} "
+                f"{self.reads / self.calls:>7.2f} {self.writes / self.calls:>7.2f}")
+
+
+HEADER = (f"{'scenario':<34} {'calls':>6} {'mean ms':>9} {'p95 ms':>9} "
+          f"{'rpc/call':>8} {'budget':>7} {'reads':>7} {'writes':>7}")
+
+Measure = Callable[[str, int, float, Callable[[int], Awaitable[object]]], Awaitable[Result]]
+
+
+def write_catalog(path: str, questions: int) -> None:
+    """Synthetic catalog: general questions plus a few state questions, two translations each"""
+    items = []
+    for n in range(1, questions + 1):
+        category = 'bayern' if n % 10 == 0 else 'Politik'
+        items.append({
+            'num': str(n), 'solution': 'abcd'[n % 4], 'category': category, 'image': '-',
+            'question': f'Frage {n}?', 'context': '', 'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D',
+            'translation': {
+                lang: {'question': f'Question {n}?', 'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}
+                for lang in ('en', 'ru')
+            },
+        })
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(items, file)
+
+
+@pytest.fixture(autouse=True)
+def memory_db(monkeypatch: pytest.MonkeyPatch) -> MemoryFirestore:
+    """Empty the in-memory Firestore and reset the global caches and buffers in front of it"""
+    db = firestore_client.db
+    monkeypatch.setattr(db, '_documents', {})
+    monkeypatch.setattr(db, 'latency', 0.0)
+    db.reset_counters()
+    monkeypatch.setattr(question_bank, '_loaded', False)
+    monkeypatch.setattr(user_repository, 'cache', UserCache())
+    monkeypatch.setattr(user_repository, 'write_buffer', UserWriteBuffer(USERS_COLLECTION))
+    stats_repository._pending.clear()
+    return db
+
+
+@pytest.fixture
+def measure(memory_db: MemoryFirestore) -> Measure:
+    """Run call(i) for i in range(calls) and fail if it takes more round trips per call than budget"""
+    async def run(name: str, calls: int, budget: float,
+                  call: Callable[[int], Awaitable[object]]) -> Result:
+        memory_db.reset_counters()
+        latencies = []
+        for i in range(calls):
+            started = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - started)
+        result = Result(name, calls, latencies, memory_db.rpcs,
+                        memory_db.ops['read'], memory_db.ops['write'], budget)
+        RESULTS.append(result)
+        assert result.rpcs_per_call <= budget, \
+            f"{name}: {result.rpcs_per_call:.2f} round trips per call, budget {budget:.2f}"
+        return result
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter: pytest.TerminalReporter) -> None:
+    if RESULTS:
+        terminalreporter.section("Firestore round trips")
+        terminalreporter.write_line(HEADER)
+        for result in RESULTS:
+            terminalreporter.write_line(result.row())
@@ -0,0 +1,53 @@
+"""Broadcasts resume from their checkpointed cursor"""
+import asyncio
+from lidtgbot.broadcast import Broadcaster
+from lidtgbot.database.broadcast import broadcast_repository
+from lidtgbot.database.user import user_repository
+
+
+class FakeBot:
+    """Records sends; hangs on the chat it should be interrupted at"""
+
+    def __init__(self, hang_on: int | None = None):
+        self.sent: list[int] = []
+        self.hang_on = hang_on
+        self.hanging = asyncio.Event()
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        if chat_id == self.hang_on:
+            self.hanging.set()
+            await asyncio.Event().wait()
+        self.sent.append(chat_id)
+
+
+def broadcaster(bot: FakeBot) -> Broadcaster:
+    return Broadcaster(bot, rate=1000, chat_interval=0, workers=1, page_size=2)
+
+
+def test_interrupted_broadcast_resumes_after_checkpoint() -> None:
+    async def scenario() -> None:
+        for user_id in range(1, 6):
+            await user_repository.ensure_user(user_id, f"User{user_id}")
+        await user_repository.write_buffer.flush()
+        broadcast = await broadcast_repository.create_broadcast("Hallo")
+
+        # Interrupted in the second page
+        bot = FakeBot(hang_on=4)
+        run = asyncio.create_task(broadcaster(bot).run(broadcast))
+        await bot.hanging.wait()
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        assert bot.sent == [1, 2, 3]
+
+        stored = await broadcast_repository.get_broadcast(broadcast.broadcast_id)
+        assert (stored.cursor, stored.sent, stored.finished) == ('2', 2, False)
+
+        # The unfinished page is sent again
+        bot = FakeBot()
+        finished = await broadcaster(bot).run(stored)
+        assert bot.sent == [3, 4, 5]
+        stored = await broadcast_repository.get_broadcast(broadcast.broadcast_id)
+        assert (stored.cursor, stored.sent, stored.finished) == ('5', 5, True)
+        assert finished == stored
+
+    asyncio.run(scenario())
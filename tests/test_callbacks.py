@@ -0,0 +1,29 @@
+"""Signed callback data of inline buttons"""
+import base64
+from lidtgbot.callbacks import MAX_CALLBACK_DATA, QUIZ, LEARN, CallbackCodec, CallbackPayload
+
+codec = CallbackCodec('secret')
+payload = CallbackPayload(QUIZ, index=301, option=2, permutation=17, nonce=123456)
+
+
+def test_round_trip_fits_telegram_limit() -> None:
+    data = codec.encode(payload)
+    assert len(data.encode('utf-8')) <= MAX_CALLBACK_DATA
+    assert codec.decode(data) == payload
+
+
+def test_tampered_data_is_rejected() -> None:
+    data = codec.encode(payload)
+    raw = bytearray(base64.urlsafe_b64decode(data[1:] + '=' * (-len(data[1:]) % 4)))
+    # Another pressed option with the original MAC
+    raw[2] ^= 1
+    assert codec.decode(data[0] + base64.urlsafe_b64encode(bytes(raw)).rstrip(b'=').decode('ascii')) is None
+    # The same fields under another action prefix
+    assert codec.decode(LEARN + data[1:]) is None
+    assert codec.decode(data[:-2]) is None
+    assert codec.decode(data[0] + '!!!') is None
+
+
+def test_data_signed_with_another_key_is_rejected() -> None:
+    foreign = CallbackCodec('other secret').encode(payload)
+    assert codec.decode(foreign) is None
@@ -0,0 +1,49 @@
+"""The memory-mapped catalog file and the question bank built on it"""
+import json
+import asyncio
+from lidtgbot.database import image_file, sqlite_backend
+from lidtgbot.database.catalog_file import MmapCatalogSource
+from lidtgbot.database.image_file import ImageFileStore
+from lidtgbot.database.question_bank import QuestionBank
+from lidtgbot.database.sqlite_backend import SqliteCatalogSource, SqliteDatabase
+from lidtgbot.writequestions import write_questions_to_sqlite
+from tests.conftest import write_catalog
+
+
+def test_bank_indexes_catalog_file_without_decoding(tmp_path, monkeypatch) -> None:
+    catalog_json = str(tmp_path / 'questions.json')
+    catalog_file = str(tmp_path / 'catalog.bin')
+    write_catalog(catalog_json, 30)
+    with open(catalog_json, encoding='utf-8') as file:
+        items = json.load(file)
+    items[6]['image'] = 'images/7.png'
+    with open(catalog_json, 'w', encoding='utf-8') as file:
+        json.dump(items, file)
+    database = SqliteDatabase(str(tmp_path / 'lidtgbot.sqlite3'))
+    write_questions_to_sqlite(catalog_json, database=database, catalog_file=catalog_file)
+    # Uploaded after the catalog file was written
+    database.save_image_file_id('images/7.png', 'file-id-7')
+
+    monkeypatch.setattr(image_file, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(sqlite_backend, 'sqlite_database', database)
+    mapped = QuestionBank(MmapCatalogSource(catalog_file))
+    images = ImageFileStore(mapped)
+    stored = QuestionBank(SqliteCatalogSource(database))
+
+    async def scenario() -> None:
+        await mapped.load()
+        await stored.load()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        database.close()
+
+    assert not mapped._questions._decoded
+    assert mapped.nums == stored.nums
+    assert sorted(mapped.categories) == ['Politik', 'bayern']
+    assert mapped.nums_in_category('bayern') == ['10', '20', '30']
+    assert mapped.state_indices('bayern') == stored.state_indices('bayern')
+    assert mapped.general_indices == stored.general_indices
+    assert images.get_file_id('images/7.png') == 'file-id-7'
+    assert mapped.get_question('20') == stored.get_question('20')
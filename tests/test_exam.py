@@ -0,0 +1,49 @@
+"""Exam papers and exam sessions that only persist their seed"""
+import asyncio
+import pytest
+from lidtgbot.database.catalog_file import MmapCatalogSource
+from lidtgbot.database.exam import exam_generator
+from lidtgbot.database.question_bank import question_bank
+from lidtgbot.database.quiz_session import QuizSessionStore
+from lidtgbot.writequestions import write_questions_to_sqlite
+from lidtgbot.database.sqlite_backend import SqliteDatabase
+from tests.conftest import write_catalog
+
+
+@pytest.fixture
+def loaded_bank(tmp_path, monkeypatch) -> None:
+    """The global question bank with 54 general and 6 Bayern questions"""
+    catalog_json = str(tmp_path / 'questions.json')
+    catalog_file = str(tmp_path / 'catalog.bin')
+    write_catalog(catalog_json, 60)
+    database = SqliteDatabase(str(tmp_path / 'lidtgbot.sqlite3'))
+    write_questions_to_sqlite(catalog_json, database=database, catalog_file=catalog_file)
+    database.close()
+    monkeypatch.setattr(question_bank, 'source', MmapCatalogSource(catalog_file))
+    asyncio.run(question_bank.load())
+
+
+def test_can_draw(loaded_bank) -> None:
+    assert exam_generator.can_draw('bayern')
+    # No questions of this state in the catalog
+    assert not exam_generator.can_draw('berlin')
+
+
+def test_exam_session_is_drawn_again_from_its_seed(loaded_bank) -> None:
+    async def scenario() -> None:
+        store = QuizSessionStore()
+        paper = exam_generator.paper('bayern')
+        session = store.start_exam(1, paper)
+        store.record_answer(session, True)
+        store.record_answer(session, False)
+        await store.stop()
+
+        restored = await QuizSessionStore().get_session(1)
+        assert restored is not None
+        assert (restored.exam_seed, restored.exam_state) == (paper.seed, 'bayern')
+        assert restored.order == paper.indices
+        assert (restored.cursor, restored.correct_count) == (2, 1)
+        # Seed and state instead of 33 indexes
+        assert len(restored.to_bytes()) < len(paper.indices) * 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,95 @@
+"""SM-2 scheduling of learn mode and its packed review records"""
+import random
+from lidtgbot.models.learning_state import (
+    DEFAULT_EASE,
+    FIRST_INTERVAL,
+    MAX_INTERVAL,
+    MIN_EASE,
+    RELEARN_INTERVAL,
+    SECOND_INTERVAL,
+    LearningState,
+    LearnScheduler,
+    ReviewRecord,
+    question_key,
+)
+
+NOW = 29_000_000
+
+
+def test_on_time_reviews_follow_sm2() -> None:
+    record = ReviewRecord(due=NOW)
+    now = NOW
+    record.review(True, now)
+    assert (record.interval, record.due) == (FIRST_INTERVAL, now + FIRST_INTERVAL)
+    now = record.due
+    record.review(True, now)
+    assert record.interval == SECOND_INTERVAL
+    now = record.due
+    record.review(True, now)
+    # Third review multiplies by the ease after two correct answers
+    assert record.interval == SECOND_INTERVAL * (DEFAULT_EASE + 100) // 1000
+    assert record.reps == 3
+
+
+def test_wrong_answer_relearns_and_lowers_ease() -> None:
+    record = ReviewRecord(due=NOW, interval=SECOND_INTERVAL, ease=MIN_EASE + 100, reps=5)
+    record.review(False, NOW)
+    assert (record.reps, record.lapses, record.interval) == (0, 1, RELEARN_INTERVAL)
+    assert record.due == NOW + RELEARN_INTERVAL
+    assert record.ease == MIN_EASE
+
+
+def test_early_reviews_do_not_grow_the_interval() -> None:
+    record = ReviewRecord(due=NOW)
+    record.review(True, NOW)
+    record.review(True, NOW + FIRST_INTERVAL)
+    interval = record.interval
+    record.review(True, NOW + FIRST_INTERVAL + 1)
+    assert record.interval == interval
+
+
+def test_many_early_answers_stay_packable() -> None:
+    """Answering the only question over and over used to overflow the uint32 fields"""
+    num = '1'
+    state = LearningState()
+    scheduler = LearnScheduler(state, {0: question_key(num)}, random.Random(1))
+    now = NOW
+    for _ in range(200):
+        index = scheduler.next_question(now)
+        scheduler.record_answer(index, True, now)
+        now += 1
+        state.to_bytes()
+    assert state.records[question_key(num)].interval <= MAX_INTERVAL
+
+    # Even answered exactly on time, the interval stops at the cap
+    record = ReviewRecord(due=NOW, interval=MAX_INTERVAL, reps=10)
+    record.review(True, NOW)
+    assert record.interval == MAX_INTERVAL
+
+
+def test_bytes_round_trip() -> None:
+    state = LearningState({
+        question_key('1'): ReviewRecord(due=NOW, interval=FIRST_INTERVAL, ease=2600, reps=1),
+        question_key('2'): ReviewRecord(due=NOW + 10, interval=RELEARN_INTERVAL, ease=MIN_EASE, lapses=3),
+    })
+    data = state.to_bytes()
+    assert len(data) == 16 * 2
+    assert LearningState.from_bytes(data) == state
+    assert LearningState.from_bytes(None) == LearningState()
+
+
+def test_scheduler_prefers_overdue_then_unseen_then_soonest() -> None:
+    keys = {index: question_key(str(index)) for index in range(3)}
+    state = LearningState({
+        keys[0]: ReviewRecord(due=NOW - 5, interval=FIRST_INTERVAL, reps=1),
+        keys[1]: ReviewRecord(due=NOW + 100, interval=FIRST_INTERVAL, reps=1),
+    })
+    scheduler = LearnScheduler(state, keys, random.Random(1))
+    assert scheduler.next_question(NOW) == 0
+    # The same question until it is answered
+    assert scheduler.next_question(NOW) == 0
+    scheduler.record_answer(0, True, NOW)
+    assert scheduler.next_question(NOW) == 2
+    scheduler.record_answer(2, False, NOW)
+    # Nothing due: the one due soonest, the relearned question
+    assert scheduler.next_question(NOW) == 2
@@ -0,0 +1,52 @@
+"""user_data/chat_data persistence in Firestore"""
+import asyncio
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.persistence import FirestorePersistence
+
+
+def test_stored_data_is_bounded() -> None:
+    async def scenario() -> None:
+        persistence = FirestorePersistence()
+        persistence.user_data.maxsize = 2
+        for user_id in (1, 2, 3):
+            data: dict = {}
+            await persistence.refresh_user_data(user_id, data)
+            await persistence.update_user_data(user_id, {'seen': user_id})
+        await persistence.flush()
+        assert list(persistence.user_data._persisted) == [2, 3]
+
+        # An evicted user is read again and keeps their data
+        data = {}
+        await persistence.refresh_user_data(1, data)
+        assert data == {'seen': 1}
+        assert list(persistence.user_data._persisted) == [3, 1]
+
+    asyncio.run(scenario())
+
+
+def test_failed_load_falls_back_to_memory(monkeypatch) -> None:
+    get = firestore_client.get
+    failures = [ConnectionError("unavailable")]
+
+    async def flaky_get(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return await get(*args, **kwargs)
+
+    monkeypatch.setattr(firestore_client, 'get', flaky_get)
+
+    async def scenario() -> None:
+        writer = FirestorePersistence()
+        await writer.update_user_data(1, {'stored': True})
+        await writer.flush()
+
+        persistence = FirestorePersistence()
+        data = {'in_memory': True}
+        await persistence.refresh_user_data(1, data)
+        assert data == {'in_memory': True}
+
+        # The next update loads it
+        await persistence.refresh_user_data(1, data)
+        assert data == {'in_memory': True, 'stored': True}
+
+    asyncio.run(scenario())
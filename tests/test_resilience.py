@@ -0,0 +1,93 @@
+"""Circuit breaker transitions and retries of Firestore calls"""
+import asyncio
+import pytest
+from lidtgbot.database import resilience
+from lidtgbot.database.resilience import CircuitBreaker, CircuitOpenError, Resilience
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list[float]:
+    """Monotonic time of the breaker, advanced by the test"""
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_probes_and_closes(clock: list[float]) -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    # One probe after the reset timeout, a failed probe opens it again
+    clock[0] += 5
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock[0] += 5
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_only_idempotent_calls_are_retried(clock: list[float]) -> None:
+    policy = Resilience(attempts=3, base_delay=0, max_delay=0, deadline=10, hedge_reads=False,
+                        breaker=CircuitBreaker(failure_threshold=10, reset_timeout=5))
+    calls = []
+
+    async def attempt() -> str:
+        calls.append(len(calls))
+        if len(calls) < 3:
+            raise ConnectionError("unavailable")
+        return 'ok'
+
+    async def scenario() -> None:
+        assert await policy.call('get', attempt) == 'ok'
+        assert len(calls) == 3
+
+        # A commit may have been applied before the connection broke
+        calls.clear()
+        with pytest.raises(ConnectionError):
+            await policy.call('commit', attempt, idempotent=False)
+        assert len(calls) == 1
+
+        # Not transient: raised right away and healthy for the breaker
+        async def not_found() -> None:
+            calls.append(0)
+            raise KeyError('missing')
+
+        calls.clear()
+        with pytest.raises(KeyError):
+            await policy.call('get', not_found)
+        assert len(calls) == 1
+        assert policy.breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_open_breaker_fails_fast(clock: list[float]) -> None:
+    policy = Resilience(attempts=5, base_delay=0, max_delay=0, deadline=10, hedge_reads=False,
+                        breaker=CircuitBreaker(failure_threshold=2, reset_timeout=5))
+    calls = []
+
+    async def attempt() -> None:
+        calls.append(0)
+        raise ConnectionError("unavailable")
+
+    async def scenario() -> None:
+        # Retries stop once the breaker opens
+        with pytest.raises(ConnectionError):
+            await policy.call('get', attempt)
+        assert len(calls) == 2
+        with pytest.raises(CircuitOpenError):
+            await policy.call('get', attempt)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,157 @@
+"""Round-trip budgets of the hot repository paths and the catalog import
+
+Every scenario runs against the in-memory Firestore and fails if it needs
+more round trips per call than its budget. The SQLite backend and the
+catalog file must not touch Firestore at all. Iterations, simulated latency
+and catalog size can be raised with BENCHMARK_ITERATIONS, BENCHMARK_LATENCY
+and BENCHMARK_QUESTIONS (python -m lidtgbot.benchmarks sets them).
+"""
+import os
+import math
+import asyncio
+import pytest
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.question import question_repository
+from lidtgbot.database.question_bank import QuestionBank, question_bank
+from lidtgbot.database.sqlite_backend import SqliteCatalogSource, SqliteDatabase, SqliteUserRepository
+from lidtgbot.database.catalog_file import MmapCatalogSource
+from lidtgbot.database.translation import TranslationRepository, get_translations
+from lidtgbot.database.user import user_repository
+from lidtgbot.writequestions import write_questions_to_firestore, write_questions_to_sqlite
+from lidtgbot.settings.config import FIRESTORE_GET_ALL_CHUNK_SIZE
+from tests.conftest import Measure, write_catalog
+
+ITERATIONS = int(os.getenv('BENCHMARK_ITERATIONS', '200'))
+LATENCY = float(os.getenv('BENCHMARK_LATENCY', '0'))
+QUESTIONS = int(os.getenv('BENCHMARK_QUESTIONS', '60'))
+
+NUMS = [str(n) for n in range(1, QUESTIONS + 1)]
+
+
+@pytest.fixture
+def catalog_json(tmp_path) -> str:
+    path = str(tmp_path / 'questions.json')
+    write_catalog(path, QUESTIONS)
+    return path
+
+
+@pytest.fixture
+def imported(catalog_json: str, tmp_path) -> str:
+    """Import the catalog into Firestore, returns the path of the catalog file written with it"""
+    catalog_file = str(tmp_path / 'catalog.bin')
+    asyncio.run(write_questions_to_firestore(catalog_json, catalog_file=catalog_file))
+    return catalog_file
+
+
+def test_catalog_import(measure: Measure, catalog_json: str, tmp_path) -> None:
+    catalog_file = str(tmp_path / 'catalog.bin')
+    # Question, German original and two translations
+    writes = QUESTIONS * (1 + 3)
+
+    async def scenario() -> None:
+        # 2 scans of stored hashes, 1 of leftover bundles + commits of <= 500 writes + version marker
+        await measure("catalog import (initial)", 1, 3 + math.ceil(writes / 500) + 1,
+                      lambda i: write_questions_to_firestore(catalog_json, catalog_file=catalog_file))
+        await measure("catalog import (unchanged)", 1, 3,
+                      lambda i: write_questions_to_firestore(catalog_json, catalog_file=catalog_file))
+
+    asyncio.run(scenario())
+
+
+def test_catalog_file(measure: Measure, imported: str) -> None:
+    bank = QuestionBank(MmapCatalogSource(imported))
+
+    async def get_translation(i: int) -> None:
+        bank.get_translation(NUMS[i % len(NUMS)], 'en')
+
+    async def scenario() -> None:
+        await measure("catalog file load", 1, 0, lambda i: bank.load())
+        await measure("get_translation (catalog file)", ITERATIONS, 0, get_translation)
+
+    asyncio.run(scenario())
+
+
+def test_cold_reads(measure: Measure, imported: str, memory_db) -> None:
+    memory_db.latency = LATENCY
+    translations = {num: TranslationRepository(num) for num in NUMS}
+    chunks = math.ceil(QUESTIONS / FIRESTORE_GET_ALL_CHUNK_SIZE)
+
+    async def scenario() -> None:
+        await measure("get_question (cold)", ITERATIONS, 1,
+                      lambda i: question_repository.get_question(NUMS[i % len(NUMS)]))
+        await measure("get_translation (cold)", ITERATIONS, 1,
+                      lambda i: translations[NUMS[i % len(NUMS)]].get_translation('en'))
+        await measure(f"get_questions (cold, {QUESTIONS})", 1, chunks,
+                      lambda i: question_repository.get_questions(NUMS))
+        # Requested language and German fallback
+        await measure(f"get_translations (cold, {QUESTIONS})", 1, 2 * chunks,
+                      lambda i: get_translations(NUMS, 'ru'))
+
+    asyncio.run(scenario())
+
+
+def test_question_bank(measure: Measure, imported: str, memory_db) -> None:
+    memory_db.latency = LATENCY
+    translations = {num: TranslationRepository(num) for num in NUMS}
+
+    async def scenario() -> None:
+        await measure("question bank load", 1, 3, lambda i: question_bank.load())
+        await measure("get_question (bank)", ITERATIONS, 0,
+                      lambda i: question_repository.get_question(NUMS[i % len(NUMS)]))
+        await measure("get_translation (bank)", ITERATIONS, 0,
+                      lambda i: translations[NUMS[i % len(NUMS)]].get_translation('en'))
+
+    asyncio.run(scenario())
+
+
+def test_users(measure: Measure, memory_db) -> None:
+    memory_db.latency = LATENCY
+    user_ids = [1000 + i for i in range(ITERATIONS)]
+
+    def ensure(i: int):
+        return user_repository.ensure_user(user_ids[i], f"User{i}", language_code='de', update_activity=True)
+
+    async def scenario() -> None:
+        await measure("ensure_user (new user)", ITERATIONS, 2, ensure)
+        await measure("ensure_user (cached)", ITERATIONS, 0, ensure)
+        await user_repository.write_buffer.flush()
+        for user_id in user_ids:
+            user_repository.cache.invalidate(user_id)
+        await measure("ensure_user (existing, uncached)", ITERATIONS, 1, ensure)
+        await measure("write buffer flush", 1, 1 + ITERATIONS // 500,
+                      lambda i: user_repository.write_buffer.flush())
+        for user_id in user_ids:
+            user_repository.cache.invalidate(user_id)
+        await measure(f"get_users (uncached, {ITERATIONS})", 1,
+                      math.ceil(ITERATIONS / FIRESTORE_GET_ALL_CHUNK_SIZE),
+                      lambda i: user_repository.get_users(user_ids))
+
+    asyncio.run(scenario())
+
+
+def test_sqlite(measure: Measure, catalog_json: str, tmp_path) -> None:
+    """The same paths on the SQLite backend, which must not touch Firestore at all"""
+    database = SqliteDatabase(str(tmp_path / 'lidtgbot.sqlite3'))
+    users = SqliteUserRepository(database)
+
+    async def import_catalog() -> None:
+        write_questions_to_sqlite(catalog_json, database=database, catalog_file=None)
+
+    def ensure(i: int):
+        return users.ensure_user(1000 + i, f"User{i}", language_code='de', update_activity=True)
+
+    async def scenario() -> None:
+        await measure("sqlite catalog import", 1, 0, lambda i: import_catalog())
+        bank = QuestionBank(SqliteCatalogSource(database))
+        await measure("sqlite question bank load", 1, 0, lambda i: bank.load())
+        await measure("sqlite ensure_user (new user)", ITERATIONS, 0, ensure)
+        await measure("sqlite ensure_user (existing)", ITERATIONS, 0, ensure)
+        await measure("sqlite get_user", ITERATIONS, 0, lambda i: users.get_user(1000 + i))
+        await measure(f"sqlite get_users ({ITERATIONS})", 1, 0,
+                      lambda i: users.get_users([1000 + i for i in range(ITERATIONS)]))
+        await users.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        database.close()
@@ -0,0 +1,90 @@
+"""Worker processes of the sharded mode"""
+import json
+import time
+import queue
+from typing import Any
+from telegram.ext import Application
+from telegram.request import BaseRequest
+from lidtgbot.sharding import ShardedDispatcher
+
+# Seconds to wait for a spawned worker, which has to import the bot first
+SPAWN_TIMEOUT = 60
+
+
+class OfflineRequest(BaseRequest):
+    """Answers getMe locally and every other Bot API call with True"""
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        if url.endswith('/getMe'):
+            result: object = {'id': 1, 'is_bot': True, 'first_name': 'Bot', 'username': 'test_bot'}
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def build_offline_application(token: str, with_updater: bool = True) -> Application:
+    """Worker application without handlers that never talks to Telegram"""
+    return (
+        Application.builder()
+        .token(token)
+        .request(OfflineRequest())
+        .get_updates_request(OfflineRequest())
+        .updater(None)
+        .build()
+    )
+
+
+def message_update(update_id: int) -> dict[str, Any]:
+    user = {'id': 42, 'is_bot': False, 'first_name': 'User'}
+    return {
+        'update_id': update_id,
+        'message': {'message_id': update_id, 'date': int(time.time()), 'text': 'hi',
+                    'chat': {'id': 42, 'type': 'private'}, 'from': user},
+    }
+
+
+def wait_for_processed(dispatcher: ShardedDispatcher, processed: int) -> int:
+    """Read heartbeats until the worker reports the number of processed updates"""
+    deadline = time.monotonic() + SPAWN_TIMEOUT
+    reported = -1
+    while reported < processed and time.monotonic() < deadline:
+        try:
+            _, _, reported = dispatcher.health.get(timeout=1)
+        except queue.Empty:
+            pass
+    return reported
+
+
+def test_restarted_worker_processes_updates(monkeypatch) -> None:
+    # Read by the worker processes when they import the settings
+    monkeypatch.setenv('WORKER_HEARTBEAT_INTERVAL', '0.1')
+    dispatcher = ShardedDispatcher('123:offline', 1, build_offline_application)
+    worker = dispatcher.workers[0]
+    dispatcher._spawn(worker)
+    try:
+        worker.updates.put(message_update(1))
+        assert wait_for_processed(dispatcher, 1) == 1
+        # The worker now waits in Queue.get(), holding the queue's reader lock when it is killed
+        time.sleep(0.5)
+        dispatcher._restart(worker, "test")
+
+        for update_id in range(2, 5):
+            worker.updates.put(message_update(update_id))
+        assert wait_for_processed(dispatcher, 3) == 3
+
+        worker.updates.put(None)
+        worker.process.join(SPAWN_TIMEOUT)
+        assert worker.process.exitcode == 0
+    finally:
+        if worker.process.is_alive():
+            worker.process.kill()
@@ -0,0 +1,93 @@
+"""STORAGE_BACKEND=sqlite runs offline: sessions, statistics and warm-up never touch Firestore"""
+import asyncio
+import pytest
+from lidtgbot import main
+from lidtgbot.database import question_stats, quiz_session, stats
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.memory_client import MemoryFirestore
+from lidtgbot.database.question_bank import QuestionBank
+from lidtgbot.database.sqlite_backend import (
+    SqliteCatalogSource,
+    SqliteDatabase,
+    SqliteQuestionStatsRepository,
+    SqliteSessionCheckpoints,
+    SqliteStatsRepository,
+    SqliteUserRepository,
+)
+from lidtgbot.writequestions import write_questions_to_sqlite
+from tests.conftest import write_catalog
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SqliteDatabase(str(tmp_path / 'lidtgbot.sqlite3'))
+    yield database
+    database.close()
+
+
+def test_factories_pick_sqlite(monkeypatch) -> None:
+    monkeypatch.setattr(stats, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(question_stats, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(quiz_session, 'STORAGE_BACKEND', 'sqlite')
+    assert isinstance(stats.create_stats_repository(), SqliteStatsRepository)
+    assert isinstance(question_stats.create_question_stats_repository(), SqliteQuestionStatsRepository)
+    assert isinstance(quiz_session.create_quiz_session_store().checkpoints, SqliteSessionCheckpoints)
+
+
+def test_sessions_and_stats(database: SqliteDatabase, memory_db: MemoryFirestore) -> None:
+    users = SqliteUserRepository(database)
+    store = quiz_session.QuizSessionStore(SqliteSessionCheckpoints(database), checkpoint_every=1)
+    usage = SqliteStatsRepository(database)
+
+    async def scenario() -> None:
+        user = await users.ensure_user(1, "Anna", language_code='ru')
+        await users.ensure_user(2, "Ben", language_code='xx')
+        await users.update_federal_state(1, 'bayern')
+        session = store.start_session(1, [3, 1, 2], 'v1', shuffle=False)
+        for is_correct in (True, False):
+            store.record_answer(session, is_correct)
+            await users.record_answer(user, '3', is_correct)
+        await store.stop()
+
+        # A fresh store reads the checkpoint back
+        restored = await quiz_session.QuizSessionStore(SqliteSessionCheckpoints(database)).get_session(1)
+        assert restored is not None
+        assert list(restored.order) == [3, 1, 2]
+        assert restored.catalog_version == 'v1'
+        assert (restored.answered_count, restored.correct_count) == (2, 1)
+
+        counters = await SqliteQuestionStatsRepository(database).get_question_stats('3')
+        assert (counters.answered, counters.correct) == (2, 1)
+
+        totals = await usage.get_stats()
+        assert (totals.registered_users, totals.answers) == (2, 2)
+        assert totals.federal_states['bayern'] == 1
+        assert totals.federal_states['none'] == 1
+        assert (totals.languages['ru'], totals.languages['other']) == (1, 1)
+        assert await usage.rebuild() == totals
+
+    asyncio.run(scenario())
+    assert memory_db.rpcs == 0
+
+
+def test_warm_up_without_firestore(database: SqliteDatabase, memory_db: MemoryFirestore,
+                                   monkeypatch, tmp_path) -> None:
+    catalog_json = str(tmp_path / 'questions.json')
+    write_catalog(catalog_json, 20)
+    write_questions_to_sqlite(catalog_json, database=database, catalog_file=None)
+    bank = QuestionBank(SqliteCatalogSource(database))
+
+    def initialize() -> None:
+        raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY environment variable not set")
+
+    monkeypatch.setattr(main, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(main, 'question_bank', bank)
+    monkeypatch.setattr(firestore_client, 'initialize', initialize)
+
+    async def scenario() -> None:
+        await main.warm_up()
+        await bank.stop()
+
+    asyncio.run(scenario())
+    assert bank.get_question('1') is not None
+    assert memory_db.rpcs == 0
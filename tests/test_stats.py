@@ -0,0 +1,29 @@
+"""Sharded usage statistics and their rebuild"""
+import asyncio
+from lidtgbot.database.stats import stats_repository
+from lidtgbot.database.user import user_repository
+
+
+def test_rebuild_does_not_count_pending_changes_twice() -> None:
+    async def scenario() -> None:
+        for user_id in (1, 2, 3):
+            await user_repository.ensure_user(user_id, f"User{user_id}", language_code='ru')
+        await user_repository.update_federal_state(1, 'bayern')
+        await user_repository.write_buffer.flush()
+
+        rebuilt = await stats_repository.rebuild()
+        assert rebuilt.registered_users == 3
+        assert rebuilt.federal_states['bayern'] == 1
+        assert rebuilt.languages['ru'] == 3
+
+        await stats_repository.flush()
+        assert await stats_repository.get_stats() == rebuilt
+
+        # Changes after the rebuild are counted on top of it
+        await user_repository.ensure_user(4, "User4", language_code='de')
+        await stats_repository.flush()
+        stats = await stats_repository.get_stats()
+        assert stats.registered_users == 4
+        assert stats.languages['de'] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+"""Per-user ordering of concurrently processed updates"""
+import asyncio
+from datetime import datetime, timezone
+from telegram import Chat, Message, Update, User
+from lidtgbot.update_processor import PerUserUpdateProcessor
+
+
+def user_update(update_id: int, user_id: int) -> Update:
+    user = User(user_id, f"User{user_id}", False)
+    message = Message(update_id, datetime.now(timezone.utc), Chat(user_id, 'private'), from_user=user, text='hi')
+    return Update(update_id, message=message)
+
+
+def test_busy_user_does_not_starve_others() -> None:
+    async def scenario() -> None:
+        processor = PerUserUpdateProcessor(2)
+        release = asyncio.Event()
+        processed: list[tuple[int, int]] = []
+
+        async def handle(update: Update) -> None:
+            if update.effective_user.id == 1:
+                await release.wait()
+            processed.append((update.effective_user.id, update.update_id))
+
+        # More queued updates of one user than there are slots
+        busy = [asyncio.create_task(processor.process_update(update, handle(update)))
+                for update in (user_update(n, 1) for n in range(1, 6))]
+        await asyncio.sleep(0)
+        other = user_update(6, 2)
+        await asyncio.wait_for(processor.process_update(other, handle(other)), timeout=1)
+        assert processed == [(2, 6)]
+        assert processor.current_concurrent_updates == 1
+
+        release.set()
+        await asyncio.gather(*busy)
+        assert processed[1:] == [(1, n) for n in range(1, 6)]
+        assert not processor._locks
+
+    asyncio.run(scenario())
@@ -0,0 +1,141 @@
+"""Catalog sync: malformed records, pruning removed questions and the catalog file"""
+import os
+import json
+import asyncio
+import pytest
+from lidtgbot.database.firestore_client import firestore_client
+from lidtgbot.database.sqlite_backend import SqliteDatabase, SqliteQuestionRepository, SqliteTranslationRepository
+from lidtgbot.writequestions import (
+    CatalogContent,
+    question_content,
+    translation_contents,
+    write_questions_to_firestore,
+    write_questions_to_sqlite,
+)
+from tests.conftest import write_catalog
+
+
+@pytest.fixture
+def catalog_json(tmp_path) -> str:
+    path = str(tmp_path / 'questions.json')
+    write_catalog(path, 5)
+    return path
+
+
+def edit_catalog(path: str) -> None:
+    """Remove question 5 and the Russian translation of 1, and break the English translation of 4"""
+    with open(path, encoding='utf-8') as file:
+        items = json.load(file)
+    items = [item for item in items if item['num'] != '5']
+    del items[0]['translation']['ru']
+    del items[3]['translation']['en']['a']
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(items, file)
+
+
+async def exists(*path: str) -> bool:
+    doc_ref = firestore_client.db.collection(path[0]).document(path[1])
+    for i in range(2, len(path), 2):
+        doc_ref = doc_ref.collection(path[i]).document(path[i + 1])
+    return (await firestore_client.get(doc_ref)).exists
+
+
+def test_firestore_sync_removes_and_skips(catalog_json: str, tmp_path) -> None:
+    catalog_file = str(tmp_path / 'catalog.bin')
+
+    async def scenario() -> None:
+        await write_questions_to_firestore(catalog_json, catalog_file=catalog_file)
+        edit_catalog(catalog_json)
+        # Reported, but only deleted with prune
+        plan = await write_questions_to_firestore(catalog_json, catalog_file=catalog_file)
+        assert plan.removed_questions == ['5']
+        assert not plan.writes
+        assert await exists('questions', '5')
+        # 1 of 5 questions is more than a sane fraction
+        with pytest.raises(ValueError):
+            await write_questions_to_firestore(catalog_json, catalog_file=catalog_file, prune=True)
+        assert await exists('questions', '5')
+
+        plan = await write_questions_to_firestore(catalog_json, catalog_file=catalog_file, prune=True, force=True)
+        assert plan.removed_questions == ['5']
+        assert plan.removed_translations == ['1/ru', '5/de', '5/en', '5/ru']
+        assert not await exists('questions', '5')
+        assert not await exists('questions', '5', 'translations', 'de')
+        assert not await exists('questions', '1', 'translations', 'ru')
+        # The malformed record is skipped as a whole and its stored documents kept
+        assert await exists('questions', '4')
+        assert await exists('questions', '4', 'translations', 'en')
+        # Nothing else changed
+        assert all(write.data is None for write in plan.writes)
+
+    asyncio.run(scenario())
+
+
+def test_firestore_sync_deletes_leftover_bundles(catalog_json: str) -> None:
+    async def scenario() -> None:
+        bundle_ref = firestore_client.db.collection('question_bundles').document('1_en')
+        batch = firestore_client.db.batch()
+        batch.set(bundle_ref, {'num': '1', 'language_code': 'en'})
+        await firestore_client.commit(batch)
+
+        plan = await write_questions_to_firestore(catalog_json, catalog_file=None)
+        assert plan.removed_bundles == ['1_en']
+        assert not await exists('question_bundles', '1_en')
+
+    asyncio.run(scenario())
+
+
+def test_catalog_file_is_written_after_commits(catalog_json: str, tmp_path, monkeypatch) -> None:
+    catalog_file = str(tmp_path / 'catalog.bin')
+
+    async def failing_commit(batch) -> None:
+        raise ConnectionError("unavailable")
+
+    monkeypatch.setattr(firestore_client, 'commit', failing_commit)
+    with pytest.raises(ConnectionError):
+        asyncio.run(write_questions_to_firestore(catalog_json, catalog_file=catalog_file))
+    assert not os.path.exists(catalog_file)
+
+
+def test_sqlite_sync_removes_and_skips(catalog_json: str, tmp_path) -> None:
+    database = SqliteDatabase(str(tmp_path / 'lidtgbot.sqlite3'))
+    questions = SqliteQuestionRepository(database)
+
+    async def scenario() -> None:
+        assert await questions.get_question('5') is None
+        assert await SqliteTranslationRepository('1', database).get_translation('ru') is None
+        assert await questions.get_question('4') is not None
+        assert await SqliteTranslationRepository('4', database).get_translation('en') is not None
+
+    try:
+        write_questions_to_sqlite(catalog_json, database=database, catalog_file=None)
+        edit_catalog(catalog_json)
+        assert write_questions_to_sqlite(catalog_json, database=database, catalog_file=None) == (0, 0, 1, 4)
+        assert asyncio.run(questions.get_question('5')) is not None
+        with pytest.raises(ValueError):
+            write_questions_to_sqlite(catalog_json, database=database, catalog_file=None, prune=True)
+        assert asyncio.run(questions.get_question('5')) is not None
+
+        assert write_questions_to_sqlite(catalog_json, database=database, catalog_file=None,
+                                         prune=True, force=True) == (0, 0, 1, 4)
+        asyncio.run(scenario())
+    finally:
+        database.close()
+
+
+def test_catalog_version_changes_when_translations_swap(catalog_json: str) -> None:
+    with open(catalog_json, encoding='utf-8') as file:
+        items = json.load(file)
+
+    def version(items: list[dict]) -> str:
+        catalog = CatalogContent()
+        for item in items:
+            catalog.add(question_content(item), {}, translation_contents(item))
+        return catalog.version
+
+    original = version(items)
+    items[0]['translation']['en'], items[1]['translation']['en'] = (
+        items[1]['translation']['en'], items[0]['translation']['en'])
+    assert version(items) != original
+    # Independent of the order of the file
+    assert version(items[::-1]) == version(items)